@@ -0,0 +1,201 @@
+"""
+Links reviews, scraped listings and user profiles that refer to the same
+building.
+
+Each of them stores the exact key of its address (normalizers.address_key)
+and a foreign key to a CanonicalAddress, so "reviews of this listing's
+building" is an indexed equality join on canonical_address_id rather than a
+comparison of free text.
+
+An address whose key has been registered before links to that
+CanonicalAddress. Otherwise the registered addresses with the same house
+number and the same postcode or town form its block, and it links to the
+one whose street is most alike by trigrams ("5 Blackfriers Rd" finds
+"5 Blackfriars Road"), or registers a new one when none comes close. Blocks
+are a handful of rows, so the similarity is computed here rather than by
+pg_trgm and works the same on SQLite.
+
+Models link themselves when saved with a changed address (see
+models.AddressLinked); ``manage.py link_addresses`` links rows written with
+bulk_create or queryset.update() and relinks everything after the matching
+rules change.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import CanonicalAddress
+from .normalizers import address_key, parse_address, trigram_similarity
+
+# Lowest street similarity at which two addresses in a block are the same building
+STREET_SIMILARITY = 0.5
+
+
+def review_address(review):
+    return parse_address(review.property_address)
+
+
+def listing_address(listing):
+    return parse_address(listing.address, listing.postcode)
+
+
+def user_address(user):
+    # Without a street number the user isn't linked: house_flat_number is
+    # often a flat number, which would point at another building
+    if not user.street_number:
+        return {'postcode': '', 'number': '', 'street': '', 'town': ''}
+    return parse_address(f'{user.street_number} {user.street_name}', user.post_code, user.town)
+
+
+# Model label -> parsed address of an instance; plain functions, so they also work on migration models
+ADDRESS_SOURCES = {
+    'rentreviews.RentReview': review_address,
+    'market_analysis.PropertyListing': listing_address,
+    'application.User': user_address,
+}
+
+
+def same_place(candidate, parts):
+    """Whether a registered address is in the same postcode, or failing that town, as ``parts``"""
+    if candidate.postcode and parts['postcode']:
+        return candidate.postcode == parts['postcode']
+    return bool(parts['town']) and candidate.town == parts['town']
+
+
+class AddressIndex:
+    """
+    Resolves parsed addresses to CanonicalAddress rows, keeping the blocks it
+    has loaded so a batch of addresses costs one candidate query.
+    """
+
+    def __init__(self, model=CanonicalAddress):
+        self.model = model
+        self.by_key = {}
+        # ('postcode', postcode, number) or ('town', town, number) -> registered addresses
+        self.blocks = {}
+
+    @staticmethod
+    def block_keys(parts):
+        keys = []
+        if parts['postcode']:
+            keys.append(('postcode', parts['postcode'], parts['number']))
+        if parts['town']:
+            keys.append(('town', parts['town'], parts['number']))
+        return keys
+
+    def add(self, address):
+        self.by_key[address.key] = address
+        self.blocks.setdefault(('postcode', address.postcode, address.number), []).append(address)
+        self.blocks.setdefault(('town', address.town, address.number), []).append(address)
+
+    def load(self, parsed):
+        """Fetch the blocks of every address in ``parsed`` not already loaded"""
+        missing = {
+            block for parts in parsed if address_key(parts)
+            for block in self.block_keys(parts) if block not in self.blocks
+        }
+        if not missing:
+            return
+        numbers = {number for _, _, number in missing}
+        postcodes = {value for kind, value, _ in missing if kind == 'postcode'}
+        towns = {value for kind, value, _ in missing if kind == 'town'}
+        # A superset of every missing block, whichever way round they were asked for
+        for block in missing:
+            self.blocks[block] = []
+        for address in self.model.objects.filter(
+            Q(postcode__in=postcodes) | Q(town__in=towns), number__in=numbers,
+        ):
+            if address.key not in self.by_key:
+                self.add(address)
+
+    def match(self, parts):
+        """The registered building ``parts`` refers to, or None"""
+        key = address_key(parts)
+        if key in self.by_key:
+            return self.by_key[key]
+        best, best_similarity = None, 0.0
+        for block in self.block_keys(parts):
+            for candidate in self.blocks.get(block, []):
+                if same_place(candidate, parts):
+                    similarity = trigram_similarity(candidate.street, parts['street'])
+                    if similarity > best_similarity:
+                        best, best_similarity = candidate, similarity
+        return best if best_similarity >= STREET_SIMILARITY else None
+
+    def resolve(self, parts):
+        """The CanonicalAddress for ``parts``, registering it if new; None for an unusable address"""
+        key = address_key(parts)
+        if not key:
+            return None
+        self.load([parts])
+        address = self.match(parts)
+        if address is None:
+            try:
+                with transaction.atomic():
+                    address = self.model.objects.create(key=key, **parts)
+            except IntegrityError:
+                # Registered by a concurrent save in the meantime
+                address = self.model.objects.get(key=key)
+            self.add(address)
+        return address
+
+
+def link_address(instance, index=None):
+    """
+    Point ``instance`` (a review, listing or user) at the building its
+    address refers to. Nothing is queried when the address is unchanged
+    since it was last linked. Returns whether anything changed; the caller
+    saves.
+    """
+    parts = ADDRESS_SOURCES[instance._meta.label](instance)
+    key = address_key(parts)
+    if key == instance.address_key and (instance.canonical_address_id or not key):
+        return False
+    address = (index or AddressIndex()).resolve(parts)
+    instance.address_key = key
+    instance.canonical_address_id = address.pk if address else None
+    return True
+
+
+def link_all(model, relink=False, chunk_size=1000, index=None):
+    """
+    Link every row of ``model`` whose address changed since it was last
+    linked, or every row with ``relink``. Returns the number of rows changed.
+    """
+    index = index or AddressIndex()
+    changed = 0
+
+    def flush(rows):
+        index.load([parts for _, parts in rows])
+        updated = []
+        with transaction.atomic():
+            for row, parts in rows:
+                address = index.resolve(parts)
+                key = address_key(parts)
+                address_id = address.pk if address else None
+                if key != row.address_key or address_id != row.canonical_address_id:
+                    row.address_key, row.canonical_address_id = key, address_id
+                    updated.append(row)
+            model.objects.bulk_update(updated, ['address_key', 'canonical_address'], batch_size=chunk_size)
+        return len(updated)
+
+    source = ADDRESS_SOURCES[model._meta.label]
+    rows = []
+    for row in model.objects.order_by('pk').iterator(chunk_size=chunk_size):
+        parts = source(row)
+        if not relink and address_key(parts) == row.address_key and (row.canonical_address_id or not row.address_key):
+            continue
+        rows.append((row, parts))
+        if len(rows) == chunk_size:
+            changed += flush(rows)
+            rows = []
+    if rows:
+        changed += flush(rows)
+    return changed
+
+
+def prune():
+    """Delete registered addresses nothing links to any more; returns how many"""
+    deleted, _ = CanonicalAddress.objects.filter(
+        reviews__isnull=True, listings__isnull=True, residents__isnull=True,
+    ).delete()
+    return deleted
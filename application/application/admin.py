@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import AdminSite
-from .models import User
+from .middleware import forget_session_users
+from .models import CanonicalAddress, User
 
 # Customize admin site settings
 admin.site.site_header = "Bruce Management System"
@@ -71,10 +72,20 @@ class UserAdmin(admin.ModelAdmin):
     
     def mark_onboarding_complete(self, request, queryset):
         queryset.update(onboarding_complete=True)
+        forget_session_users(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{queryset.count()} users marked as onboarding complete.')
     mark_onboarding_complete.short_description = "Mark selected users as onboarding complete"
     
     def mark_onboarding_incomplete(self, request, queryset):
         queryset.update(onboarding_complete=False)
+        forget_session_users(queryset.values_list('pk', flat=True))
         self.message_user(request, f'{queryset.count()} users marked as onboarding incomplete.')
-    mark_onboarding_incomplete.short_description = "Mark selected users as onboarding incomplete"
\ No newline at end of file
+    mark_onboarding_incomplete.short_description = "Mark selected users as onboarding incomplete"
+
+
+@admin.register(CanonicalAddress)
+class CanonicalAddressAdmin(admin.ModelAdmin):
+    list_display = ('key', 'postcode', 'town', 'created_at')
+    search_fields = ('key', 'street', 'postcode')
+    # Registered by the linking in application/addresses.py
+    readonly_fields = [field.name for field in CanonicalAddress._meta.fields]
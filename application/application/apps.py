@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class ApplicationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'application'
\ No newline at end of file
+    name = 'application'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,20 @@
+"""
+Django setup for modules that also run on their own (simple_scraper,
+auto_populate_locations, the Scrapy spiders).
+
+Those used to call django.setup() at import, so importing one from inside
+the project ran the whole app registry setup a second time. setup_django()
+only does it when nothing has set Django up yet.
+"""
+import os
+
+
+def setup_django():
+    """Set Django up for a standalone script; a no-op under manage.py, gunicorn or an already set up script"""
+    from django.apps import apps
+
+    if apps.ready or apps.loading:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
+    import django
+    django.setup()
@@ -0,0 +1,28 @@
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from django.shortcuts import redirect
+from .middleware import aget_session_user, get_session_user
+
+
+def require_authentication(view_func):
+    """
+    Decorator to require a logged-in user.
+
+    Also redirects to login when the session points at a user that no
+    longer exists, so views can use ``request.app_user`` directly. Works
+    on async views too, where the user is loaded with the async ORM.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            if not await request.session.aget('is_authenticated') or await aget_session_user(request) is None:
+                return redirect('login')
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.session.get('is_authenticated') or get_session_user(request) is None:
+            return redirect('login')
+        return view_func(request, *args, **kwargs)
+    return wrapper
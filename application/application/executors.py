@@ -0,0 +1,33 @@
+"""
+Thread pool for blocking work started from async views.
+
+sync_to_async(thread_sensitive=False) would otherwise use the event loop's
+default executor, which only has cpu_count + 4 threads. Scraping and SMTP
+spend almost all their time waiting on the network, so a process can afford
+a few dozen threads for them (BLOCKING_IO_THREADS).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def blocking_io_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'BLOCKING_IO_THREADS', 32),
+                    thread_name_prefix='blocking-io',
+                )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Await a blocking call on the I/O pool without holding up the event loop"""
+    return await sync_to_async(func, thread_sensitive=False, executor=blocking_io_executor())(*args, **kwargs)
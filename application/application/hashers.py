@@ -0,0 +1,133 @@
+"""
+Password hashing policy.
+
+PASSWORD_HASHER picks the hasher new passwords are stored with; the others
+stay in PASSWORD_HASHERS so existing hashes keep verifying. Cost parameters
+come from settings, and a hash stored with any other hasher or parameters is
+upgraded the next time its owner logs in.
+
+The upgrade costs a second full hash, so by default it runs on a small
+thread pool after the login response has been decided rather than in the
+request. hashlib releases the GIL while hashing, so those threads don't
+hold up the worker's other requests. Each queued upgrade holds the
+plaintext password, so at most PASSWORD_REHASH_QUEUE wait at once; past
+that the upgrade is skipped and happens on a later login instead.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, PBKDF2PasswordHasher, ScryptPasswordHasher, make_password,
+)
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with cost parameters from settings (memory used is 128 * n * r bytes)"""
+
+    @property
+    def work_factor(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_WORK_FACTOR', 2**14)
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_BLOCK_SIZE', 8)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_SCRYPT_PARALLELISM', 1)
+
+    @property
+    def maxmem(self):
+        # OpenSSL's default 32MB cap is too small for larger work factors
+        return 256 * self.work_factor * self.block_size * self.parallelism
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the iteration count from settings"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with cost parameters from settings; needs argon2-cffi"""
+
+    @property
+    def time_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_TIME_COST', 2)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', 19456)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', 1)
+
+
+_rehash_pool = None
+_rehash_slots = None
+_rehash_pool_lock = threading.Lock()
+
+
+def _get_rehash_pool():
+    global _rehash_pool, _rehash_slots
+    with _rehash_pool_lock:
+        if _rehash_pool is None:
+            _rehash_slots = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_REHASH_QUEUE', 32))
+            _rehash_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PASSWORD_REHASH_WORKERS', 1),
+                thread_name_prefix='password-rehash',
+            )
+    return _rehash_pool
+
+
+def rehash_password(user_id, old_hash, password):
+    """Store ``password`` with the current hasher unless the hash changed meanwhile"""
+    from .middleware import forget_session_users
+    from .models import User
+
+    updated = User.objects.filter(pk=user_id, password_hash=old_hash).update(
+        password_hash=make_password(password),
+    )
+    if updated:
+        forget_session_users([user_id])
+        logger.info(f"Upgraded password hash for user {user_id}")
+
+
+def _rehash_in_background(user_id, old_hash, password):
+    try:
+        rehash_password(user_id, old_hash, password)
+    except Exception:
+        logger.exception(f"Password rehash failed for user {user_id}")
+    finally:
+        _rehash_slots.release()
+        close_old_connections()
+
+
+def schedule_rehash(user_id, old_hash, password):
+    """
+    Upgrade a stored hash, off the request path when
+    PASSWORD_REHASH_IN_BACKGROUND is set. Returns False if the background
+    queue was full and the upgrade was left for a later login.
+    """
+    if not getattr(settings, 'PASSWORD_REHASH_IN_BACKGROUND', True):
+        rehash_password(user_id, old_hash, password)
+        return True
+    pool = _get_rehash_pool()
+    if not _rehash_slots.acquire(blocking=False):
+        logger.warning(f"Password rehash queue full; user {user_id} is upgraded on a later login")
+        return False
+    try:
+        pool.submit(_rehash_in_background, user_id, old_hash, password)
+    except RuntimeError:
+        # The pool is shutting down with the interpreter
+        _rehash_slots.release()
+        return False
+    return True
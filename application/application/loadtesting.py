@@ -0,0 +1,120 @@
+"""
+Pieces shared by the commands that load-test a locally started server
+(compare_server_modes, loadtest): a scratch database, gunicorn in either
+SERVER_MODE, and a small keep-alive HTTP client.
+
+The client keeps its own cookies because the app's session and CSRF cookies
+are Secure, which cookie jars won't send back over plain http.
+"""
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def scratch_environment(directory, **overrides):
+    """
+    Environment for manage.py and gunicorn subprocesses using a new SQLite
+    database in ``directory``, with outbound scraping sent to a dead proxy.
+    """
+    return {
+        **os.environ,
+        # IMMEDIATE transactions make concurrent SQLite writers wait for
+        # the lock instead of failing with "database is locked"
+        'DATABASE_URL': f'sqlite:///{os.path.join(directory, "loadtest.sqlite3")}?timeout=30&transaction_mode=IMMEDIATE',
+        'ALLOWED_HOSTS': '127.0.0.1,localhost',
+        'HTTP_PROXY': 'http://127.0.0.1:9',
+        'HTTPS_PROXY': 'http://127.0.0.1:9',
+        'LISTING_GATE_ENABLED': 'False',
+        **overrides,
+    }
+
+
+def manage(args, env, **kwargs):
+    """Run a manage.py command in a subprocess"""
+    return subprocess.run(
+        [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args],
+        env=env, check=True, cwd=settings.BASE_DIR, **kwargs,
+    )
+
+
+@contextmanager
+def gunicorn_server(mode, port, workers, env, timeout=300):
+    """Serve the app with gunicorn in SERVER_MODE ``mode`` until the block exits"""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--timeout', str(timeout), '--log-level', 'warning'],
+        # WEB_CONCURRENCY also tells settings how many workers share the sessions
+        env={**env, 'SERVER_MODE': mode, 'WEB_CONCURRENCY': str(workers)}, cwd=settings.BASE_DIR,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not start on port {port}')
+
+
+class HttpSession:
+    """One simulated browser: a keep-alive connection and its cookies"""
+
+    def __init__(self, host, port, timeout=300, cookies=None):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+        self.cookies = dict(cookies or {})
+
+    def request(self, method, path, fields=None):
+        """Send a request (form-encoded ``fields`` for POSTs); return (status, body)"""
+        body = urlencode(fields).encode() if fields is not None else None
+        headers = {}
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The server closed an idle keep-alive connection; retry on a new one
+            self.connection.close()
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+        content = response.read()
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                if morsel['max-age'] == '0' or not morsel.value:
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        return response.status, content.decode(errors='replace')
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,122 @@
+import statistics
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from application.hashers import _get_rehash_pool
+from application.models import User
+
+# (label, hasher, settings overrides)
+CASES = [
+    ('pbkdf2 1M (Django default)', 'pbkdf2', {'PASSWORD_PBKDF2_ITERATIONS': 1_000_000}),
+    ('pbkdf2 600k', 'pbkdf2', {'PASSWORD_PBKDF2_ITERATIONS': 600_000}),
+    ('scrypt n=2^14 r=8 p=1', 'scrypt', {'PASSWORD_SCRYPT_WORK_FACTOR': 2**14, 'PASSWORD_SCRYPT_BLOCK_SIZE': 8}),
+    ('scrypt n=2^15 r=8 p=1', 'scrypt', {'PASSWORD_SCRYPT_WORK_FACTOR': 2**15, 'PASSWORD_SCRYPT_BLOCK_SIZE': 8}),
+    ('argon2 t=2 m=19MiB', 'argon2', {'PASSWORD_ARGON2_TIME_COST': 2, 'PASSWORD_ARGON2_MEMORY_COST': 19456}),
+]
+
+ALGORITHMS = {'pbkdf2': 'pbkdf2_sha256', 'scrypt': 'scrypt', 'argon2': 'argon2'}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password check cost and login throughput for each hasher configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=10, help='Single-threaded checks per case')
+        parser.add_argument(
+            '--threads',
+            type=int,
+            nargs='+',
+            default=[1, 4],
+            help='Concurrent checkers for the throughput columns'
+        )
+        parser.add_argument('--duration', type=float, default=2.0, help='Seconds per throughput run')
+        parser.add_argument(
+            '--skip-login',
+            action='store_true',
+            help='Only benchmark the hashers, not the login view'
+        )
+
+    def handle(self, *args, **options):
+        header = f'{"hasher":<28} {"ms/check":>9}' + ''.join(f' {f"{n}T checks/s":>14}' for n in options['threads'])
+        self.stdout.write(header)
+        for label, name, overrides in CASES:
+            with override_settings(**overrides):
+                try:
+                    hasher = get_hasher(ALGORITHMS[name])
+                    encoded = hasher.encode('correct horse battery staple', hasher.salt())
+                except ValueError as e:
+                    self.stdout.write(f'{label:<28} skipped: {e}')
+                    continue
+
+                timings = []
+                for _ in range(options['checks']):
+                    started = time.perf_counter()
+                    hasher.verify('correct horse battery staple', encoded)
+                    timings.append(time.perf_counter() - started)
+
+                line = f'{label:<28} {statistics.median(timings) * 1000:>9.1f}'
+                for threads in options['threads']:
+                    line += f' {self.throughput(hasher, encoded, threads, options["duration"]):>14.1f}'
+                self.stdout.write(line)
+
+        if not options['skip_login']:
+            self.bench_login_view()
+
+    def throughput(self, hasher, encoded, threads, duration):
+        """Checks per second with ``threads`` checkers running at once"""
+        done = []
+        deadline = time.perf_counter() + duration
+
+        def worker():
+            count = 0
+            while time.perf_counter() < deadline:
+                hasher.verify('correct horse battery staple', encoded)
+                count += 1
+            done.append(count)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sum(done) / duration
+
+    def bench_login_view(self):
+        """
+        Time /login/submit/ for a user whose hash predates the current hasher
+        policy (first login, which triggers the upgrade) and again afterwards.
+        """
+        self.stdout.write('')
+        self.stdout.write(f'login view, stored pbkdf2 1M hash, current hasher {settings.PASSWORD_HASHER}')
+        self.stdout.write(f'{"rehash":<12} {"first login ms":>15} {"next login ms":>14}')
+        legacy_hash = make_password('correct horse battery staple', hasher='pbkdf2_sha256')
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+        for background in (False, True):
+            username = f'bench-login-{uuid.uuid4().hex[:8]}'
+            user = User.objects.create(username=username, email=f'{username}@example.com', password_hash=legacy_hash)
+            try:
+                with override_settings(PASSWORD_REHASH_IN_BACKGROUND=background):
+                    timings = []
+                    for _ in range(2):
+                        started = time.perf_counter()
+                        response = client.post('/login/submit/', {
+                            'username': username,
+                            'password': 'correct horse battery staple',
+                        })
+                        timings.append(time.perf_counter() - started)
+                        if not response.json().get('success'):
+                            raise RuntimeError(f'Login failed: {response.content!r}')
+                        # Let a background upgrade land before the next login
+                        _get_rehash_pool().submit(lambda: None).result()
+            finally:
+                user.delete()
+
+            self.stdout.write(
+                f'{"background" if background else "inline":<12} '
+                f'{timings[0] * 1000:>15.1f} {timings[1] * 1000:>14.1f}'
+            )
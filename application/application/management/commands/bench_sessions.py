@@ -0,0 +1,119 @@
+import time
+from importlib import import_module
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from report_issue.compliance import COMPLIANCE_CHECKLIST
+
+ENGINES = [
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'django.contrib.sessions.backends.cache',
+]
+
+
+def auth_keys():
+    return {'user_id': 1, 'username': 'tenant', 'is_authenticated': True}
+
+
+def legacy_payload():
+    """What an authenticated session used to carry: the onboarding answers,
+    the contact form and the whole compliance checklist"""
+    results = {
+        category: [{**item, 'compliant': index % 3 != 0} for index, item in enumerate(items)]
+        for category, items in COMPLIANCE_CHECKLIST.items()
+    }
+    return {
+        **auth_keys(),
+        'onboarding_data': {
+            'name': 'Alex Tenant', 'phone': '07123 456789', 'rental_situation': 'Renting privately',
+            'property_type': 'Flat', 'bedrooms': '2 bedrooms', 'bathrooms': '1', 'has_lounge': 'yes',
+            'parking_type': 'On-street', 'property_features': 'Balcony, dishwasher, washing machine',
+            'property_condition': '7', 'weekly_rent': '£250', 'included_utilities': 'Water',
+            'landlord_contact': 'Property manager', 'rental_duration': '12 months',
+            'current_issues': 'Damp in the bathroom and a broken extractor fan',
+        },
+        'contact_details': {
+            'primary_contact': 'both',
+            'landlord_company_name': 'ABC Properties Ltd', 'landlord_contact_name': 'John Smith',
+            'landlord_email': 'landlord@example.com', 'landlord_phone': '07123 456789',
+            'landlord_address': '1 High Street\nManchester\nM1 1AA',
+            'property_manager_company_name': 'XYZ Property Management',
+            'property_manager_contact_name': 'Jane Doe', 'property_manager_email': 'manager@example.com',
+            'property_manager_phone': '07123 456780',
+            'property_manager_address': '2 Market Street\nManchester\nM1 1AB',
+        },
+        'compliance_results': {
+            'results': results,
+            'total_items': 19,
+            'compliant_items': 12,
+            'compliance_percentage': 63.2,
+            'completed_date': timezone.now().isoformat(),
+            'issues_created': [
+                {'title': item['text'], 'category': category, 'issue_id': index}
+                for category, items in results.items()
+                for index, item in enumerate(items) if not item['compliant']
+            ],
+        },
+    }
+
+
+def slim_payload():
+    """What an authenticated session carries now"""
+    return {**auth_keys(), 'contact_details_completed': True, 'compliance_completed': True}
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request session load/save overhead for each engine and payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Simulated requests per case')
+        parser.add_argument(
+            '--write-every',
+            type=int,
+            default=10,
+            help='Modify and save the session on every Nth request (0: never)'
+        )
+        parser.add_argument('--engine', action='append', help='Session engine to measure (repeatable)')
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        write_every = options['write_every']
+        engines = options['engine'] or ENGINES
+
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        self.stdout.write(f'{"engine":<12} {"payload":<8} {"bytes":>7} {"us/req":>8} {"queries/req":>12}')
+        for engine in engines:
+            SessionStore = import_module(engine).SessionStore
+            for label, payload in (('legacy', legacy_payload()), ('slim', slim_payload())):
+                store = SessionStore()
+                store.update(payload)
+                store.create()
+                session_key = store.session_key
+                size = len(store.encode(payload))
+
+                queries[0] = 0
+                with connection.execute_wrapper(count_queries):
+                    started = time.perf_counter()
+                    for i in range(requests):
+                        # What SessionMiddleware and the auth decorator do
+                        # for each request
+                        session = SessionStore(session_key)
+                        session.get('is_authenticated')
+                        if write_every and i % write_every == 0:
+                            session['contact_details_completed'] = True
+                            session.modified = True
+                        if session.modified:
+                            session.save()
+                    elapsed = time.perf_counter() - started
+
+                SessionStore(session_key).delete()
+                self.stdout.write(
+                    f'{engine.rsplit(".", 1)[-1]:<12} {label:<8} {size:>7} '
+                    f'{elapsed / requests * 1e6:>8.1f} {queries[0] / requests:>12.2f}'
+                )
@@ -0,0 +1,21 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from application.models import OnboardingDraft
+
+
+class Command(BaseCommand):
+    help = 'Delete onboarding drafts that never became an account'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=14,
+            help='Delete drafts not updated for this many days (default: 14)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = OnboardingDraft.objects.filter(updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} onboarding drafts older than {options["days"]} days'))
@@ -0,0 +1,151 @@
+import argparse
+import json
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from importlib import import_module
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from application.loadtesting import HttpSession, gunicorn_server, manage, percentile, scratch_environment
+from application.models import User
+from market_analysis.models import PropertyListing
+
+MODES = ['wsgi', 'asgi']
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test sync WSGI workers against ASGI uvicorn workers on a scratch database. '
+        'Concurrent users start market analyses (slow: scraper delays) while a probe '
+        'measures how quickly a cheap page is served meanwhile. Outbound scraping goes '
+        'to an unreachable proxy, so no real site is contacted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=16, help='Concurrent market analysis requests')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes in each mode')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--mode', choices=MODES, action='append', help='Only run the given mode(s)')
+        parser.add_argument('--seed-only', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['seed_only']:
+            self.stdout.write(json.dumps(self.seed(options['users'])))
+            return
+
+        with tempfile.TemporaryDirectory() as tmp:
+            env = scratch_environment(tmp)
+            manage(['migrate', '-v0'], env)
+            seeded = manage(
+                ['compare_server_modes', '--seed-only', '--users', str(options['users'])],
+                env, capture_output=True, text=True,
+            )
+            session_keys = json.loads(seeded.stdout.strip().splitlines()[-1])
+
+            results = {}
+            for mode in options['mode'] or MODES:
+                results[mode] = self.run_mode(mode, env, session_keys, options)
+
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"mode":<6} {"analyses":>9} {"errors":>7} {"wall s":>7} '
+            f'{"analysis p50/p95 s":>19} {"probe p50/p95/max ms":>22}'
+        )
+        for mode, r in results.items():
+            self.stdout.write(
+                f'{mode:<6} {r["completed"]:>9} {r["errors"]:>7} {r["wall"]:>7.1f} '
+                f'{percentile(r["slow"], 50):>9.1f}/{percentile(r["slow"], 95):<9.1f} '
+                f'{percentile(r["probe"], 50) * 1000:>8.0f}/{percentile(r["probe"], 95) * 1000:.0f}'
+                f'/{max(r["probe"] or [0]) * 1000:.0f}'
+            )
+
+    def seed(self, users):
+        """Create users with logged-in sessions and some listings to analyse"""
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        listings = [
+            PropertyListing(
+                title=f'Load test flat {i}',
+                address=f'{i} Test Street, Manchester',
+                weekly_rent=Decimal(200 + i % 150),
+                monthly_rent=Decimal(200 + i % 150) * 52 / 12,
+                bedrooms=2,
+                property_type='flat',
+                source='loadtest',
+                source_url='#',
+                source_id=f'loadtest_{i}',
+                scraped_at=timezone.now(),
+            )
+            for i in range(500)
+        ]
+        PropertyListing.objects.bulk_create(listings)
+
+        session_keys = []
+        for i in range(users):
+            user = User.objects.create(
+                username=f'loadtest{i}', email=f'loadtest{i}@example.com', name=f'Load Test {i}',
+                property_type='flat', bedrooms=2, weekly_rent=Decimal('250'), town='Manchester',
+                onboarding_complete=True,
+            )
+            session = SessionStore()
+            session.update({'user_id': user.id, 'username': user.username, 'is_authenticated': True})
+            session.create()
+            session_keys.append(session.session_key)
+        return session_keys
+
+    def run_mode(self, mode, env, session_keys, options):
+        with gunicorn_server(mode, options['port'], options['workers'], env) as base:
+            # Warm every worker up so imports don't count against the first requests
+            for _ in range(options['workers'] * 2):
+                self.request('/', options)
+
+            self.stdout.write(f'{mode}: {len(session_keys)} concurrent analyses on {options["workers"]} workers')
+            slow, probe, errors = [], [], []
+            done = threading.Event()
+
+            def analyse(session_key):
+                started = time.perf_counter()
+                try:
+                    body = self.request('/market-analysis/start/', options, session_key, data={'location': 'manchester'})
+                    if not json.loads(body).get('success'):
+                        errors.append(body[:200])
+                    else:
+                        slow.append(time.perf_counter() - started)
+                except Exception as e:
+                    errors.append(str(e))
+
+            def probe_loop():
+                while not done.is_set():
+                    started = time.perf_counter()
+                    try:
+                        self.request('/', options)
+                        probe.append(time.perf_counter() - started)
+                    except Exception as e:
+                        errors.append(f'probe: {e}')
+                    time.sleep(0.05)
+
+            clients = [threading.Thread(target=analyse, args=(key,)) for key in session_keys]
+            prober = threading.Thread(target=probe_loop)
+            started = time.perf_counter()
+            prober.start()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            wall = time.perf_counter() - started
+            done.set()
+            prober.join()
+
+            for error in errors[:3]:
+                self.stderr.write(f'  {mode} error: {error}')
+            return {'completed': len(slow), 'errors': len(errors), 'wall': wall, 'slow': slow, 'probe': probe}
+
+    def request(self, path, options, session_key=None, data=None):
+        cookies = {settings.SESSION_COOKIE_NAME: session_key} if session_key else None
+        session = HttpSession('127.0.0.1', options['port'], cookies=cookies)
+        try:
+            status, body = session.request('POST' if data is not None else 'GET', path, data)
+        finally:
+            session.close()
+        return body
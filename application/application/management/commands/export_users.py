@@ -0,0 +1,55 @@
+import csv
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from application.models import User
+from application.queries import subquery_count, reverse_relations
+
+
+class Command(BaseCommand):
+    help = 'Stream all users to CSV with per-user counts for each related table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='CSV file to write (default: users_export_<timestamp>.csv)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched from the database per round trip'
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or f"users_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        chunk_size = options['chunk_size']
+
+        # One correlated COUNT per relation keeps this a single SELECT
+        # however many users (and related rows) there are.
+        relations = reverse_relations(User)
+        annotations = {
+            f'_{relation.name}_count': subquery_count(
+                relation.related_model.objects.all(), relation.field.name
+            )
+            for relation in relations
+        }
+        fields = [field.attname for field in User._meta.concrete_fields]
+        header = [relation.name for relation in relations] + fields
+        count_columns = list(annotations)
+
+        users = (
+            User.objects.annotate(**annotations)
+            .order_by('pk')
+            .values_list(*count_columns, *fields)
+        )
+
+        written = 0
+        with open(output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in users.iterator(chunk_size=chunk_size):
+                writer.writerow(['' if value is None else value for value in row])
+                written += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Exported {written} users to {output}'))
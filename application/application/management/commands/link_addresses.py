@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from application.addresses import AddressIndex, link_all, prune
+from application.models import User
+from market_analysis.models import PropertyListing
+from rentreviews.models import RentReview
+
+
+class Command(BaseCommand):
+    help = 'Link reviews, listings and users to the canonical address of the building they refer to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--relink', action='store_true', help='Re-match every row, not just those whose address changed')
+        parser.add_argument('--prune', action='store_true', help='Delete canonical addresses nothing links to any more')
+
+    def handle(self, *args, **options):
+        index = AddressIndex()
+        for model in (RentReview, PropertyListing, User):
+            changed = link_all(model, relink=options['relink'], index=index)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {changed} linked')
+        if options['prune']:
+            self.stdout.write(f'Pruned {prune()} unused addresses')
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,301 @@
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal
+from urllib.parse import urlparse
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from application.loadtesting import HttpSession, gunicorn_server, manage, percentile, scratch_environment
+from application.models import User
+from application.normalizers import location_key
+from market_analysis.models import PropertyListing
+from market_analysis.synthetic import TOWNS, synthetic_listing
+from rentreviews.models import RentReview
+from report_issue.models import ComplianceAssessment, ContactDetails, IssueCategory
+
+PASSWORD = 'loadtest-password'
+DEFAULT_MIX = 'login=5,dashboard=30,market_analysis=15,reviews=35,create_issue=15'
+CSRF_TOKEN = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class VirtualUser:
+    """A simulated tenant working through a random mix of scenarios"""
+
+    def __init__(self, index, host, port, users, categories, record):
+        self.rng = random.Random(index)
+        self.host, self.port = host, port
+        self.username = f'loadtest{index % users}'
+        self.categories = categories
+        self.record = record
+        self.session = HttpSession(host, port, timeout=60)
+
+    def request(self, method, path, expect, fields=None):
+        """Timed request; records it under ``METHOD path`` (without the query string)"""
+        label = f'{method} {path.split("?")[0]}'
+        started = time.perf_counter()
+        try:
+            status, body = self.session.request(method, path, fields)
+        except Exception as e:
+            self.record(label, time.perf_counter() - started, f'{type(e).__name__}: {e}')
+            raise LoadTestError(label)
+        error = None if status == expect else f'HTTP {status}'
+        self.record(label, time.perf_counter() - started, error)
+        if error:
+            raise LoadTestError(label)
+        return body
+
+    def login(self):
+        # A fresh visit: new connection, no cookies
+        self.session.close()
+        self.session = HttpSession(self.host, self.port, timeout=60)
+        body = self.request('POST', '/login/submit/', 200, {'username': self.username, 'password': PASSWORD})
+        if not json.loads(body).get('success'):
+            raise LoadTestError('login rejected')
+
+    def dashboard(self):
+        self.request('GET', '/dashboard/', 200)
+
+    def market_analysis(self):
+        self.request('GET', '/market-analysis/', 200)
+
+    def reviews(self):
+        town = self.rng.choice(TOWNS)[0]
+        self.request('GET', f'/reviews/?search={town}' if self.rng.random() < 0.5 else '/reviews/', 200)
+
+    def create_issue(self):
+        form = self.request('GET', '/issues/create/', 200)
+        token = CSRF_TOKEN.search(form)
+        if not token:
+            raise LoadTestError('no CSRF token on the issue form')
+        self.request('POST', '/issues/create/', 302, {
+            'csrfmiddlewaretoken': token.group(1),
+            'title': 'Boiler not working',
+            'description': 'No hot water since Monday.',
+            'category': self.rng.choice(self.categories),
+            'location': self.rng.choice(['Kitchen', 'Bathroom', 'Bedroom']),
+            'priority': self.rng.choice(['low', 'medium', 'high']),
+            'contact_preference': 'landlord',
+            'landlord_email': 'landlord@example.com',
+        })
+
+    def run(self, mix, deadline, think_time):
+        scenarios, weights = zip(*mix.items())
+        logged_in = False
+        while time.monotonic() < deadline:
+            scenario = 'login' if not logged_in else self.rng.choices(scenarios, weights)[0]
+            try:
+                getattr(self, scenario)()
+                logged_in = True
+            except LoadTestError:
+                logged_in = scenario != 'login' and logged_in
+            if think_time:
+                time.sleep(self.rng.expovariate(1 / think_time))
+        self.session.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'HTTP load test: concurrent simulated tenants log in, view the dashboard, load '
+        'market analyses, browse reviews and report issues. By default the app is started '
+        'under gunicorn (SERVER_MODE wsgi or asgi) against a seeded scratch database; '
+        'reports throughput, error rate and p50/p95/p99 latency per endpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], default='wsgi', help='SERVER_MODE for the local server')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn worker processes')
+        parser.add_argument('--port', type=int, default=8766)
+        parser.add_argument(
+            '--url',
+            help='Load-test an already running server instead. Its database must hold the accounts '
+                 'created by --seed-only.'
+        )
+        parser.add_argument('--concurrency', type=int, default=10, help='Simultaneous simulated users')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+        parser.add_argument('--think-time', type=float, default=0.5, help='Mean pause between actions, in seconds')
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help=f'Relative weights of the scenarios (default {DEFAULT_MIX})'
+        )
+        parser.add_argument('--users', type=int, default=50, help='Accounts to seed')
+        parser.add_argument('--listings', type=int, default=5000, help='Listings to seed')
+        parser.add_argument('--reviews', type=int, default=500, help='Rent reviews to seed')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this file')
+        parser.add_argument(
+            '--seed-only', action='store_true',
+            help='Seed the configured database with load-test accounts and data, then exit'
+        )
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+
+        if options['seed_only']:
+            self.stdout.write(json.dumps(self.seed(options)))
+            return
+
+        if options['url']:
+            target = urlparse(options['url'])
+            categories = list(IssueCategory.objects.values_list('pk', flat=True)) or ['']
+            results = self.run_load(target.hostname, target.port or 80, categories, mix, options)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                env = scratch_environment(tmp)
+                self.stdout.write('Seeding a scratch database...')
+                manage(['migrate', '-v0'], env)
+                seeded = manage(
+                    ['loadtest', '--seed-only', '--users', str(options['users']),
+                     '--listings', str(options['listings']), '--reviews', str(options['reviews'])],
+                    env, capture_output=True, text=True,
+                )
+                categories = json.loads(seeded.stdout.strip().splitlines()[-1])['categories']
+                with gunicorn_server(options['mode'], options['port'], options['workers'], env):
+                    results = self.run_load('127.0.0.1', options['port'], categories, mix, options)
+
+        self.report(results, options)
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            if not hasattr(VirtualUser, name.strip()) or not weight:
+                raise CommandError(f'Unknown scenario or missing weight in --mix: {part!r}')
+            mix[name.strip()] = float(weight)
+        return mix
+
+    def seed(self, options):
+        rng = random.Random(0)
+        password_hash = make_password(PASSWORD)
+        users = []
+        for i in range(options['users']):
+            town = rng.choice(TOWNS)[0]
+            users.append(User(
+                username=f'loadtest{i}', email=f'loadtest{i}@example.com', name=f'Load Test {i}',
+                password_hash=password_hash, property_type='flat', bedrooms=rng.choice([1, 2, 3]),
+                weekly_rent=Decimal(rng.randint(150, 450)), town=town, post_code='M1 1AA',
+                onboarding_complete=True,
+            ))
+        users = User.objects.bulk_create(users)
+
+        # Issue reporting is gated on confirmed contact details and a compliance check
+        ContactDetails.objects.bulk_create([
+            ContactDetails(user=user, primary_contact='landlord', landlord_email='landlord@example.com')
+            for user in users
+        ])
+        ComplianceAssessment.objects.bulk_create([
+            ComplianceAssessment(user=user, total_items=1, compliant_items=1, compliance_percentage=100.0)
+            for user in users
+        ])
+        categories = IssueCategory.objects.bulk_create([
+            IssueCategory(name=name, icon='wrench') for name in ['Heating', 'Plumbing', 'Damp', 'Electrical']
+        ])
+
+        listings = []
+        for i in range(options['listings']):
+            data = synthetic_listing(rng, i, prefix='loadtest')
+            listings.append(PropertyListing(
+                **data, location_key=location_key(data['address'], data['area'], data['postcode']),
+            ))
+        PropertyListing.objects.bulk_create(listings, batch_size=1000)
+
+        RentReview.objects.bulk_create([
+            RentReview(
+                user=rng.choice(users), property_address=f'{rng.randint(1, 200)} High Street, {rng.choice(TOWNS)[0]}',
+                overall_rating=rng.randint(1, 5), title='Review', review_text='Load test review.',
+            )
+            for _ in range(options['reviews'])
+        ], batch_size=1000)
+        return {'categories': [category.pk for category in categories]}
+
+    def run_load(self, host, port, categories, mix, options):
+        timings = defaultdict(list)
+        errors = defaultdict(list)
+
+        def record(label, elapsed, error):
+            timings[label].append(elapsed)
+            if error:
+                errors[label].append(error)
+
+        self.stdout.write(
+            f'{options["concurrency"]} users for {options["duration"]:.0f}s against {host}:{port}'
+            + ('' if options['url'] else f' ({options["mode"]}, {options["workers"]} workers)')
+        )
+        deadline = time.monotonic() + options['duration']
+        users = [
+            VirtualUser(i, host, port, options['users'], categories, record)
+            for i in range(options['concurrency'])
+        ]
+        threads = [
+            threading.Thread(target=user.run, args=(mix, deadline, options['think_time']))
+            for user in users
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {'elapsed': time.monotonic() - started, 'timings': timings, 'errors': errors}
+
+    def report(self, results, options):
+        elapsed = results['elapsed']
+        rows = []
+        for label in sorted(results['timings']):
+            times = results['timings'][label]
+            failed = results['errors'].get(label, [])
+            rows.append({
+                'endpoint': label,
+                'requests': len(times),
+                'errors': len(failed),
+                'error_rate': len(failed) / len(times),
+                'throughput': len(times) / elapsed,
+                'p50_ms': percentile(times, 50) * 1000,
+                'p95_ms': percentile(times, 95) * 1000,
+                'p99_ms': percentile(times, 99) * 1000,
+                'sample_errors': sorted(set(failed))[:3],
+            })
+        everything = [t for times in results['timings'].values() for t in times]
+        total_errors = sum(len(e) for e in results['errors'].values())
+        rows.append({
+            'endpoint': 'all',
+            'requests': len(everything),
+            'errors': total_errors,
+            'error_rate': total_errors / len(everything) if everything else 0,
+            'throughput': len(everything) / elapsed,
+            'p50_ms': percentile(everything, 50) * 1000,
+            'p95_ms': percentile(everything, 95) * 1000,
+            'p99_ms': percentile(everything, 99) * 1000,
+            'sample_errors': [],
+        })
+
+        self.stdout.write('')
+        self.stdout.write(
+            f'{"endpoint":<26} {"requests":>9} {"errors":>7} {"err %":>6} {"req/s":>7} '
+            f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}'
+        )
+        for row in rows:
+            line = (
+                f'{row["endpoint"]:<26} {row["requests"]:>9} {row["errors"]:>7} {row["error_rate"] * 100:>6.1f} '
+                f'{row["throughput"]:>7.1f} {row["p50_ms"]:>8.0f} {row["p95_ms"]:>8.0f} {row["p99_ms"]:>8.0f}'
+            )
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
+            for error in row['sample_errors']:
+                self.stdout.write(f'    {error}')
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({
+                    'options': {key: options[key] for key in (
+                        'mode', 'workers', 'url', 'concurrency', 'duration', 'think_time', 'mix',
+                        'users', 'listings', 'reviews',
+                    )},
+                    'elapsed': elapsed,
+                    'endpoints': rows,
+                }, f, indent=2)
+            self.stdout.write(f'\nResults written to {options["json_path"]}')
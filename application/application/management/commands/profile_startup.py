@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from application.startup import SCRAPING_PACKAGES, profile_startup
+
+
+class Command(BaseCommand):
+    help = 'Report what a web worker imports at boot and fail if it pulls in the scraping stack or goes over budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Number of packages and modules to list (default: 15)')
+        parser.add_argument('--budget-ms', type=float, help='Fail if boot imports take longer than this many milliseconds')
+
+    def handle(self, *args, **options):
+        try:
+            profile = profile_startup()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'{len(profile.records)} modules imported in {profile.total_ms:.0f}ms\n')
+        self.stdout.write('Slowest packages (own import time):')
+        for package, ms in profile.package_ms().most_common(options['top']):
+            self.stdout.write(f'  {ms:8.1f}ms  {package}')
+        self.stdout.write('\nSlowest modules (including what they import):')
+        for record in sorted(profile.records, key=lambda record: -record.cumulative_us)[:options['top']]:
+            self.stdout.write(f'  {record.cumulative_us / 1000:8.1f}ms  {record.name}')
+
+        problems = [
+            f'{package} imported at boot: {" <- ".join(chain)}'
+            for package, chain in profile.scraping_imports().items()
+        ]
+        if options['budget_ms'] is not None and profile.total_ms > options['budget_ms']:
+            problems.append(f'Boot imports took {profile.total_ms:.0f}ms, over the {options["budget_ms"]:.0f}ms budget')
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'\nNo scraping packages ({", ".join(SCRAPING_PACKAGES)}) imported at boot'))
@@ -1,12 +1,222 @@
+from contextvars import ContextVar
+from functools import partial
+import cProfile
+import json
+import logging
+import os
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
 from django.http import HttpResponsePermanentRedirect
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, usable in an async middleware chain.
+
+    WhiteNoise only ships a sync middleware, which under ASGI would push
+    every request through a thread. Looking up a static file is a dict
+    lookup, so it is safe to do on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+performance_logger = logging.getLogger('performance')
+
+# SQL counters for the request being served. Context variables follow the
+# request into sync_to_async threads, so queries from async views count too.
+_request_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'sql_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+
+def record_sql(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's metrics"""
+    metrics = _request_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - started
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # Outermost, and first in the list so that connection.execute_wrapper()
+    # blocks open at connect time pop their own wrapper, not this one
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_sql)
+
+
+class PerformanceMiddleware:
+    """
+    Measure wall time, SQL query count and SQL time for every request.
+
+    The numbers go out in a Server-Timing header (visible in the browser's
+    network panel) and, for PERFORMANCE_LOG_SAMPLE_RATE of requests plus
+    every request slower than PERFORMANCE_SLOW_REQUEST_MS, as a JSON line on
+    the "performance" logger. PERFORMANCE_PROFILE_SAMPLE_RATE of sync
+    requests run under cProfile; the profile is kept if the request was slow.
+    Async requests are never profiled: the event loop thread is shared by
+    every request in flight.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+        connection_created.connect(instrument_connection, dispatch_uid='performance-metrics')
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _request_metrics.set(metrics)
+        profiler = self._start_profiler()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            _request_metrics.reset(token)
+        self._report(request, response, metrics, elapsed, profiler)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _request_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_metrics.reset(token)
+        self._report(request, response, metrics, elapsed)
+        return response
+
+    def _start_profiler(self):
+        rate = getattr(settings, 'PERFORMANCE_PROFILE_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one profiler per process at a time
+            return None
+        return profiler
+
+    def _report(self, request, response, metrics, elapsed, profiler=None):
+        elapsed_ms = elapsed * 1000
+        sql_ms = metrics.sql_time * 1000
+
+        if getattr(settings, 'PERFORMANCE_SERVER_TIMING', True):
+            timing = f'app;dur={elapsed_ms:.1f}, db;desc="{metrics.queries} queries";dur={sql_ms:.1f}'
+            if response.has_header('Server-Timing'):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response['Server-Timing'] = timing
+
+        slow = elapsed_ms >= getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 1000)
+        profile_path = None
+        if slow and profiler is not None:
+            profile_path = self._dump_profile(request, profiler, elapsed_ms)
+
+        if slow or random.random() < getattr(settings, 'PERFORMANCE_LOG_SAMPLE_RATE', 1.0):
+            match = request.resolver_match
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'duration_ms': round(elapsed_ms, 1),
+                'db_queries': metrics.queries,
+                'db_ms': round(sql_ms, 1),
+                'slow': slow,
+            }
+            if profile_path:
+                record['profile'] = profile_path
+            performance_logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+
+    def _dump_profile(self, request, profiler, elapsed_ms):
+        """Write a slow request's profile for `python -m pstats` or snakeviz"""
+        profile_dir = getattr(settings, 'PERFORMANCE_PROFILE_DIR', None)
+        if not profile_dir:
+            return None
+        match = request.resolver_match
+        name = (match.view_name if match else 'unresolved').replace(':', '.')
+        path = os.path.join(profile_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{name}-{elapsed_ms:.0f}ms.prof')
+        try:
+            os.makedirs(profile_dir, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError:
+            performance_logger.exception('Could not write request profile to %s', path)
+            return None
+        return path
 
 
 class CanonicalHostMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.canonical_redirect(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.canonical_redirect(request) or await self.get_response(request)
+
+    def canonical_redirect(self, request):
         canonical_host = getattr(settings, 'CANONICAL_HOST', '')
         enforce_canonical_host = getattr(settings, 'ENFORCE_CANONICAL_HOST', False)
 
@@ -15,5 +225,105 @@ class CanonicalHostMiddleware:
             if request_host and request_host != canonical_host:
                 redirect_url = f"{request.scheme}://{canonical_host}{request.get_full_path()}"
                 return HttpResponsePermanentRedirect(redirect_url)
+        return None
+
+
+def session_user_cache_key(user_id):
+    return f'session-user:{user_id}'
+
+
+def forget_session_users(user_ids):
+    """Drop cached rows for users changed outside of Model.save()"""
+    cache.delete_many([session_user_cache_key(user_id) for user_id in user_ids])
+
+
+def load_user(user_id):
+    """
+    Fetch a User row, through the cache when SESSION_USER_CACHE_TIMEOUT is set.
+
+    Cached rows are invalidated whenever a User is saved or deleted.
+    """
+    from .models import User
+
+    timeout = getattr(settings, 'SESSION_USER_CACHE_TIMEOUT', 0)
+    if timeout:
+        user = cache.get(session_user_cache_key(user_id))
+        if user is not None:
+            return user
+
+    try:
+        user = User.objects.get(id=user_id)
+    except (User.DoesNotExist, ValueError, TypeError):
+        return None
+
+    if timeout:
+        cache.set(session_user_cache_key(user_id), user, timeout)
+    return user
+
+
+async def aload_user(user_id):
+    """Async version of load_user()"""
+    from .models import User
+
+    timeout = getattr(settings, 'SESSION_USER_CACHE_TIMEOUT', 0)
+    if timeout:
+        user = await cache.aget(session_user_cache_key(user_id))
+        if user is not None:
+            return user
+
+    try:
+        user = await User.objects.aget(id=user_id)
+    except (User.DoesNotExist, ValueError, TypeError):
+        return None
+
+    if timeout:
+        await cache.aset(session_user_cache_key(user_id), user, timeout)
+    return user
+
+
+def get_session_user(request):
+    """The logged-in User for this request, loaded at most once"""
+    if not hasattr(request, '_cached_app_user'):
+        user_id = request.session.get('user_id')
+        request._cached_app_user = load_user(user_id) if user_id else None
+    return request._cached_app_user
+
+
+async def aget_session_user(request):
+    """Async version of get_session_user(), sharing its per-request memo"""
+    if not hasattr(request, '_cached_app_user'):
+        user_id = await request.session.aget('user_id')
+        request._cached_app_user = await aload_user(user_id) if user_id else None
+    return request._cached_app_user
+
+
+class SessionUserMiddleware:
+    """
+    Expose the session's User as ``request.app_user``.
+
+    The row is only fetched if something touches it, and then only once,
+    however many decorators, views and templates read it. Async views
+    await ``request.aapp_user()`` instead; once either has loaded the user
+    the other reads the same object without a query.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self._attach(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self._attach(request)
+        return await self.get_response(request)
 
-        return self.get_response(request)
\ No newline at end of file
+    def _attach(self, request):
+        request.app_user = SimpleLazyObject(partial(get_session_user, request))
+        request.aapp_user = partial(aget_session_user, request)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='address_key',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.CreateModel(
+            name='CanonicalAddress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Postcode (or town), house number and street', max_length=200, unique=True)),
+                ('postcode', models.CharField(blank=True, max_length=10)),
+                ('number', models.CharField(max_length=20)),
+                ('street', models.CharField(max_length=200)),
+                ('town', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['number', 'postcode'], name='address_number_postcode_idx'), models.Index(fields=['number', 'town'], name='address_number_town_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='canonical_address',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='residents', to='application.canonicaladdress'),
+        ),
+    ]
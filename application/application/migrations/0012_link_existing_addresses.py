@@ -0,0 +1,156 @@
+import re
+
+from django.db import migrations
+
+# Frozen copies of the application.normalizers and application.addresses
+# matching rules, so that changing those later doesn't change what this
+# migration does
+
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b', re.IGNORECASE)
+OUTWARD_CODE_RE = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$', re.IGNORECASE)
+COUNTRY_SUFFIXES = {'uk', 'united kingdom', 'england', 'scotland', 'wales', 'northern ireland', 'gb'}
+STREET_ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ave': 'avenue', 'av': 'avenue', 'ln': 'lane', 'dr': 'drive',
+    'ct': 'court', 'pl': 'place', 'sq': 'square', 'cres': 'crescent', 'gdns': 'gardens',
+    'gdn': 'garden', 'terr': 'terrace', 'ter': 'terrace', 'cl': 'close', 'gr': 'grove',
+    'pde': 'parade', 'hwy': 'highway', 'bldgs': 'buildings', 'wlk': 'walk',
+}
+FLAT_RE = re.compile(r'^(flat|apartment|apt|unit|room)\b\s*(\w+)', re.IGNORECASE)
+NUMBERED_STREET_RE = re.compile(r'^(\d+[a-z]?)(?:\s*-\s*\d+[a-z]?)?\s+(.+)$', re.IGNORECASE)
+STREET_SIMILARITY = 0.5
+
+
+def clean_text(value):
+    value = re.sub(r'[^\w\s]', ' ', str(value or '').lower())
+    return ' '.join(value.split())
+
+
+def location_key(address):
+    parts = []
+    for part in str(address or '').split(','):
+        part = clean_text(POSTCODE_RE.sub('', part))
+        if part and part not in COUNTRY_SUFFIXES and not OUTWARD_CODE_RE.match(part):
+            parts.append(part)
+    return parts[-1][:100] if parts else ''
+
+
+def postcode_key(text):
+    match = POSTCODE_RE.search(str(text or ''))
+    return f'{match.group(1)} {match.group(2)}'.upper() if match else ''
+
+
+def parse_address(address, postcode='', town=''):
+    postcode = postcode_key(postcode) or postcode_key(address)
+    number = street = ''
+    rest = []
+    for part in str(address or '').split(','):
+        match = NUMBERED_STREET_RE.match(FLAT_RE.sub('', POSTCODE_RE.sub('', part)).strip(' ,'))
+        if not number and match and not match.group(2)[:1].isdigit():
+            street = ' '.join(STREET_ABBREVIATIONS.get(word, word) for word in clean_text(match.group(2)).split())
+            number, street = match.group(1).lower()[:20], street[:150]
+        elif not FLAT_RE.match(part.strip()):
+            rest.append(part)
+    return {
+        'postcode': postcode,
+        'number': number,
+        'street': street,
+        'town': clean_text(town)[:100] or location_key(','.join(rest)),
+    }
+
+
+def address_key(parts):
+    if not parts['number'] or not parts['street'] or not (parts['postcode'] or parts['town']):
+        return ''
+    return f"{parts['postcode'] or parts['town']}|{parts['number']}|{parts['street']}"[:200]
+
+
+def trigrams(text):
+    grams = set()
+    for word in clean_text(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def user_address(user):
+    # Without a street number house_flat_number is often a flat number, which
+    # would point at another building
+    if not user.street_number:
+        return {'postcode': '', 'number': '', 'street': '', 'town': ''}
+    return parse_address(f'{user.street_number} {user.street_name}', user.post_code, user.town)
+
+
+ADDRESS_SOURCES = [
+    ('rentreviews', 'RentReview', lambda review: parse_address(review.property_address)),
+    ('market_analysis', 'PropertyListing', lambda listing: parse_address(listing.address, listing.postcode)),
+    ('application', 'User', user_address),
+]
+
+
+def link_existing_addresses(apps, schema_editor):
+    CanonicalAddress = apps.get_model('application', 'CanonicalAddress')
+    # CanonicalAddress is empty before this migration, so every address a row
+    # can match is one registered here and they all fit in memory
+    by_key = {}
+    blocks = {}
+
+    def block_keys(parts):
+        return [(kind, parts[kind], parts['number']) for kind in ('postcode', 'town') if parts[kind]]
+
+    def resolve(parts):
+        key = address_key(parts)
+        if not key:
+            return None
+        if key in by_key:
+            return by_key[key]
+        best, best_similarity = None, 0.0
+        for block in block_keys(parts):
+            for candidate in blocks.get(block, []):
+                if candidate.postcode and parts['postcode']:
+                    same_place = candidate.postcode == parts['postcode']
+                else:
+                    same_place = bool(parts['town']) and candidate.town == parts['town']
+                if same_place:
+                    similarity = trigram_similarity(candidate.street, parts['street'])
+                    if similarity > best_similarity:
+                        best, best_similarity = candidate, similarity
+        if best_similarity >= STREET_SIMILARITY:
+            return best
+        address = CanonicalAddress.objects.create(key=key, **parts)
+        by_key[key] = address
+        for block in block_keys(parts):
+            blocks.setdefault(block, []).append(address)
+        return address
+
+    for app_label, model_name, source in ADDRESS_SOURCES:
+        model = apps.get_model(app_label, model_name)
+        batch = []
+        for row in model.objects.order_by('pk').iterator(chunk_size=1000):
+            parts = source(row)
+            address = resolve(parts)
+            if address is None:
+                continue
+            row.address_key, row.canonical_address_id = address_key(parts), address.pk
+            batch.append(row)
+            if len(batch) == 1000:
+                model.objects.bulk_update(batch, ['address_key', 'canonical_address'])
+                batch = []
+        model.objects.bulk_update(batch, ['address_key', 'canonical_address'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0011_canonical_address'),
+        ('market_analysis', '0004_listing_canonical_address'),
+        ('rentreviews', '0005_review_canonical_address'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_existing_addresses, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,46 @@
+import uuid
+from django.contrib.auth.hashers import check_password, make_password
 from django.db import models
+from .hashers import schedule_rehash
 
-class User(models.Model):
+class AddressLinked(models.Model):
+    """
+    A model that points at the building its address refers to through
+    ``address_key`` and ``canonical_address`` (see application/addresses.py).
+    Saving relinks it only when one of ``address_fields`` changed since it
+    was loaded or last saved.
+    """
+    address_fields = ()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_address = instance.address_state()
+        return instance
+
+    def address_state(self):
+        # Deferred fields are left out rather than fetched
+        deferred = self.get_deferred_fields()
+        return {field: getattr(self, field) for field in self.address_fields if field not in deferred}
+
+    def address_changed(self):
+        saved = getattr(self, '_saved_address', None)
+        return saved is None or bool(self.address_state().items() - saved.items())
+
+    def save(self, *args, **kwargs):
+        from .addresses import link_address
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.address_fields):
+            if self.address_changed() and link_address(self) and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'address_key', 'canonical_address'}
+        super().save(*args, **kwargs)
+        self._saved_address = self.address_state()
+
+
+class User(AddressLinked):
     name = models.CharField(max_length=100, blank=True)
     email = models.EmailField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
@@ -22,6 +62,8 @@ class User(models.Model):
     street_name = models.CharField(max_length=100, blank=True)
     town = models.CharField(max_length=100, blank=True)
     post_code = models.CharField(max_length=20, blank=True)
+    address_key = models.CharField(max_length=200, blank=True, editable=False)
+    canonical_address = models.ForeignKey('CanonicalAddress', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='residents')
     rental_duration = models.CharField(max_length=50, blank=True)
     current_issues = models.TextField(blank=True)
     
@@ -33,5 +75,64 @@ class User(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    address_fields = ('street_number', 'street_name', 'town', 'post_code')
+
+    def __str__(self):
+        return self.name if self.name else f"User {self.id}"
+
+    def get_full_name(self):
+        return self.name
+
+    def set_password(self, raw_password):
+        self.password_hash = make_password(raw_password)
+
+    def check_password(self, raw_password):
+        """
+        Verify a password, upgrading the stored hash if it was made with an
+        outdated hasher or cost (see application/hashers.py).
+        """
+        old_hash = self.password_hash
+
+        def setter(password):
+            schedule_rehash(self.pk, old_hash, password)
+
+        return check_password(raw_password, old_hash, setter)
+
+
+class OnboardingDraft(models.Model):
+    """
+    Onboarding answers given before an account exists.
+
+    Only the token is kept in the session; the answers live here until
+    create_account_submit copies them onto the new User.
+    """
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Onboarding draft {self.token}"
+
+
+class CanonicalAddress(models.Model):
+    """
+    One building, as referred to by reviews, scraped listings and user
+    profiles (see application/addresses.py).
+    """
+    key = models.CharField(max_length=200, unique=True, help_text="Postcode (or town), house number and street")
+    postcode = models.CharField(max_length=10, blank=True)
+    number = models.CharField(max_length=20)
+    street = models.CharField(max_length=200)
+    town = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Candidate blocks for the trigram fallback
+            models.Index(fields=['number', 'postcode'], name='address_number_postcode_idx'),
+            models.Index(fields=['number', 'town'], name='address_number_town_idx'),
+        ]
+
     def __str__(self):
-        return self.name if self.name else f"User {self.id}"
\ No newline at end of file
+        return f"{self.number} {self.street}, {self.postcode or self.town}"
@@ -0,0 +1,195 @@
+"""
+Shared normalisation helpers for free-text property data.
+
+Listings, reviews and user profiles all carry hand-typed addresses; these
+helpers reduce them to stable keys that can be indexed and compared.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+import re
+
+# Full UK postcode, e.g. "M3 7AG", "SW1A 1AA"
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b', re.IGNORECASE)
+# Bare outward code on its own, e.g. "M3", "NW2"
+OUTWARD_CODE_RE = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$', re.IGNORECASE)
+
+COUNTRY_SUFFIXES = {'uk', 'united kingdom', 'england', 'scotland', 'wales', 'northern ireland', 'gb'}
+
+
+def clean_text(value):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    value = re.sub(r'[^\w\s]', ' ', str(value or '').lower())
+    return ' '.join(value.split())
+
+
+def location_key(address, area='', postcode=''):
+    """
+    Reduce a listing address to the town it is in.
+
+    "Northern Quarter, Manchester" -> "manchester"
+    "Flat 2, 5 Blackfriars Road, Salford, M3 7AG" -> "salford"
+
+    The last comma-separated part is taken after stripping postcodes and
+    country names, so any town works without a per-location lookup table.
+    """
+    parts = []
+    for part in str(address or '').split(','):
+        part = clean_text(POSTCODE_RE.sub('', part))
+        if part and part not in COUNTRY_SUFFIXES and not OUTWARD_CODE_RE.match(part):
+            parts.append(part)
+
+    if parts:
+        return parts[-1][:100]
+    return clean_text(area)[:100]
+
+
+# Rent period markers, checked in order; they may follow the amount directly, as in "250pw"
+PERIOD_MARKERS = {
+    'week': r'pw|p/w|per\s*week|a\s*week|weekly|week|wk',
+    'month': r'pcm|pm|p/m|per\s*(?:calendar\s*)?month|a\s*month|monthly|month|mth',
+    'year': r'pa|p/a|per\s*(?:annum|year)|a\s*year|yearly|annually|year',
+}
+RENT_PERIODS = [
+    (period, re.compile(rf'(?<![a-z])(?:{markers})(?![a-z])', re.IGNORECASE))
+    for period, markers in PERIOD_MARKERS.items()
+]
+# An amount written after a pound sign; thousands may be separated by commas or spaces
+CURRENCY_AMOUNT_RE = re.compile(r'(?:£|gbp)\s*(\d{1,3}(?:[,\s]\d{3})+|\d+)(?![\d,])(\.\d+)?(\s*k\b)?', re.IGNORECASE)
+# Any other amount, except a bedroom count as in "2 bed"
+AMOUNT_RE = re.compile(
+    r'(?<![\d.,])(\d{1,3}(?:,\d{3})+|\d+)(?![\d,])(\.\d+)?(\s*k\b)?(?!\s*(?:bed|br\b|b/r))', re.IGNORECASE,
+)
+
+# An amount with no period at or above this is taken to be monthly
+UNLABELLED_MONTHLY_FROM = Decimal('500')
+# Weekly rents outside these are taken to be misreadings rather than rents
+MIN_WEEKLY_RENT = Decimal('20')
+MAX_WEEKLY_RENT = Decimal('20000')
+
+WORD_NUMBERS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+
+
+def weekly_rent(text):
+    """
+    Weekly rent in pounds from a hand-typed price, or None.
+
+    "£1,200 pcm" -> 276.92, "£250pw" -> 250.00, "£15k per year" -> 288.46,
+    "Rent: 2 bed £900pcm" -> 207.69, "£ 1 200 pcm" -> 276.92
+
+    The amount after a pound sign is read if there is one, and otherwise the
+    first number that isn't a bedroom count. Amounts with no period are read
+    as monthly from UNLABELLED_MONTHLY_FROM up and weekly below it, which is
+    how UK rents are usually quoted. A result outside MIN_WEEKLY_RENT and
+    MAX_WEEKLY_RENT is None.
+    """
+    text = str(text or '')
+    match = CURRENCY_AMOUNT_RE.search(text) or AMOUNT_RE.search(text)
+    if not match:
+        return None
+    whole, fraction, thousands = match.groups()
+    amount = Decimal(re.sub(r'[,\s]', '', whole) + (fraction or '')) * (1000 if thousands else 1)
+
+    period = next((name for name, pattern in RENT_PERIODS if pattern.search(text)), None)
+    if period is None:
+        period = 'month' if amount >= UNLABELLED_MONTHLY_FROM else 'week'
+    if period == 'month':
+        amount = amount * 12 / 52
+    elif period == 'year':
+        amount = amount / 52
+    if not MIN_WEEKLY_RENT <= amount <= MAX_WEEKLY_RENT:
+        return None
+    return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def bedroom_count(text):
+    """
+    Number of bedrooms from a hand-typed value, or None.
+
+    "two bed" -> 2, "3 bedrooms" -> 3, "Studio" -> 0
+    """
+    if isinstance(text, int):
+        return text
+    text = clean_text(text)
+    if not text:
+        return None
+    if 'studio' in text:
+        return 0
+    match = re.search(r'\d+', text)
+    if match:
+        return int(match.group())
+    return next((number for word, number in WORD_NUMBERS.items() if re.search(rf'\b{word}\b', text)), None)
+
+
+STREET_ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ave': 'avenue', 'av': 'avenue', 'ln': 'lane', 'dr': 'drive',
+    'ct': 'court', 'pl': 'place', 'sq': 'square', 'cres': 'crescent', 'gdns': 'gardens',
+    'gdn': 'garden', 'terr': 'terrace', 'ter': 'terrace', 'cl': 'close', 'gr': 'grove',
+    'pde': 'parade', 'hwy': 'highway', 'bldgs': 'buildings', 'wlk': 'walk',
+}
+FLAT_RE = re.compile(r'^(flat|apartment|apt|unit|room)\b\s*(\w+)', re.IGNORECASE)
+NUMBERED_STREET_RE = re.compile(r'^(\d+[a-z]?)(?:\s*-\s*\d+[a-z]?)?\s+(.+)$', re.IGNORECASE)
+
+
+def postcode_key(text):
+    """The first full postcode in ``text``, as "M3 7AG", or ''"""
+    match = POSTCODE_RE.search(str(text or ''))
+    return f'{match.group(1)} {match.group(2)}'.upper() if match else ''
+
+
+def street_key(street):
+    """"Blackfriars Rd." and "blackfriars road" -> "blackfriars road\""""
+    return ' '.join(STREET_ABBREVIATIONS.get(word, word) for word in clean_text(street).split())
+
+
+def parse_address(address, postcode='', town=''):
+    """
+    Split a hand-typed address into the parts addresses are matched on.
+
+    "Flat 2, 5 Blackfriars Rd, Salford, M3 7AG"
+        -> {'postcode': 'M3 7AG', 'number': '5', 'street': 'blackfriars road', 'town': 'salford'}
+
+    The number and street are '' when no part looks like "<number> <street>".
+    Flat numbers are dropped: addresses are matched per building.
+    """
+    postcode = postcode_key(postcode) or postcode_key(address)
+    number = street = ''
+    rest = []
+    for part in str(address or '').split(','):
+        match = NUMBERED_STREET_RE.match(FLAT_RE.sub('', POSTCODE_RE.sub('', part)).strip(' ,'))
+        if not number and match and not match.group(2)[:1].isdigit():
+            number, street = match.group(1).lower()[:20], street_key(match.group(2))[:150]
+        elif not FLAT_RE.match(part.strip()):
+            rest.append(part)
+    return {
+        'postcode': postcode,
+        'number': number,
+        'street': street,
+        'town': clean_text(town)[:100] or location_key(','.join(rest)),
+    }
+
+
+def address_key(parts):
+    """
+    Exact-match key for parsed address ``parts``, or '' when they lack a
+    house number, street, or postcode or town to pin a building down.
+    """
+    if not parts['number'] or not parts['street'] or not (parts['postcode'] or parts['town']):
+        return ''
+    return f"{parts['postcode'] or parts['town']}|{parts['number']}|{parts['street']}"[:200]
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and one behind"""
+    grams = set()
+    for word in clean_text(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a, b):
+    """Shared trigrams over all trigrams, 0 to 1, as pg_trgm's similarity()"""
+    a, b = trigrams(a), trigrams(b)
+    return len(a & b) / len(a | b) if a and b else 0.0
@@ -0,0 +1,28 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def subquery_count(queryset, outer_field, outer_ref='pk'):
+    """
+    Correlated ``COUNT(*)`` for annotating a parent queryset.
+
+    Unlike ``Count('relation', distinct=True)`` this does not join every
+    relation into the outer query, so several counts can be annotated
+    side by side without multiplying rows.
+    """
+    counted = (
+        queryset.filter(**{outer_field: OuterRef(outer_ref)})
+        .order_by()
+        .values(outer_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def reverse_relations(model):
+    """Return the auto-created one-to-many relations pointing at ``model``."""
+    return [
+        field for field in model._meta.get_fields()
+        if field.auto_created and field.one_to_many
+    ]
@@ -64,12 +64,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'application.middleware.StaticFilesMiddleware',
+    'application.middleware.PerformanceMiddleware',
     'application.middleware.CanonicalHostMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'application.middleware.SessionUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -178,6 +180,147 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Caching. Each process gets its own in-memory cache unless REDIS_URL points
+# at a shared one.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bruce',
+        }
+    }
+
+# Web worker processes; gunicorn reads the same variable (default 1)
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)
+
+# Sessions are read from the cache and written through to the database, so
+# they survive restarts but most requests don't touch django_session
+# (bench_sessions: 0.2 queries and ~190us per request, against 1.2 and
+# ~860us for db). The cache must be the only one serving the sessions:
+# Redis, or the in-memory cache of a single web worker. Several workers
+# without Redis would each keep serving a session another had changed or
+# logged out, so they read sessions from the database. Set WEB_CONCURRENCY
+# to the total when running several instances.
+SESSION_ENGINE = config(
+    'SESSION_ENGINE',
+    default='django.contrib.sessions.backends.cached_db' if REDIS_URL or WEB_CONCURRENCY == 1
+    else 'django.contrib.sessions.backends.db',
+)
+
+# Password hashing (see application/hashers.py). Hashes made with another
+# hasher or cost are upgraded on the user's next login.
+# Argon2 needs argon2-cffi installed.
+_PASSWORD_HASHERS = {
+    'scrypt': 'application.hashers.TunedScryptPasswordHasher',
+    'pbkdf2': 'application.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'application.hashers.TunedArgon2PasswordHasher',
+}
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='scrypt')
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+# scrypt: n=2**14, r=8 uses 16MB and ~50ms of one core per check
+PASSWORD_SCRYPT_WORK_FACTOR = config('PASSWORD_SCRYPT_WORK_FACTOR', default=2**14, cast=int)
+PASSWORD_SCRYPT_BLOCK_SIZE = config('PASSWORD_SCRYPT_BLOCK_SIZE', default=8, cast=int)
+PASSWORD_SCRYPT_PARALLELISM = config('PASSWORD_SCRYPT_PARALLELISM', default=1, cast=int)
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=19456, cast=int)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=1, cast=int)
+PASSWORD_REHASH_IN_BACKGROUND = config('PASSWORD_REHASH_IN_BACKGROUND', default=True, cast=bool)
+# Upgrades waiting for the background thread hold plaintext passwords, so
+# only this many may wait; the rest are upgraded on a later login
+PASSWORD_REHASH_QUEUE = config('PASSWORD_REHASH_QUEUE', default=32, cast=int)
+
+# Issue photos are stored as uploaded; WebP and JPEG renditions at these
+# widths are generated on a background thread (see report_issue/images.py)
+ISSUE_PHOTO_WIDTHS = [int(width) for width in config('ISSUE_PHOTO_WIDTHS', default='320,640,1280').split(',')]
+ISSUE_PHOTO_PROCESS_IN_BACKGROUND = config('ISSUE_PHOTO_PROCESS_IN_BACKGROUND', default=True, cast=bool)
+ISSUE_PHOTO_WORKERS = config('ISSUE_PHOTO_WORKERS', default=1, cast=int)
+
+# Hash uploads while they stream in, for content-addressed photo storage
+# (see application/uploadhandlers.py and report_issue.models.PhotoBlob)
+FILE_UPLOAD_HANDLERS = [
+    'application.uploadhandlers.HashingMemoryFileUploadHandler',
+    'application.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Issue emails are queued and delivered in batches over one SMTP connection
+# (see report_issue/outbox.py): right after queuing on a background thread,
+# and by `manage.py send_queued_emails` for retries
+EMAIL_OUTBOX_SEND_IN_BACKGROUND = config('EMAIL_OUTBOX_SEND_IN_BACKGROUND', default=True, cast=bool)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=100, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+EMAIL_OUTBOX_RETRY_DELAY = config('EMAIL_OUTBOX_RETRY_DELAY', default=60, cast=int)  # seconds, doubled per attempt
+EMAIL_OUTBOX_CLAIM_TIMEOUT = config('EMAIL_OUTBOX_CLAIM_TIMEOUT', default=600, cast=int)
+
+# Automatic reminders and escalation (`manage.py escalate_issues`, see
+# report_issue/escalation.py): open issues past their deadline or open for
+# ISSUE_STALE_DAYS get a step every ISSUE_FOLLOW_UP_DAYS
+ISSUE_STALE_DAYS = config('ISSUE_STALE_DAYS', default=14, cast=int)
+ISSUE_FOLLOW_UP_DAYS = config('ISSUE_FOLLOW_UP_DAYS', default=7, cast=int)
+ISSUE_AUTO_REMINDERS = config('ISSUE_AUTO_REMINDERS', default=2, cast=int)
+
+# Threads per process for blocking calls (scraping, SMTP) made from async
+# views under SERVER_MODE=asgi (see application/executors.py)
+BLOCKING_IO_THREADS = config('BLOCKING_IO_THREADS', default=32, cast=int)
+
+# Listing sources searched for a market analysis (see market_analysis/sources.py),
+# in parallel on up to LISTING_SOURCE_THREADS threads per search. LISTING_SOURCES
+# names the sources to use (blank for each source's default), and a source
+# that hasn't answered after its deadline is left out of the results.
+LISTING_SOURCES = [name.strip() for name in config('LISTING_SOURCES', default='').split(',') if name.strip()]
+LISTING_SOURCE_THREADS = config('LISTING_SOURCE_THREADS', default=8, cast=int)
+LISTING_SOURCE_DEADLINE = config('LISTING_SOURCE_DEADLINE', default=20, cast=float)  # seconds, unless a source sets its own
+# A scraping job still "running" after this long was cut off (e.g. by a worker
+# restart) and no longer stops the user starting another
+SCRAPING_JOB_TIMEOUT = config('SCRAPING_JOB_TIMEOUT', default=600, cast=int)  # seconds
+
+# Politeness and circuit breaking per scraped site (see market_analysis/throttle.py),
+# shared by all workers through a ScrapeDomainState row: the delay between requests follows
+# response times within these bounds, and a site's breaker opens for
+# SCRAPE_BREAKER_COOLDOWN seconds after SCRAPE_BREAKER_FAILURES failures in a row
+SCRAPE_MIN_DELAY = config('SCRAPE_MIN_DELAY', default=1.0, cast=float)  # seconds
+SCRAPE_MAX_DELAY = config('SCRAPE_MAX_DELAY', default=60.0, cast=float)
+SCRAPE_BREAKER_FAILURES = config('SCRAPE_BREAKER_FAILURES', default=5, cast=int)
+SCRAPE_BREAKER_COOLDOWN = config('SCRAPE_BREAKER_COOLDOWN', default=300, cast=int)  # seconds
+
+# Per-request timing (see PerformanceMiddleware): a Server-Timing header and
+# a JSON line on the "performance" logger for a sample of requests, always
+# for slow ones. A sample of requests is profiled and the profile written to
+# PERFORMANCE_PROFILE_DIR if the request turned out to be slow.
+PERFORMANCE_METRICS_ENABLED = config('PERFORMANCE_METRICS_ENABLED', default=True, cast=bool)
+PERFORMANCE_SERVER_TIMING = config('PERFORMANCE_SERVER_TIMING', default=True, cast=bool)
+PERFORMANCE_LOG_SAMPLE_RATE = config('PERFORMANCE_LOG_SAMPLE_RATE', default=1.0, cast=float)
+PERFORMANCE_SLOW_REQUEST_MS = config('PERFORMANCE_SLOW_REQUEST_MS', default=1000, cast=int)
+PERFORMANCE_PROFILE_SAMPLE_RATE = config('PERFORMANCE_PROFILE_SAMPLE_RATE', default=0.01, cast=float)
+PERFORMANCE_PROFILE_DIR = config('PERFORMANCE_PROFILE_DIR', default=os.path.join(BASE_DIR, 'logs', 'profiles'))
+
+# Seconds to cache the logged-in user's row between requests (0 disables).
+# Changes clear the row only from the cache of the worker making them, so
+# enable this only with Redis or a single web worker, as for SESSION_ENGINE;
+# otherwise other workers would serve the old row until it expires.
+SESSION_USER_CACHE_TIMEOUT = config('SESSION_USER_CACHE_TIMEOUT', default=0, cast=int)
+
+# Seconds each process keeps issue categories and templates in memory (0
+# disables). Edits clear it at once; other processes see them within this
+# time, or on their next request when REDIS_URL is set. See report_issue/reference.py.
+REFERENCE_DATA_CACHE_TIMEOUT = config('REFERENCE_DATA_CACHE_TIMEOUT', default=300, cast=int)
+
+# Ingest-time listing gate (see market_analysis/gating.py)
+LISTING_GATE_ENABLED = config('LISTING_GATE_ENABLED', default=True, cast=bool)
+LISTING_GATE_K = config('LISTING_GATE_K', default=1.5, cast=float)
+LISTING_GATE_MIN_SAMPLES = config('LISTING_GATE_MIN_SAMPLES', default=20, cast=int)
+LISTING_GATE_REFRESH_SECONDS = config('LISTING_GATE_REFRESH_SECONDS', default=300, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -216,5 +359,10 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': False,
         },
+        'performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .middleware import forget_session_users
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_session_user(sender, instance, **kwargs):
+    forget_session_users([instance.pk])
@@ -0,0 +1,104 @@
+"""
+What a web worker imports before serving its first request, and what each
+module costs.
+
+profile_startup() boots the app in a fresh interpreter under
+``python -X importtime``, loading the WSGI application as gunicorn does and
+then the URLconf, which imports every view module. The scraping stack
+(Scrapy, Twisted, requests, BeautifulSoup and the scraper modules) must
+not show up: views import it on first use, since most workers never scrape.
+"""
+from collections import Counter
+from dataclasses import dataclass
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+BOOT_CODE = (
+    'from application.wsgi import application; '
+    'from django.urls import get_resolver; '
+    'get_resolver().url_patterns'
+)
+
+# Top-level packages only scraping needs
+SCRAPING_PACKAGES = (
+    'scrapy', 'twisted', 'requests', 'bs4', 'scrapers', 'simple_scraper', 'auto_populate_locations',
+)
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+    importer: str = ''
+
+    @property
+    def package(self):
+        return self.name.split('.')[0]
+
+
+def parse_importtime(output):
+    """ImportRecords from ``-X importtime`` output, each with the module that first imported it"""
+    records, waiting = [], {}
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        record = ImportRecord(match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2)
+        # A module is listed after everything it imported, one level deeper
+        for child in waiting.pop(record.depth + 1, []):
+            child.importer = record.name
+        waiting.setdefault(record.depth, []).append(record)
+        records.append(record)
+    return records
+
+
+class StartupProfile:
+    def __init__(self, records):
+        self.records = records
+        self.by_name = {record.name: record for record in records}
+
+    @property
+    def total_ms(self):
+        return sum(record.self_us for record in self.records) / 1000
+
+    def package_ms(self):
+        """Import time per top-level package, in milliseconds"""
+        totals = Counter()
+        for record in self.records:
+            totals[record.package] += record.self_us / 1000
+        return totals
+
+    def import_chain(self, name):
+        """``name`` and the modules that led to it being imported, outermost last"""
+        chain = [name]
+        while self.by_name.get(chain[-1]) and self.by_name[chain[-1]].importer:
+            chain.append(self.by_name[chain[-1]].importer)
+        return chain
+
+    def scraping_imports(self):
+        """Import chain of the first module of each scraping package the boot pulled in"""
+        chains = {}
+        for record in self.records:
+            if record.package in SCRAPING_PACKAGES and record.package not in chains:
+                chains[record.package] = self.import_chain(record.name)
+        return chains
+
+
+def profile_startup():
+    """Boot the app in a subprocess and return its StartupProfile"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'application.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_CODE],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f'App failed to boot:\n{result.stderr[-2000:]}')
+    return StartupProfile(parse_importtime(result.stderr))
@@ -0,0 +1,567 @@
+"""
+Query budgets for every view.
+
+Each URL in application/urls.py and the app URLconfs it includes is
+requested against seeded data at two sizes. A view fails if it runs more
+queries with more data (an N+1, e.g. a template touching ``issue.category``
+per row) or more queries than its budget in query_budgets.json.
+
+Every URL needs a manifest entry: a ``budget``, or a ``skip`` with the
+reason the view can't be exercised yet. Entries can also give ``method``,
+``data``, ``content_type``, ``login`` (default true) and URL ``kwargs``; a kwarg written ``@issue`` takes the pk of the
+seeded fixture of that name.
+
+After an intentional change, rewrite the budgets from the measured counts:
+
+    UPDATE_QUERY_BUDGETS=1 python manage.py test application
+
+StartupImportTests also checks that booting a web worker doesn't import the
+scraping stack (see application/startup.py and ``manage.py profile_startup``),
+NormalizerTests the parsers in application/normalizers.py,
+AddressLinkingTests the building matching in application/addresses.py,
+PasswordRehashTests the hash upgrades in application/hashers.py,
+UserExportTests that ``manage.py export_users`` re-imports with
+import_users_from_csv.py, and SessionUserTests and RequestMetricsTests the
+user loading and query counting in application/middleware.py.
+"""
+import asyncio
+from collections import Counter
+from contextlib import redirect_stdout
+import csv
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+from importlib import import_module
+from io import StringIO
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps as django_apps
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from import_users_from_csv import import_users_from_csv
+from market_analysis.models import MarketAnalysis, PropertyListing, ScrapingJob
+from rentreviews.models import RentReview
+from report_issue.models import (
+    ComplianceAssessment, ContactDetails, EmailTemplate, IssueCategory, IssueEmail, IssuePhoto,
+    IssueTemplate, IssueUpdate, PropertyIssue,
+)
+from . import hashers
+from .middleware import PerformanceMiddleware, SessionUserMiddleware, forget_session_users, load_user
+from .models import CanonicalAddress, User
+from .normalizers import (
+    address_key, bedroom_count, location_key, parse_address, postcode_key, street_key, weekly_rent,
+)
+from .startup import profile_startup
+
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), 'query_budgets.json')
+
+# Third-party URLconfs mounted in application/urls.py that aren't ours to budget
+EXCLUDED_NAMESPACES = {'admin'}
+
+SMALL, LARGE = 2, 12
+
+
+def iter_url_names(resolver=None, namespace=None):
+    """Yield the name of every URL pattern, namespaced like reverse() expects"""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            child_namespace = pattern.namespace or namespace
+            if pattern.namespace and namespace:
+                child_namespace = f'{namespace}:{pattern.namespace}'
+            if child_namespace in EXCLUDED_NAMESPACES:
+                continue
+            yield from iter_url_names(pattern, child_namespace)
+        elif isinstance(pattern, URLPattern):
+            name = pattern.name or str(pattern.pattern)
+            yield f'{namespace}:{name}' if namespace else name
+
+
+def load_manifest():
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    """One view per line, so budget changes read well in a diff"""
+    lines = [f'  {json.dumps(name)}: {json.dumps(entry)}' for name, entry in manifest.items()]
+    with open(MANIFEST_PATH, 'w') as f:
+        f.write('{\n' + ',\n'.join(lines) + '\n}\n')
+
+
+class QueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The honeypot and the performance middleware log every request
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.manifest = load_manifest()
+        self.user = User.objects.create(
+            username='budget', email='budget@example.com', name='Budget Tester',
+            property_type='flat', bedrooms=2, weekly_rent=Decimal('250'), town='Manchester',
+            post_code='M1 1AA', onboarding_complete=True,
+        )
+        ContactDetails.objects.create(
+            user=self.user, primary_contact='landlord', landlord_contact_name='Landlord',
+            landlord_email='landlord@example.com',
+        )
+        self.analysis = MarketAnalysis.objects.create(
+            user=self.user, property_type='flat', bedrooms=2, search_area='Manchester',
+        )
+        self.fixtures = {
+            'job': ScrapingJob.objects.create(
+                user=self.user, property_type='flat', bedrooms=2, location='Manchester', status='completed',
+            ),
+        }
+        self.seeded = 0
+
+    def seed(self, count):
+        """Grow every list a view might render by ``count`` rows"""
+        now = timezone.now()
+        start, self.seeded = self.seeded, self.seeded + count
+        for i in range(start, self.seeded):
+            author = User.objects.create(username=f'author{i}', email=f'author{i}@example.com', name=f'Author {i}')
+            category = IssueCategory.objects.create(name=f'Category {i}', icon='wrench')
+            IssueTemplate.objects.create(
+                name=f'Template {i}', category=category, title_template='Title',
+                description_template='Description', suggested_priority='medium',
+            )
+            EmailTemplate.objects.create(
+                name=f'Email {i}', template_type='initial', subject_template='Subject', body_template='Body',
+            )
+            issue = PropertyIssue.objects.create(
+                user=self.user, title=f'Issue {i}', description='Leak', category=category,
+                status='submitted', location='Kitchen', is_urgent=i % 2 == 0,
+                deadline=(now - timedelta(days=1)).date(),
+            )
+            PropertyIssue.objects.filter(pk=issue.pk).update(submitted_at=now - timedelta(days=10))
+            # Detail pages render the first issue, so it gains children every round too
+            for parent in {issue, self.fixtures.setdefault('issue', issue)}:
+                # bulk_create: IssuePhoto.save() would hash and store the (nonexistent) file
+                IssuePhoto.objects.bulk_create([
+                    IssuePhoto(issue=parent, image=f'issue_photos/{parent.pk}/{i}.jpg', caption='Photo'),
+                ])
+                IssueEmail.objects.create(
+                    issue=parent, email_type='initial', to_email='landlord@example.com',
+                    subject='Subject', body='Body', sent_by=author,
+                )
+                IssueUpdate.objects.create(issue=parent, update_type='user_note', notes='Note', created_by=author)
+            ComplianceAssessment.objects.create(
+                user=self.user, total_items=2, compliant_items=1, compliance_percentage=50.0,
+                answers={'smoke_detectors': False, 'locks': True},
+                completed_at=now - timedelta(minutes=i),
+            )
+            review = RentReview.objects.create(
+                user=author, property_address=f'{i} Review Street', overall_rating=4,
+                title=f'Review {i}', review_text='Fine',
+            )
+            self.fixtures.setdefault('review', review)
+            listing = PropertyListing.objects.create(
+                title=f'Flat {i}', address=f'{i} Test Street, Manchester', weekly_rent=Decimal(200 + i),
+                monthly_rent=Decimal(200 + i) * 52 / 12,
+                bedrooms=2, property_type='flat', source='test', source_url='#', source_id=f'budget_{i}',
+                scraped_at=now,
+            )
+            self.analysis.comparable_properties.add(listing)
+            old_analysis = MarketAnalysis.objects.create(
+                user=self.user, property_type='flat', bedrooms=2, search_area='Manchester',
+            )
+            MarketAnalysis.objects.filter(pk=old_analysis.pk).update(created_at=now - timedelta(days=30 + i))
+
+    def client_for(self, entry):
+        client = Client()
+        if entry.get('login', True):
+            session = client.session
+            session.update({'user_id': self.user.id, 'username': self.user.username, 'is_authenticated': True})
+            session.save()
+        return client
+
+    def url_for(self, name, entry):
+        kwargs = {
+            key: self.fixtures[value[1:]].pk if isinstance(value, str) and value.startswith('@') else value
+            for key, value in entry.get('kwargs', {}).items()
+        }
+        return reverse(name, kwargs=kwargs)
+
+    def measure(self, name, entry):
+        """
+        The queries one request runs, after a warm-up request has filled the
+        session caches. Copied out straight away: CaptureQueriesContext slices
+        the connection's bounded query log lazily.
+        """
+        client = self.client_for(entry)
+        url = self.url_for(name, entry)
+        request = partial(getattr(client, entry.get('method', 'get')), url, entry.get('data', {}), secure=True)
+        if 'content_type' in entry:
+            request = partial(request, content_type=entry['content_type'])
+        # Roll back whatever the view writes so it can't change what later views see
+        with transaction.atomic():
+            request()
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 500, f'{name} returned {response.status_code}')
+        return list(queries.captured_queries)
+
+    def test_every_url_has_a_budget(self):
+        missing = sorted(set(iter_url_names()) - set(self.manifest))
+        self.assertFalse(missing, f'Add entries for these URLs to {os.path.basename(MANIFEST_PATH)}: {missing}')
+        stale = sorted(set(self.manifest) - set(iter_url_names()))
+        self.assertFalse(stale, f'Remove entries for URLs that no longer exist: {stale}')
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        entries = {name: entry for name, entry in self.manifest.items() if 'skip' not in entry}
+
+        self.seed(SMALL)
+        small = {name: len(self.measure(name, entry)) for name, entry in entries.items()}
+        self.seed(LARGE - SMALL)
+        large = {name: self.measure(name, entry) for name, entry in entries.items()}
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            for name, queries in large.items():
+                self.manifest[name]['budget'] = len(queries)
+            save_manifest(self.manifest)
+
+        for name, entry in entries.items():
+            with self.subTest(view=name):
+                queries = large[name]
+                if len(queries) != small[name]:
+                    sql, times = Counter(re.sub(r"\b\d+\b|'[^']*'", '?', q['sql']) for q in queries).most_common(1)[0]
+                    self.fail(
+                        f'{name} ran {small[name]} queries with {SMALL} rows per table and {len(queries)} '
+                        f'with {LARGE}. Most repeated ({times}x): {sql}'
+                    )
+                self.assertLessEqual(
+                    len(queries), entry['budget'],
+                    f'{name} ran {len(queries)} queries, budget is {entry["budget"]}',
+                )
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_web_worker_boot_skips_scraping_stack(self):
+        chains = profile_startup().scraping_imports()
+        self.assertFalse(chains, 'Imported at boot; import these where they are used instead: ' + '; '.join(
+            ' <- '.join(chain) for chain in chains.values()
+        ))
+
+
+class NormalizerTests(SimpleTestCase):
+    def test_weekly_rent(self):
+        cases = {
+            '£1,200 pcm': Decimal('276.92'),
+            '£250pw': Decimal('250.00'),
+            '£15k per year': Decimal('288.46'),
+            # The amount after the pound sign, not the bedroom count
+            'Rent: 2 bed £900pcm': Decimal('207.69'),
+            '2 bed 900pcm': Decimal('207.69'),
+            # Thousands separated by a space
+            '£ 1 200 pcm': Decimal('276.92'),
+            # No period: monthly from UNLABELLED_MONTHLY_FROM up, weekly below
+            '900': Decimal('207.69'),
+            '250': Decimal('250.00'),
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(weekly_rent(text), expected)
+
+    def test_weekly_rent_rejects_implausible_amounts(self):
+        for text in ['', 'ask the landlord', '£0', '£5 pw', '£2', '£5,000,000 pcm']:
+            with self.subTest(text=text):
+                self.assertIsNone(weekly_rent(text))
+
+    def test_bedroom_count(self):
+        for text, expected in {'two bed': 2, '3 bedrooms': 3, 'Studio': 0, '': None}.items():
+            with self.subTest(text=text):
+                self.assertEqual(bedroom_count(text), expected)
+
+    def test_location_key(self):
+        self.assertEqual(location_key('Northern Quarter, Manchester'), 'manchester')
+        self.assertEqual(location_key('Flat 2, 5 Blackfriars Road, Salford, M3 7AG'), 'salford')
+
+    def test_parse_address(self):
+        parts = parse_address('Flat 2, 5 Blackfriars Rd, Salford, M3 7AG')
+        self.assertEqual(parts, {'postcode': 'M3 7AG', 'number': '5', 'street': 'blackfriars road', 'town': 'salford'})
+        self.assertEqual(address_key(parts), 'M3 7AG|5|blackfriars road')
+        # No house number: no building to pin down
+        self.assertEqual(address_key(parse_address('Blackfriars Road, Salford')), '')
+
+    def test_street_and_postcode_keys(self):
+        self.assertEqual(street_key('Blackfriars Rd.'), 'blackfriars road')
+        self.assertEqual(street_key('blackfriars road'), 'blackfriars road')
+        self.assertEqual(postcode_key('5 Blackfriars Road, m37ag'), 'M3 7AG')
+
+
+class AddressLinkingTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='author@example.com', name='Author')
+
+    def review(self, address):
+        return RentReview.objects.create(
+            user=self.author, property_address=address, overall_rating=4, title='Review', review_text='Fine',
+        )
+
+    def listing(self, address, postcode='', source_id='1'):
+        return PropertyListing.objects.create(
+            title='Flat', address=address, postcode=postcode, weekly_rent=Decimal(200), monthly_rent=Decimal(866),
+            bedrooms=2, property_type='flat', source='test', source_url='#', source_id=source_id,
+        )
+
+    def test_same_building_written_differently_shares_an_address(self):
+        review = self.review('Flat 2, 5 Blackfriars Rd, Salford, M3 7AG')
+        listing = self.listing('5 Blackfriars Road, Salford', postcode='M3 7AG')
+        # A misspelt street in the same block is matched by trigrams
+        misspelt = self.review('5 Blackfriers Road, M3 7AG')
+        self.assertIsNotNone(review.canonical_address_id)
+        self.assertEqual(listing.canonical_address_id, review.canonical_address_id)
+        self.assertEqual(misspelt.canonical_address_id, review.canonical_address_id)
+
+    def test_neighbouring_house_is_another_building(self):
+        review = self.review('5 Blackfriars Road, Salford, M3 7AG')
+        neighbour = self.review('7 Blackfriars Road, Salford, M3 7AG')
+        self.assertNotEqual(neighbour.canonical_address_id, review.canonical_address_id)
+
+    def test_user_without_street_number_is_not_linked(self):
+        self.review('2 Oak Street, Leeds, LS1 1AA')
+        # house_flat_number is a flat number here, not the building's
+        user = User.objects.create(
+            username='resident', house_flat_number='2', street_name='Oak Street', town='Leeds', post_code='LS1 1AA',
+        )
+        self.assertEqual(user.address_key, '')
+        self.assertIsNone(user.canonical_address_id)
+
+        user.street_number = '2'
+        user.save()
+        self.assertEqual(user.address_key, 'LS1 1AA|2|oak street')
+        self.assertIsNotNone(user.canonical_address_id)
+
+    def test_only_an_address_change_relinks(self):
+        review = self.review('5 Blackfriars Road, Salford, M3 7AG')
+        review = RentReview.objects.get(pk=review.pk)
+        with CaptureQueriesContext(connection) as queries:
+            review.title = 'Edited'
+            review.save()
+        self.assertFalse([query for query in queries if 'application_canonicaladdress' in query['sql']])
+
+        review.property_address = '9 Market Street, Salford, M3 7AG'
+        review.save()
+        review.refresh_from_db()
+        self.assertEqual(review.address_key, 'M3 7AG|9|market street')
+        self.assertEqual(review.canonical_address.street, 'market street')
+
+    def test_migration_links_rows_as_saving_does(self):
+        link_existing_addresses = import_module('application.migrations.0012_link_existing_addresses').link_existing_addresses
+        saved = [self.review('Flat 2, 5 Blackfriars Rd, Salford, M3 7AG'), self.listing('5 Blackfriars Road, Salford', 'M3 7AG')]
+        RentReview.objects.update(address_key='', canonical_address=None)
+        PropertyListing.objects.update(address_key='', canonical_address=None)
+        CanonicalAddress.objects.all().delete()
+
+        link_existing_addresses(django_apps, None)
+        review, listing = RentReview.objects.get(), PropertyListing.objects.get()
+        self.assertEqual(review.address_key, saved[0].address_key)
+        self.assertEqual(listing.address_key, saved[1].address_key)
+        self.assertEqual(review.canonical_address_id, listing.canonical_address_id)
+        self.assertEqual(CanonicalAddress.objects.count(), 1)
+
+
+@override_settings(PASSWORD_REHASH_IN_BACKGROUND=False, PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordRehashTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Upgrades and a full queue are logged
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create(
+            username='tenant', email='tenant@example.com', name='Tenant',
+            password_hash=make_password('correct horse', hasher='pbkdf2_sha256'),
+        )
+
+    def stored_hash(self):
+        return User.objects.get(pk=self.user.pk).password_hash
+
+    def test_legacy_pbkdf2_hash_is_upgraded_on_login(self):
+        self.assertTrue(self.user.check_password('correct horse'))
+        upgraded = self.stored_hash()
+        self.assertTrue(upgraded.startswith('scrypt$'))
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('correct horse'))
+        self.assertEqual(self.stored_hash(), upgraded)
+
+    def test_hash_changed_meanwhile_is_left_alone(self):
+        old_hash = self.user.password_hash
+        # The password was changed between the login check and the upgrade
+        User.objects.filter(pk=self.user.pk).update(password_hash=make_password('new password'))
+        changed = self.stored_hash()
+        hashers.rehash_password(self.user.pk, old_hash, 'correct horse')
+        self.assertEqual(self.stored_hash(), changed)
+
+    @override_settings(PASSWORD_REHASH_IN_BACKGROUND=True)
+    def test_upgrade_is_skipped_when_the_queue_is_full(self):
+        hashers._get_rehash_pool()
+        with mock.patch.object(hashers, '_rehash_slots', threading.BoundedSemaphore(1)) as slots:
+            slots.acquire()
+            with mock.patch.object(hashers, '_rehash_in_background') as rehash:
+                self.assertFalse(hashers.schedule_rehash(self.user.pk, self.user.password_hash, 'correct horse'))
+        rehash.assert_not_called()
+        # The old hash stays valid until a later login upgrades it
+        self.assertEqual(self.stored_hash(), self.user.password_hash)
+
+
+class UserExportTests(TestCase):
+
+    def setUp(self):
+        self.tenant = User.objects.create(
+            username='tenant', email='tenant@example.com', name='Tenant', bedrooms=2, weekly_rent=Decimal('250.00'),
+            has_lounge=True, street_number='5', street_name='Blackfriars Road', town='Salford', post_code='M3 7AG',
+            password_hash=make_password('correct horse', hasher='pbkdf2_sha256'),
+        )
+        RentReview.objects.create(
+            user=self.tenant, property_address='5 Blackfriars Road, Salford', overall_rating=4, title='Fine', review_text='Fine',
+        )
+        PropertyIssue.objects.create(user=self.tenant, title='Damp', description='Damp wall', location='Bedroom')
+        self.newcomer = User.objects.create(username='newcomer', email='newcomer@example.com')
+        # Exported a day after signing up
+        User.objects.update(created_at=timezone.now() - timedelta(days=1), updated_at=timezone.now() - timedelta(hours=1))
+
+    def export(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'users.csv')
+        call_command('export_users', '--output', path, stdout=StringIO())
+        with open(path, newline='', encoding='utf-8') as f:
+            return path, {row['username']: row for row in csv.DictReader(f)}
+
+    def test_export_counts_related_rows(self):
+        _, rows = self.export()
+        self.assertEqual((rows['tenant']['rent_reviews'], rows['tenant']['property_issues']), ('1', '1'))
+        self.assertEqual((rows['newcomer']['rent_reviews'], rows['newcomer']['property_issues']), ('0', '0'))
+
+    def test_export_re_imports_unchanged(self):
+        path, exported = self.export()
+        # One user edited since the export, the other gone
+        User.objects.filter(pk=self.tenant.pk).update(name='Renamed', bedrooms=None, has_lounge=False)
+        self.newcomer.delete()
+
+        with redirect_stdout(StringIO()):
+            self.assertTrue(import_users_from_csv(path))
+        _, imported = self.export()
+        # The deleted user comes back under a new id
+        for row in (*exported.values(), *imported.values()):
+            del row['id']
+        self.assertEqual(imported, exported)
+
+
+class SessionUserTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.session = {'user_id': self.user.pk}
+        SessionUserMiddleware(lambda request: HttpResponse())(request)
+        return request
+
+    def test_user_is_loaded_once_per_request(self):
+        request = self.request()
+        with self.assertNumQueries(1):
+            self.assertEqual(request.app_user.name, 'Tenant')
+            self.assertEqual(request.app_user.pk, self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(request.aapp_user)().pk, self.user.pk)
+
+    def test_user_is_not_cached_between_requests_by_default(self):
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.request().app_user.name
+
+    @override_settings(SESSION_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_is_dropped_when_saved(self):
+        self.request().app_user.name
+        with self.assertNumQueries(0):
+            self.assertEqual(self.request().app_user.name, 'Tenant')
+
+        self.user.name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.request().app_user.name, 'Renamed')
+
+    @override_settings(SESSION_USER_CACHE_TIMEOUT=60)
+    def test_cached_user_is_dropped_when_updated_in_bulk(self):
+        load_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(name='Renamed')
+        # update() sends no signal; callers forget the rows themselves
+        forget_session_users([self.user.pk])
+        self.assertEqual(load_user(self.user.pk).name, 'Renamed')
+
+    @override_settings(SESSION_USER_CACHE_TIMEOUT=60, PASSWORD_REHASH_IN_BACKGROUND=False)
+    def test_cached_user_is_dropped_when_its_hash_is_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(password_hash=make_password('correct horse', hasher='pbkdf2_sha256'))
+        user = load_user(self.user.pk)
+        self.assertTrue(user.check_password('correct horse'))
+        self.assertTrue(load_user(self.user.pk).password_hash.startswith('scrypt$'))
+
+
+@override_settings(PERFORMANCE_LOG_SAMPLE_RATE=0, PERFORMANCE_SLOW_REQUEST_MS=60_000)
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+
+    def queries_reported(self, response):
+        return int(re.search(r'"(\d+) queries"', response['Server-Timing']).group(1))
+
+    def test_concurrent_async_requests_count_their_own_queries(self):
+        async def view(request):
+            for _ in range(request.queries):
+                await sync_to_async(User.objects.count)()
+                # Let the other request run between queries
+                await asyncio.sleep(0)
+            return HttpResponse()
+
+        middleware = PerformanceMiddleware(view)
+
+        async def serve(queries):
+            request = RequestFactory().get('/')
+            request.queries = queries
+            return await middleware(request)
+
+        async def serve_together():
+            return await asyncio.gather(serve(3), serve(1), serve(0))
+
+        responses = async_to_sync(serve_together)()
+        self.assertEqual([self.queries_reported(response) for response in responses], [3, 1, 0])
+        # Nothing is left counting once the requests are done
+        User.objects.count()
+        self.assertEqual(self.queries_reported(async_to_sync(serve)(0)), 0)
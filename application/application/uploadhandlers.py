@@ -0,0 +1,38 @@
+"""
+Upload handlers that hash files as they stream in.
+
+Each uploaded file gets a ``sha256`` attribute, computed chunk by chunk while
+Django writes it to memory or a temporary file, so content-addressed storage
+(report_issue.models.PhotoBlob) doesn't have to read the upload a second time.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class ContentHashMixin:
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): MemoryFileUploadHandler raises StopFutureHandlers once it takes the file
+        self.content_hash = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # A MemoryFileUploadHandler passing on a file too large for it only forwards the data
+        if getattr(self, 'activated', True):
+            self.content_hash.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.content_hash.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
@@ -2,8 +2,7 @@ from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.contrib.auth.hashers import make_password, check_password
-from .models import User
+from .models import User, OnboardingDraft
 import json
 import logging
 from django.utils import timezone
@@ -75,19 +74,21 @@ def logout_view(request):
 def onboarding(request):
     return render(request, 'onboarding.html')
 
+def get_onboarding_draft(request):
+    """The OnboardingDraft whose token is held in this session, if any"""
+    token = request.session.get('onboarding_draft')
+    if not token:
+        return None
+    return OnboardingDraft.objects.filter(token=token).first()
+
 def create_account(request):
     # Check if user has completed onboarding
-    onboarding_data = request.session.get('onboarding_data', {})
-    print(f"DEBUG: create_account view - session data: {onboarding_data}")
-    print(f"DEBUG: create_account view - session keys: {list(request.session.keys())}")
-    print(f"DEBUG: create_account view - session ID: {request.session.session_key}")
+    draft = get_onboarding_draft(request)
     
-    if not onboarding_data:
+    if draft is None or not draft.data:
         # No onboarding data found, redirect to onboarding
-        print("DEBUG: No onboarding data found, redirecting to onboarding")
         return redirect('/onboarding/')
     
-    print(f"DEBUG: Found onboarding data, proceeding to create account: {onboarding_data}")
     return render(request, 'create_account.html')
 
 @csrf_exempt
@@ -95,13 +96,16 @@ def create_account(request):
 def save_onboarding_data(request):
     try:
         data = json.loads(request.body)
-        print(f"DEBUG: Received onboarding data: {data}")  # Debug logging
-        
-        # Store onboarding data in session for later use when account is created
-        request.session['onboarding_data'] = data
-        request.session.save()  # Explicitly save session
         
-        print(f"DEBUG: Session data saved: {request.session.get('onboarding_data')}")  # Debug logging
+        # Keep the answers in a draft until the account is created; the
+        # session only carries the draft's token
+        draft = get_onboarding_draft(request)
+        if draft is None:
+            draft = OnboardingDraft.objects.create(data=data)
+            request.session['onboarding_draft'] = str(draft.token)
+        else:
+            draft.data = data
+            draft.save(update_fields=['data', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -109,7 +113,6 @@ def save_onboarding_data(request):
         })
     
     except Exception as e:
-        print(f"DEBUG: Error saving onboarding data: {str(e)}")  # Debug logging
         return JsonResponse({
             'success': False,
             'message': f'Error saving data: {str(e)}'
@@ -132,13 +135,9 @@ def create_account_submit(request):
         terms_privacy = request.POST.get('terms_privacy') == 'on'
         gdpr_consent = request.POST.get('gdpr_consent') == 'on'
         
-        # Get onboarding data from session
-        onboarding_data = request.session.get('onboarding_data', {})
-        print(f"DEBUG: Retrieved onboarding data from session: {onboarding_data}")  # Debug logging
-        print(f"DEBUG: Session keys: {list(request.session.keys())}")  # Show all session keys
-        print(f"DEBUG: Full session data: {dict(request.session)}")  # Show full session
-        print(f"DEBUG: Session ID: {request.session.session_key}")  # Show session ID
-        print(f"DEBUG: Is session empty? {len(onboarding_data) == 0}")  # Check if empty
+        # Get onboarding data saved before the account existed
+        draft = get_onboarding_draft(request)
+        onboarding_data = draft.data if draft else {}
         
         # Check if username already exists
         if User.objects.filter(username=username).exists():
@@ -180,10 +179,9 @@ def create_account_submit(request):
             return bool(value)
         
         # Create user with account details and onboarding data
-        user = User.objects.create(
+        user = User(
             username=username,
             email=email,
-            password_hash=make_password(password),
             house_flat_number=house_flat_number,
             street_number=street_number,
             street_name=street_name,
@@ -209,15 +207,18 @@ def create_account_submit(request):
             current_issues=onboarding_data.get('current_issues', ''),
             onboarding_complete=True
         )
+        user.set_password(password)
+        user.save()
         
         # Automatically log in the user
         request.session['user_id'] = user.id
         request.session['username'] = user.username
         request.session['is_authenticated'] = True
         
-        # Clear onboarding data from session since it's now saved
-        if 'onboarding_data' in request.session:
-            del request.session['onboarding_data']
+        # Drop the draft now its answers are on the user
+        if draft is not None:
+            draft.delete()
+        request.session.pop('onboarding_draft', None)
         
         return JsonResponse({
             'success': True,
@@ -252,7 +253,7 @@ def login_submit(request):
                 })
         
         # Check password
-        if user and check_password(password, user.password_hash):
+        if user and user.check_password(password):
             # Create session
             request.session['user_id'] = user.id
             request.session['username'] = user.username
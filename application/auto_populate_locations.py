@@ -3,10 +3,9 @@ Auto-population system for new user locations
 Ensures every UK location has property data for market analysis
 """
 
-import os
-import django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
-django.setup()
+from application.bootstrap import setup_django
+
+setup_django()
 
 from market_analysis.models import PropertyListing
 from simple_scraper import RespectfulPropertyScraper
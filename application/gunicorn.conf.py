@@ -0,0 +1,19 @@
+# Gunicorn settings, read from the working directory by every start command.
+#
+# SERVER_MODE=asgi serves application.asgi through uvicorn workers: async
+# views (market analysis, job polling, email sending) then hold a slow
+# request without tying up a worker. The default is sync WSGI workers.
+import os
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    from uvicorn_worker import UvicornWorker
+
+    class DjangoUvicornWorker(UvicornWorker):
+        # Django only speaks ASGI HTTP. Turning websockets off also stops
+        # uvicorn importing the old websockets release requests-html pins.
+        CONFIG_KWARGS = {**UvicornWorker.CONFIG_KWARGS, 'ws': 'none', 'lifespan': 'off'}
+
+    wsgi_app = 'application.asgi:application'
+    worker_class = DjangoUvicornWorker
+else:
+    wsgi_app = 'application.wsgi:application'
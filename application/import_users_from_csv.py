@@ -24,6 +24,13 @@ def import_users_from_csv(csv_filename):
     
     csv_path = Path(csv_filename)
     
+    # Exports also carry per-user relation counts; only concrete columns are imported
+    user_fields = {field.attname for field in User._meta.concrete_fields} - {'id'}
+    nullable_fields = {field.attname for field in User._meta.concrete_fields if field.null}
+    
+    def empty_value(key):
+        return None if key in nullable_fields else ''
+    
     if not csv_path.exists():
         print(f"Error: File {csv_filename} not found")
         return False
@@ -51,18 +58,22 @@ def import_users_from_csv(csv_filename):
                         continue
                     
                     user_id = row.get('id', '').strip()
+                    row = {k: v for k, v in row.items() if k in user_fields}
                     
                     # Try to update existing user, or create new
                     user, created = User.objects.get_or_create(
                         username=username,
-                        defaults={k: (parse_datetime(v) if k in ['created_at', 'updated_at'] else v) or None 
-                                  for k, v in row.items() if k != 'id'}
+                        defaults={k: (parse_datetime(v) if k in ['created_at', 'updated_at'] else v) or empty_value(k)
+                                  for k, v in row.items()}
                     )
                     
+                    # auto_now_add/auto_now would stamp the import time instead
+                    timestamps = {key: parse_datetime(row[key]) for key in ['created_at', 'updated_at'] if row.get(key)}
+                    
                     if not created:
                         # Update existing user with CSV data
                         for key, value in row.items():
-                            if key != 'id' and hasattr(user, key):
+                            if hasattr(user, key):
                                 if key in ['created_at', 'updated_at']:
                                     value = parse_datetime(value) or value
                                 elif key in ['onboarding_complete', 'has_lounge', 'terms_privacy', 'gdpr_consent']:
@@ -71,11 +82,12 @@ def import_users_from_csv(csv_filename):
                                     value = int(value) if value else None
                                 elif key in ['weekly_rent']:
                                     value = float(value) if value else None
-                                setattr(user, key, value or '')
+                                setattr(user, key, value if value not in ('', None) else empty_value(key))
                         user.save()
                         updated += 1
                     else:
                         imported += 1
+                    User.objects.filter(pk=user.pk).update(**timestamps)
                     
                 except Exception as e:
                     print(f"Row {row_num}: Error - {str(e)}")
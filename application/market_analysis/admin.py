@@ -1,3 +1,47 @@
 from django.contrib import admin
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import ListingQualityRun, SegmentPriceBounds, QuarantinedListing, PropertyListing
 
-# Register your models here.
+
+@admin.register(ListingQualityRun)
+class ListingQualityRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'started_at', 'completed_at', 'dry_run', 'listings_flagged', 'segments_evaluated', 'reverted_at']
+    list_filter = ['dry_run']
+    readonly_fields = ['started_at', 'completed_at', 'parameters', 'flagged_counts', 'listings_flagged', 'segments_evaluated', 'reverted_at']
+
+
+@admin.register(SegmentPriceBounds)
+class SegmentPriceBoundsAdmin(admin.ModelAdmin):
+    list_display = ['location_key', 'property_type', 'bedrooms', 'sample_size', 'median', 'lower_bound', 'upper_bound', 'computed_at']
+    list_filter = ['property_type', 'bedrooms', 'method']
+    search_fields = ['location_key']
+
+
+@admin.register(QuarantinedListing)
+class QuarantinedListingAdmin(admin.ModelAdmin):
+    list_display = ['source', 'source_id', 'location_key', 'property_type', 'bedrooms', 'weekly_rent', 'lower_bound', 'upper_bound', 'reason', 'quarantined_at', 'released_at']
+    list_filter = ['reason', 'property_type', 'released_at']
+    search_fields = ['location_key', 'source_id']
+    readonly_fields = ['quarantined_at', 'released_at']
+    
+    actions = ['release_listings']
+    
+    def release_listings(self, request, queryset):
+        released = 0
+        for quarantined in queryset.filter(released_at__isnull=True):
+            data = dict(quarantined.data)
+            if data.get('scraped_at'):
+                data['scraped_at'] = parse_datetime(data['scraped_at'])
+            if data.get('available_from'):
+                data['available_from'] = parse_date(data['available_from'])
+            PropertyListing.objects.update_or_create(
+                source=data.pop('source'),
+                source_id=data.pop('source_id'),
+                defaults=data,
+            )
+            quarantined.released_at = timezone.now()
+            quarantined.save(update_fields=['released_at'])
+            released += 1
+        self.message_user(request, f'{released} listings released into PropertyListing.')
+    release_listings.short_description = "Release selected listings"
@@ -0,0 +1,234 @@
+"""
+Ingest-time plausibility gate for scraped listings.
+
+Every scraper path calls admit_listing() before writing a PropertyListing.
+The check is a dict lookup and two comparisons against bounds held in
+memory, so it costs microseconds and no queries:
+
+- Segment bounds computed by ``manage.py listing_quality`` are loaded from
+  SegmentPriceBounds with one query, and reloaded at most every
+  LISTING_GATE_REFRESH_SECONDS.
+- Segments the database has no bounds for yet are judged by streaming P²
+  quartile estimators fed with every listing this process has checked,
+  rejected ones included, so the estimate can follow a market that moves
+  rather than lock in the first listings it saw. Quartiles barely move
+  for the odd outlier.
+
+Listings outside the bounds are written to QuarantinedListing instead of
+PropertyListing, where they can be reviewed and released from the admin.
+A listing rejected again on a later scrape updates its existing row.
+"""
+from decimal import Decimal
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from application.normalizers import location_key
+from .models import QuarantinedListing, SegmentPriceBounds
+from .quality import iqr_fences
+
+logger = logging.getLogger(__name__)
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in constant memory (Jain & Chlamtac's P²).
+
+    Five markers track the minimum, p/2, p, (1+p)/2 quantiles and the
+    maximum; each observation moves them with a parabolic correction.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        if x < heights[0]:
+            heights[0] = x
+            cell = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            cell = 3
+        else:
+            cell = 0
+            while x >= heights[cell + 1]:
+                cell += 1
+
+        for i in range(cell + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            offset = self.desired[i] - self.positions[i]
+            if (offset >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+                    (offset <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = self._linear(i, step)
+                heights[i] = candidate
+                self.positions[i] += step
+
+    def _parabolic(self, i, step):
+        q, n = self.heights, self.positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i, step):
+        q, n = self.heights, self.positions
+        return q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+
+    def value(self):
+        if len(self.heights) < 5:
+            if not self.heights:
+                return None
+            return self.heights[min(int(self.p * len(self.heights)), len(self.heights) - 1)]
+        return self.heights[2]
+
+
+class SegmentEstimator:
+    """Streaming quartiles for one (town, type, bedrooms) segment"""
+
+    def __init__(self):
+        self.count = 0
+        self.quartiles = [P2Quantile(0.25), P2Quantile(0.5), P2Quantile(0.75)]
+
+    def add(self, rent):
+        self.count += 1
+        for quartile in self.quartiles:
+            quartile.add(rent)
+
+    def fences(self, k, min_spread_ratio):
+        q1, median, q3 = (quartile.value() for quartile in self.quartiles)
+        return iqr_fences(q1, median, q3, k, min_spread_ratio)
+
+
+class ListingGate:
+    """In-memory per-segment rent bounds shared by every ingest path in a process"""
+
+    def __init__(self, k=1.5, min_spread_ratio=0.1, min_samples=20, refresh_seconds=300):
+        self.k = k
+        self.min_spread_ratio = min_spread_ratio
+        self.min_samples = min_samples
+        self.refresh_seconds = refresh_seconds
+        self._bounds = {}
+        self._estimators = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload stored segment bounds in a single query"""
+        rows = SegmentPriceBounds.objects.values_list(
+            'location_key', 'property_type', 'bedrooms', 'lower_bound', 'upper_bound'
+        )
+        bounds = {(town, property_type, bedrooms): (float(lower), float(upper))
+                  for town, property_type, bedrooms, lower, upper in rows}
+        with self._lock:
+            self._bounds = bounds
+            self._loaded_at = time.monotonic()
+        logger.info(f"Listing gate loaded bounds for {len(bounds)} segments")
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.refresh()
+
+    def bounds_for(self, segment):
+        """(lower, upper) weekly rent for a segment, or None if it can't be judged yet"""
+        bounds = self._bounds.get(segment)
+        if bounds is not None:
+            return bounds
+        estimator = self._estimators.get(segment)
+        if estimator is not None and estimator.count >= self.min_samples:
+            return estimator.fences(self.k, self.min_spread_ratio)
+        return None
+
+    def check(self, prop_data):
+        """
+        Judge a scraped listing dict.
+
+        Returns (accepted, reason, bounds). Every listing with a rent then
+        feeds the segment's streaming estimator, whether accepted or not.
+        """
+        self._ensure_fresh()
+
+        rent = prop_data.get('weekly_rent')
+        if rent is None or rent <= 0:
+            return False, 'invalid_rent', None
+
+        rent = float(rent)
+        segment = (
+            location_key(prop_data.get('address', ''), prop_data.get('area', ''), prop_data.get('postcode', '')),
+            prop_data.get('property_type', ''),
+            prop_data.get('bedrooms'),
+        )
+        with self._lock:
+            bounds = self.bounds_for(segment)
+            self._estimators.setdefault(segment, SegmentEstimator()).add(rent)
+        if bounds is not None and not bounds[0] <= rent <= bounds[1]:
+            return False, 'price_outlier', bounds
+        return True, '', bounds
+
+
+_gate = None
+_gate_lock = threading.Lock()
+
+
+def get_listing_gate():
+    """Process-wide gate configured from settings"""
+    global _gate
+    if _gate is None:
+        with _gate_lock:
+            if _gate is None:
+                _gate = ListingGate(
+                    k=getattr(settings, 'LISTING_GATE_K', 1.5),
+                    min_samples=getattr(settings, 'LISTING_GATE_MIN_SAMPLES', 20),
+                    refresh_seconds=getattr(settings, 'LISTING_GATE_REFRESH_SECONDS', 300),
+                )
+    return _gate
+
+
+def admit_listing(prop_data):
+    """
+    Return True if a scraped listing may be saved as a PropertyListing.
+
+    Rejected listings are quarantined instead.
+    """
+    if not getattr(settings, 'LISTING_GATE_ENABLED', True):
+        return True
+
+    accepted, reason, bounds = get_listing_gate().check(prop_data)
+    if accepted:
+        return True
+
+    lower, upper = bounds if bounds else (None, None)
+    QuarantinedListing.objects.update_or_create(
+        source=prop_data.get('source', ''),
+        source_id=prop_data.get('source_id', ''),
+        defaults=dict(
+            location_key=location_key(prop_data.get('address', ''), prop_data.get('area', ''), prop_data.get('postcode', '')),
+            property_type=prop_data.get('property_type', ''),
+            bedrooms=prop_data.get('bedrooms'),
+            weekly_rent=prop_data.get('weekly_rent'),
+            reason=reason,
+            lower_bound=Decimal(str(round(lower, 2))) if lower is not None else None,
+            upper_bound=Decimal(str(round(upper, 2))) if upper is not None else None,
+            data=prop_data,
+        ),
+    )
+    logger.warning(f"Quarantined {prop_data.get('source')} listing {prop_data.get('source_id')}: "
+                   f"£{prop_data.get('weekly_rent')}/week ({reason})")
+    return False
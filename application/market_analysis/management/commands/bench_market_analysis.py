@@ -0,0 +1,264 @@
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.utils import timezone
+
+from application.models import User
+from application.normalizers import location_key
+from market_analysis.models import MarketAnalysis, PropertyListing
+from market_analysis.scrapers import save_listings
+from market_analysis.synthetic import synthetic_listing
+from market_analysis.views import calculate_market_position, create_market_analysis
+
+BENCHMARK_DIR = os.path.join(settings.BASE_DIR, 'benchmarks')
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'market_analysis_baseline.json')
+
+
+class QueryCounter:
+    """Execute wrapper counting queries without the cost of recording SQL"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the market analysis hot path (ingest, create_market_analysis, '
+        'calculate_market_position and the analysis view end to end) against '
+        'synthetic listings at several table sizes, in a scratch database. Results '
+        'are written as JSON and compared against a stored baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+            help='Listing counts to measure at, smallest first'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per operation and size')
+        parser.add_argument('--ingest-batch', type=int, default=200, help='Scraped listings per ingest run')
+        parser.add_argument(
+            '--db-path',
+            help='SQLite file for the scratch database (default: a temporary file). '
+                 'With --keepdb, listings seeded by an earlier run are reused.'
+        )
+        parser.add_argument('--keepdb', action='store_true', help='Keep the scratch database afterwards')
+        parser.add_argument('--output', help='Results file (default: benchmarks/results/market_analysis-<time>.json)')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results to compare against')
+        parser.add_argument('--save-baseline', action='store_true', help='Also store these results as the baseline')
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Percentage slowdown against the baseline reported as a regression'
+        )
+        parser.add_argument(
+            '--fail-on-regression', action='store_true',
+            help='Exit with an error if any operation regressed past --threshold'
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        self.rng = random.Random(42)
+        # Keeps listings ingested by earlier --keepdb runs from colliding
+        self.run_id = int(time.time())
+        # One line per request from PerformanceMiddleware would drown the table
+        logging.getLogger('performance').setLevel(logging.WARNING)
+
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if connection.vendor == 'sqlite':
+            db_path = options['db_path'] or os.path.join(tempfile.gettempdir(), 'bench_market_analysis.sqlite3')
+            test_settings['NAME'] = db_path
+        original_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'], serialize=False)
+        try:
+            results = self.run_benchmarks(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(original_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'benchmark': 'market_analysis',
+            'created_at': timezone.now().isoformat(),
+            'environment': self.environment(),
+            'options': {'repeat': options['repeat'], 'ingest_batch': options['ingest_batch']},
+            'results': results,
+        }
+        output = options['output'] or os.path.join(
+            BENCHMARK_DIR, 'results', f'market_analysis-{time.strftime("%Y%m%d-%H%M%S")}.json'
+        )
+        self.write_json(output, report)
+        self.stdout.write(f'\nResults written to {output}')
+
+        regressions = self.compare(report, options['baseline'], options['threshold'])
+        if options['save_baseline']:
+            self.write_json(options['baseline'], report)
+            self.stdout.write(f'Baseline updated: {options["baseline"]}')
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} operation(s) regressed: {", ".join(regressions)}')
+
+    def run_benchmarks(self, sizes, options):
+        user, _ = User.objects.update_or_create(username='bench-analysis', defaults={
+            'email': 'bench-analysis@example.com', 'name': 'Bench Tenant', 'property_type': 'flat',
+            'bedrooms': 2, 'weekly_rent': Decimal('250'), 'town': 'Manchester', 'post_code': 'M1 1AA',
+            'onboarding_complete': True,
+        })
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        session = client.session
+        session.update({'user_id': user.id, 'username': user.username, 'is_authenticated': True})
+        session.save()
+
+        results = []
+        for size in sizes:
+            self.seed(size)
+            self.stdout.write(f'\n{size:,} listings')
+            self.stdout.write(f'  {"operation":<28} {"median ms":>10} {"min ms":>9} {"max ms":>9} {"queries":>8}')
+
+            analysis, comparable = create_market_analysis(user, 'flat', 2, 'manchester')
+            comparable = list(comparable)
+            operations = [
+                ('create_market_analysis', lambda: create_market_analysis(user, 'flat', 2, 'manchester'), 1),
+                ('calculate_market_position', lambda: calculate_market_position(Decimal('250'), comparable), 1000),
+                ('market_analysis_view', lambda: self.get_analysis_page(client), 1),
+                ('ingest', lambda: self.ingest(options['ingest_batch']), 1),
+            ]
+            for name, func, number in operations:
+                result = {'operation': name, 'size': size, **self.measure(func, options['repeat'], number)}
+                results.append(result)
+                self.stdout.write(
+                    f'  {name:<28} {result["median_ms"]:>10.3f} {result["min_ms"]:>9.3f} '
+                    f'{result["max_ms"]:>9.3f} {result["queries"]:>8}'
+                )
+            MarketAnalysis.objects.filter(user=user).delete()
+        return results
+
+    def measure(self, func, repeat, number=1):
+        """
+        Time ``repeat`` runs of ``number`` calls each, after one untimed
+        warm-up call. Times and query counts are per call.
+        """
+        func()
+        counter = QueryCounter()
+        timings = []
+        with connection.execute_wrapper(counter):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for _ in range(number):
+                    func()
+                timings.append((time.perf_counter() - started) / number * 1000)
+        return {
+            'runs': repeat,
+            'calls_per_run': number,
+            'median_ms': round(statistics.median(timings), 4),
+            'min_ms': round(min(timings), 4),
+            'max_ms': round(max(timings), 4),
+            'queries': round(counter.count / (repeat * number), 2),
+        }
+
+    def seed(self, size, batch_size=5000):
+        """Top the table up to ``size`` synthetic listings"""
+        existing = PropertyListing.objects.filter(source_id__startswith='bench-').count()
+        self.seeded = max(existing, size)
+        if existing >= size:
+            return
+        self.stdout.write(f'Seeding {size - existing:,} listings...')
+        started = time.perf_counter()
+        for start in range(existing, size, batch_size):
+            listings = []
+            for source_id in range(start, min(start + batch_size, size)):
+                data = synthetic_listing(self.rng, source_id)
+                listings.append(PropertyListing(
+                    **data, location_key=location_key(data['address'], data['area'], data['postcode']),
+                ))
+            PropertyListing.objects.bulk_create(listings)
+        self.stdout.write(f'  seeded in {time.perf_counter() - started:.1f}s')
+
+    def ingest(self, batch):
+        """Feed a scrape's worth of listings through save_listings, a fifth of them already stored"""
+        next_id = getattr(self, 'next_ingest_id', 0)
+        listings = []
+        for i in range(batch):
+            if i % 5 == 0:
+                listings.append(synthetic_listing(self.rng, self.rng.randrange(self.seeded)))
+            else:
+                listings.append(synthetic_listing(self.rng, next_id, prefix=f'scraped-{self.run_id}'))
+                next_id += 1
+        self.next_ingest_id = next_id
+        save_listings(listings)
+
+    def get_analysis_page(self, client):
+        response = client.get('/market-analysis/', {'refresh': 'true'})
+        if response.status_code != 200:
+            raise CommandError(f'Analysis page returned {response.status_code}')
+
+    def environment(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except OSError:
+            commit = ''
+        return {
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        }
+
+    def compare(self, report, baseline_path, threshold):
+        """Print each operation's change against the baseline; return the regressed ones"""
+        if not os.path.exists(baseline_path):
+            self.stdout.write(f'No baseline at {baseline_path}; run with --save-baseline to store one.')
+            return []
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        env, base_env = report['environment'], baseline.get('environment', {})
+        for key in ('database', 'platform', 'cpus'):
+            if env.get(key) != base_env.get(key):
+                self.stdout.write(self.style.WARNING(
+                    f'Baseline was recorded with {key}={base_env.get(key)!r}, this run has {env.get(key)!r}; '
+                    'timings may not be comparable.'
+                ))
+
+        previous = {(r['operation'], r['size']): r for r in baseline['results']}
+        regressions = []
+        self.stdout.write(f'\nAgainst baseline {base_env.get("git_commit", "")} ({baseline.get("created_at", "")[:10]})')
+        self.stdout.write(f'  {"operation":<28} {"size":>10} {"median ms":>10} {"baseline":>10} {"change":>8}')
+        for result in report['results']:
+            before = previous.get((result['operation'], result['size']))
+            if before is None:
+                continue
+            change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0
+            line = (
+                f'  {result["operation"]:<28} {result["size"]:>10,} {result["median_ms"]:>10.3f} '
+                f'{before["median_ms"]:>10.3f} {change:>+7.1f}%'
+            )
+            if change > threshold:
+                regressions.append(f'{result["operation"]}@{result["size"]}')
+                line = self.style.ERROR(line + '  regression')
+            elif change < -threshold:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
+        return regressions
+
+    def write_json(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.write('\n')
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+from market_analysis.models import ListingQualityRun
+from market_analysis.quality import (
+    NonPositiveRentRule, RentConsistencyRule, SegmentRentOutlierRule,
+    run_quality_rules, revert_quality_run,
+)
+
+
+class Command(BaseCommand):
+    help = 'Flag implausible listings using per-segment robust rent bounds'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--method',
+            choices=['iqr', 'mad'],
+            default='iqr',
+            help='Robust spread used for segment bounds'
+        )
+        parser.add_argument(
+            '-k',
+            type=float,
+            default=1.5,
+            help='Spread multiplier for the outlier fences'
+        )
+        parser.add_argument(
+            '--min-segment-size',
+            type=int,
+            default=8,
+            help='Segments with fewer listings are not judged'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Listings per UPDATE window'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Count what would be flagged without changing anything'
+        )
+        parser.add_argument(
+            '--revert',
+            type=int,
+            metavar='RUN_ID',
+            help='Reactivate every listing flagged by a previous run'
+        )
+
+    def handle(self, *args, **options):
+        if options['revert']:
+            try:
+                run = ListingQualityRun.objects.get(id=options['revert'])
+            except ListingQualityRun.DoesNotExist:
+                raise CommandError(f"Quality run {options['revert']} not found")
+            restored = revert_quality_run(run)
+            self.stdout.write(self.style.SUCCESS(f'Reactivated {restored} listings flagged by run {run.id}'))
+            return
+
+        rules = [
+            NonPositiveRentRule(),
+            RentConsistencyRule(tolerance=0.1),
+            SegmentRentOutlierRule(
+                method=options['method'],
+                k=options['k'],
+                min_segment_size=options['min_segment_size'],
+            ),
+        ]
+        run = run_quality_rules(rules, batch_size=options['batch_size'], dry_run=options['dry_run'])
+
+        verb = 'Would flag' if run.dry_run else 'Flagged'
+        self.stdout.write(f'Segments with bounds: {run.segments_evaluated}')
+        for rule_name, count in run.flagged_counts.items():
+            self.stdout.write(f'  {rule_name}: {count}')
+
+        # The rules' own bounds: a dry run rolls back the ones it stored
+        computed = [bounds for rule in rules for bounds in getattr(rule, 'bounds', [])]
+        widest = sorted(computed, key=lambda bounds: -bounds.sample_size)[:5]
+        if widest:
+            self.stdout.write('\nLargest segments:')
+            for bounds in widest:
+                self.stdout.write(f'  - {bounds} (n={bounds.sample_size}, median £{bounds.median})')
+
+        self.stdout.write(self.style.SUCCESS(f'\n{verb} {run.listings_flagged} listings (run {run.id})'))
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_analysis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingQualityRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('dry_run', models.BooleanField(default=False)),
+                ('parameters', models.JSONField(default=dict)),
+                ('flagged_counts', models.JSONField(default=dict)),
+                ('listings_flagged', models.IntegerField(default=0)),
+                ('segments_evaluated', models.IntegerField(default=0)),
+                ('reverted_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SegmentPriceBounds',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location_key', models.CharField(max_length=100)),
+                ('property_type', models.CharField(max_length=50)),
+                ('bedrooms', models.IntegerField()),
+                ('sample_size', models.IntegerField()),
+                ('method', models.CharField(max_length=10)),
+                ('q1', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('median', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('q3', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('mad', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('lower_bound', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('upper_bound', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Segment price bounds',
+            },
+        ),
+        migrations.AddField(
+            model_name='propertylisting',
+            name='location_key',
+            field=models.CharField(blank=True, help_text='Normalised town used to segment the market', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='propertylisting',
+            name='quality_flag',
+            field=models.CharField(blank=True, db_index=True, help_text='Rule that deactivated this listing', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='propertylisting',
+            name='quality_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='flagged_listings', to='market_analysis.listingqualityrun'),
+        ),
+        migrations.AddIndex(
+            model_name='propertylisting',
+            index=models.Index(fields=['location_key', 'property_type', 'bedrooms', 'weekly_rent'], name='listing_segment_rent_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='segmentpricebounds',
+            unique_together={('location_key', 'property_type', 'bedrooms')},
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:21
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_analysis', '0002_listingqualityrun_segmentpricebounds_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuarantinedListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('source_id', models.CharField(max_length=200)),
+                ('location_key', models.CharField(blank=True, max_length=100)),
+                ('property_type', models.CharField(blank=True, max_length=50)),
+                ('bedrooms', models.IntegerField(blank=True, null=True)),
+                ('weekly_rent', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('reason', models.CharField(max_length=50)),
+                ('lower_bound', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('upper_bound', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('quarantined_at', models.DateTimeField(auto_now_add=True)),
+                ('released_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-quarantined_at'],
+                'constraints': [models.UniqueConstraint(fields=('source', 'source_id'), name='quarantine_source_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0011_canonical_address'),
+        ('market_analysis', '0003_quarantinedlisting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertylisting',
+            name='address_key',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='propertylisting',
+            name='canonical_address',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='listings', to='application.canonicaladdress'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_analysis', '0004_listing_canonical_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapingjob',
+            name='source_status',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market_analysis', '0005_scrapingjob_source_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScrapeDomainState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('domain', models.CharField(max_length=253, unique=True)),
+                ('next_request_at', models.FloatField(default=0, help_text='When the next free request slot starts')),
+                ('delay', models.FloatField(help_text='Seconds between requests')),
+                ('failures', models.IntegerField(default=0, help_text='Failures in a row while closed')),
+                ('last_failure_at', models.FloatField(blank=True, null=True)),
+                ('open_until', models.FloatField(blank=True, help_text='Open until then, half-open after; empty when closed', null=True)),
+                ('probe_until', models.FloatField(blank=True, help_text='A half-open probe is out until then', null=True)),
+            ],
+        ),
+    ]
@@ -1,7 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from application.models import User
+from application.models import AddressLinked, CanonicalAddress, User
+from application.normalizers import location_key
 
-class PropertyListing(models.Model):
+class PropertyListing(AddressLinked):
     """Model for storing scraped property listings for market analysis"""
     
     PROPERTY_TYPES = [
@@ -61,12 +63,31 @@ class PropertyListing(models.Model):
     is_active = models.BooleanField(default=True)
     is_duplicate = models.BooleanField(default=False)
     
+    # Data quality
+    location_key = models.CharField(max_length=100, blank=True, help_text="Normalised town used to segment the market")
+    address_key = models.CharField(max_length=200, blank=True, editable=False)
+    canonical_address = models.ForeignKey(CanonicalAddress, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='listings')
+    address_fields = ('address', 'postcode')
+    quality_flag = models.CharField(max_length=50, blank=True, db_index=True, help_text="Rule that deactivated this listing")
+    quality_run = models.ForeignKey('ListingQualityRun', on_delete=models.SET_NULL, null=True, blank=True, related_name='flagged_listings')
+    
     class Meta:
         ordering = ['-scraped_at']
         unique_together = ['source', 'source_id']  # Prevent duplicate listings
+        indexes = [
+            models.Index(fields=['location_key', 'property_type', 'bedrooms', 'weekly_rent'], name='listing_segment_rent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - £{self.weekly_rent}/week ({self.source})"
+    
+    def save(self, *args, **kwargs):
+        # Recomputed every time so it follows the address
+        self.location_key = location_key(self.address, self.area, self.postcode)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'location_key'}
+        super().save(*args, **kwargs)
 
 
 class MarketAnalysis(models.Model):
@@ -121,8 +142,112 @@ class ScrapingJob(models.Model):
     completed_at = models.DateTimeField(blank=True, null=True)
     properties_scraped = models.IntegerField(default=0)
     error_message = models.TextField(blank=True)
+    # Per listing source: status, listings found, seconds, error and its site's breaker state
+    source_status = models.JSONField(default=dict, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"Scraping Job {self.id} - {self.status}"
+
+
+class ListingQualityRun(models.Model):
+    """Audit record for one pass of the listing data-quality rules"""
+    
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    dry_run = models.BooleanField(default=False)
+    
+    # Rule configuration and per-rule counts of flagged listings
+    parameters = models.JSONField(default=dict)
+    flagged_counts = models.JSONField(default=dict)
+    listings_flagged = models.IntegerField(default=0)
+    segments_evaluated = models.IntegerField(default=0)
+    
+    reverted_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Quality Run {self.id} - {self.listings_flagged} flagged"
+
+
+class SegmentPriceBounds(models.Model):
+    """Robust weekly rent bounds for one market segment (town, type, bedrooms)"""
+    
+    location_key = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=50)
+    bedrooms = models.IntegerField()
+    
+    sample_size = models.IntegerField()
+    method = models.CharField(max_length=10)
+    q1 = models.DecimalField(max_digits=10, decimal_places=2)
+    median = models.DecimalField(max_digits=10, decimal_places=2)
+    q3 = models.DecimalField(max_digits=10, decimal_places=2)
+    mad = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    lower_bound = models.DecimalField(max_digits=10, decimal_places=2)
+    upper_bound = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    computed_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['location_key', 'property_type', 'bedrooms']
+        verbose_name_plural = "Segment price bounds"
+    
+    def __str__(self):
+        return f"{self.bedrooms}-bed {self.property_type} in {self.location_key}: £{self.lower_bound}-£{self.upper_bound}/week"
+
+
+class QuarantinedListing(models.Model):
+    """Scraped listing held back at ingest because its rent looked implausible"""
+    
+    source = models.CharField(max_length=50)
+    source_id = models.CharField(max_length=200)
+    location_key = models.CharField(max_length=100, blank=True)
+    property_type = models.CharField(max_length=50, blank=True)
+    bedrooms = models.IntegerField(blank=True, null=True)
+    weekly_rent = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    
+    reason = models.CharField(max_length=50)
+    lower_bound = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    upper_bound = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    
+    # Everything the scraper produced, so the listing can be released as-is
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    
+    quarantined_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-quarantined_at']
+        constraints = [
+            # A listing rejected again on a later scrape updates its row
+            models.UniqueConstraint(fields=['source', 'source_id'], name='quarantine_source_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} {self.source_id} - £{self.weekly_rent}/week ({self.reason})"
+
+
+class ScrapeDomainState(models.Model):
+    """
+    Politeness and circuit breaker state for one scraped site, shared by
+    every worker (see throttle.py). Times are Unix timestamps, so they can
+    be compared and advanced inside a single UPDATE.
+    """
+    
+    domain = models.CharField(max_length=253, unique=True)
+    
+    # Throttle
+    next_request_at = models.FloatField(default=0, help_text="When the next free request slot starts")
+    delay = models.FloatField(help_text="Seconds between requests")
+    
+    # Circuit breaker
+    failures = models.IntegerField(default=0, help_text="Failures in a row while closed")
+    last_failure_at = models.FloatField(blank=True, null=True)
+    open_until = models.FloatField(blank=True, null=True, help_text="Open until then, half-open after; empty when closed")
+    probe_until = models.FloatField(blank=True, null=True, help_text="A half-open probe is out until then")
+    
+    def __str__(self):
+        return self.domain
@@ -0,0 +1,381 @@
+"""
+Declarative data-quality rules for scraped listings.
+
+Each rule describes the listings it rejects as a database condition, so the
+engine can flag a whole pk window with a single UPDATE instead of looping
+over rows in Python. Flagged listings are deactivated, not deleted, and are
+tagged with the run that flagged them so a run can be reverted.
+"""
+from decimal import Decimal
+import logging
+
+from django.db import transaction
+from django.db.models import (
+    Count, DecimalField, Exists, F, Max, Min, OuterRef, Q, Subquery, Window,
+)
+from django.db.models.functions import Abs, RowNumber
+from django.utils import timezone
+
+from application.normalizers import location_key
+from .models import PropertyListing, ListingQualityRun, SegmentPriceBounds
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FIELDS = ['location_key', 'property_type', 'bedrooms']
+
+# Scales MAD to the standard deviation of a normal distribution
+MAD_SCALE = Decimal('1.4826')
+
+
+class QualityRule:
+    """Base class for listing rules"""
+
+    name = ''
+    flag = ''
+
+    def prepare(self, run, listings):
+        """
+        Compute anything the condition depends on before the pass starts.
+        ``listings`` are the comparable listings no earlier rule flags.
+        """
+
+    def condition(self):
+        """Q or expression matching the listings this rule flags"""
+        raise NotImplementedError
+
+    def describe(self):
+        return {'flag': self.flag}
+
+
+class NonPositiveRentRule(QualityRule):
+    """Listings without a usable price"""
+
+    name = 'non_positive_rent'
+    flag = 'invalid_rent'
+
+    def condition(self):
+        return Q(weekly_rent__lte=0) | Q(monthly_rent__lte=0)
+
+
+class RentConsistencyRule(QualityRule):
+    """Weekly and monthly rent disagree, usually a pw/pcm parsing mix-up"""
+
+    name = 'rent_consistency'
+    flag = 'inconsistent_rent'
+
+    def __init__(self, tolerance=0.1):
+        self.tolerance = Decimal(str(tolerance))
+
+    def condition(self):
+        expected = F('weekly_rent') * 52 / 12
+        return (
+            Q(monthly_rent__gt=expected * (1 + self.tolerance)) |
+            Q(monthly_rent__lt=expected * (1 - self.tolerance))
+        )
+
+    def describe(self):
+        return {'flag': self.flag, 'tolerance': float(self.tolerance)}
+
+
+class SegmentRentOutlierRule(QualityRule):
+    """
+    Weekly rent outside robust bounds for its (town, type, bedrooms) segment.
+
+    method='iqr' uses Tukey fences q1 - k*IQR .. q3 + k*IQR,
+    method='mad' uses median +/- k * 1.4826 * MAD.
+    Quantiles are nearest-rank and computed with window functions, so every
+    segment is evaluated in a fixed number of queries.
+    """
+
+    name = 'segment_rent_outlier'
+    flag = 'price_outlier'
+
+    def __init__(self, method='iqr', k=1.5, min_segment_size=8, min_spread_ratio=0.1):
+        if method not in ('iqr', 'mad'):
+            raise ValueError(f"Unknown outlier method: {method}")
+        self.method = method
+        self.k = Decimal(str(k))
+        self.min_segment_size = min_segment_size
+        # Floor on the spread so near-identical segments don't flag every
+        # listing a few pounds away from the median
+        self.min_spread_ratio = Decimal(str(min_spread_ratio))
+        self.bounds = []
+        self.segments = 0
+
+    def prepare(self, run, listings):
+        # Rents earlier rules reject would skew the quartiles
+        self.bounds = compute_segment_bounds(
+            method=self.method,
+            k=self.k,
+            min_segment_size=self.min_segment_size,
+            min_spread_ratio=self.min_spread_ratio,
+            listings=listings,
+        )
+        self.segments = len(self.bounds)
+
+    def condition(self):
+        bounds = SegmentPriceBounds.objects.filter(
+            location_key=OuterRef('location_key'),
+            property_type=OuterRef('property_type'),
+            bedrooms=OuterRef('bedrooms'),
+        ).filter(
+            Q(lower_bound__gt=OuterRef('weekly_rent')) |
+            Q(upper_bound__lt=OuterRef('weekly_rent'))
+        )
+        return Exists(bounds)
+
+    def describe(self):
+        return {
+            'flag': self.flag,
+            'method': self.method,
+            'k': float(self.k),
+            'min_segment_size': self.min_segment_size,
+            'min_spread_ratio': float(self.min_spread_ratio),
+        }
+
+
+# Applied in order; a listing is flagged by the first rule it fails
+DEFAULT_RULES = [
+    NonPositiveRentRule(),
+    RentConsistencyRule(tolerance=0.1),
+    SegmentRentOutlierRule(method='iqr', k=1.5),
+]
+
+
+def iqr_fences(q1, median, q3, k, min_spread_ratio):
+    """Tukey fences, with the IQR floored at a fraction of the median"""
+    spread = max(q3 - q1, median * min_spread_ratio) * k
+    return max(q1 - spread, 0 * spread), q3 + spread
+
+
+def mad_fences(median, mad, k, min_spread_ratio):
+    """median +/- k * scaled MAD, with the MAD floored at a fraction of the median"""
+    spread = max(mad * MAD_SCALE, median * min_spread_ratio) * k
+    return max(median - spread, 0 * spread), median + spread
+
+
+def comparable_listings():
+    """Listings that take part in market statistics"""
+    return PropertyListing.objects.filter(is_active=True, is_duplicate=False)
+
+
+def _ranked(queryset, order_by):
+    """Annotate each row with its position and its segment's size"""
+    partition = [F(field) for field in SEGMENT_FIELDS]
+    return queryset.annotate(
+        position=Window(RowNumber(), partition_by=partition, order_by=order_by),
+        segment_size=Window(Count('pk'), partition_by=partition),
+    )
+
+
+def _segment_key(row):
+    return tuple(row[field] for field in SEGMENT_FIELDS)
+
+
+@transaction.atomic
+def compute_segment_bounds(method='iqr', k=Decimal('1.5'), min_segment_size=8, min_spread_ratio=Decimal('0.1'),
+                           listings=None):
+    """
+    Recompute SegmentPriceBounds for every segment with enough of
+    ``listings`` (by default every comparable listing).
+
+    Returns the saved bounds.
+    """
+    computed_at = timezone.now()
+    listings = listings if listings is not None else comparable_listings()
+    priced = listings.filter(weekly_rent__gt=0).exclude(location_key='')
+
+    # Nearest-rank quartiles: only the (at most) three rows sitting on a
+    # quartile position come back from the database for each segment.
+    n = F('segment_size')
+    quartile_rows = _ranked(priced, F('weekly_rent').asc()).filter(
+        segment_size__gte=min_segment_size,
+    ).filter(
+        Q(position=(n + 3) / 4) | Q(position=(n + 1) / 2) | Q(position=(n * 3 + 3) / 4)
+    ).values(*SEGMENT_FIELDS, 'position', 'segment_size', 'weekly_rent')
+
+    segments = {}
+    for row in quartile_rows:
+        stats = segments.setdefault(_segment_key(row), {'sample_size': row['segment_size']})
+        size, position = row['segment_size'], row['position']
+        if position == (size + 3) // 4:
+            stats['q1'] = row['weekly_rent']
+        if position == (size + 1) // 2:
+            stats['median'] = row['weekly_rent']
+        if position == (size * 3 + 3) // 4:
+            stats['q3'] = row['weekly_rent']
+
+    bounds = []
+    for (town, property_type, bedrooms), stats in segments.items():
+        bounds.append(SegmentPriceBounds(
+            location_key=town,
+            property_type=property_type,
+            bedrooms=bedrooms,
+            sample_size=stats['sample_size'],
+            method=method,
+            q1=stats['q1'],
+            median=stats['median'],
+            q3=stats['q3'],
+            lower_bound=0,
+            upper_bound=0,
+            computed_at=computed_at,
+        ))
+
+    # Medians have to be stored before MAD can be ranked against them
+    _save_bounds(bounds)
+    SegmentPriceBounds.objects.filter(computed_at__lt=computed_at).delete()
+
+    if method == 'mad':
+        mads = _segment_mads(priced)
+        for bound in bounds:
+            bound.mad = mads.get((bound.location_key, bound.property_type, bound.bedrooms), Decimal('0'))
+
+    for bound in bounds:
+        if method == 'mad':
+            lower, upper = mad_fences(bound.median, bound.mad, k, min_spread_ratio)
+        else:
+            lower, upper = iqr_fences(bound.q1, bound.median, bound.q3, k, min_spread_ratio)
+        bound.lower_bound = lower.quantize(Decimal('0.01'))
+        bound.upper_bound = upper.quantize(Decimal('0.01'))
+        bound.mad = bound.mad.quantize(Decimal('0.01')) if bound.mad is not None else None
+
+    _save_bounds(bounds)
+    logger.info(f"Computed {method} rent bounds for {len(bounds)} segments")
+    return bounds
+
+
+def _segment_mads(priced):
+    """Median absolute deviation from the stored median, per segment"""
+    median = SegmentPriceBounds.objects.filter(
+        location_key=OuterRef('location_key'),
+        property_type=OuterRef('property_type'),
+        bedrooms=OuterRef('bedrooms'),
+    ).values('median')
+    deviations = priced.annotate(
+        deviation=Abs(F('weekly_rent') - Subquery(median, output_field=DecimalField(max_digits=10, decimal_places=2))),
+    ).filter(deviation__isnull=False)
+
+    n = F('segment_size')
+    rows = _ranked(deviations, F('deviation').asc()).filter(
+        position=(n + 1) / 2,
+    ).values(*SEGMENT_FIELDS, 'deviation')
+    return {_segment_key(row): Decimal(str(row['deviation'])) for row in rows}
+
+
+def _save_bounds(bounds):
+    SegmentPriceBounds.objects.bulk_create(
+        bounds,
+        update_conflicts=True,
+        unique_fields=SEGMENT_FIELDS,
+        update_fields=[
+            'sample_size', 'method', 'q1', 'median', 'q3', 'mad',
+            'lower_bound', 'upper_bound', 'computed_at',
+        ],
+    )
+
+
+def backfill_location_keys(batch_size=1000):
+    """Fill location_key for listings saved before it existed"""
+    updated = 0
+    missing = PropertyListing.objects.filter(location_key='').only('pk', 'address', 'area', 'postcode').order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(missing.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        for listing in batch:
+            listing.location_key = location_key(listing.address, listing.area, listing.postcode)
+        PropertyListing.objects.bulk_update(batch, ['location_key'])
+        updated += len(batch)
+        last_pk = batch[-1].pk
+    return updated
+
+
+def run_quality_rules(rules=None, batch_size=5000, dry_run=False):
+    """
+    Apply rules to every active listing in one pass over the table.
+
+    The table is walked in pk windows of ``batch_size``; inside each window
+    every rule is a single UPDATE, so lock time and transaction size stay
+    bounded however large the table grows.
+
+    A dry run only counts, and leaves the database as it was apart from the
+    ListingQualityRun; listings still missing a location_key aren't
+    backfilled, so they aren't in any segment. What rules prepared (e.g.
+    SegmentRentOutlierRule.bounds) stays on the rule objects either way.
+    """
+    rules = rules if rules is not None else DEFAULT_RULES
+    run = ListingQualityRun.objects.create(
+        dry_run=dry_run,
+        parameters={
+            'batch_size': batch_size,
+            'rules': {rule.name: rule.describe() for rule in rules},
+        },
+    )
+
+    if dry_run:
+        # Rules may store what they prepare (SegmentRentOutlierRule rewrites
+        # SegmentPriceBounds, which ListingGate admits scraped listings
+        # against), so the dry run's writes are rolled back once counted
+        with transaction.atomic():
+            counts = _apply_rules(rules, run, batch_size, dry_run)
+            transaction.set_rollback(True)
+    else:
+        backfill_location_keys()
+        counts = _apply_rules(rules, run, batch_size, dry_run)
+
+    run.flagged_counts = counts
+    run.listings_flagged = sum(counts.values())
+    run.segments_evaluated = sum(getattr(rule, 'segments', 0) for rule in rules)
+    run.completed_at = timezone.now()
+    run.save()
+
+    logger.info(f"Quality run {run.id} flagged {run.listings_flagged} listings: {counts}")
+    return run
+
+
+def _apply_rules(rules, run, batch_size, dry_run):
+    """Prepare the rules and flag (or count) what each matches; returns the counts per rule"""
+    for rule in rules:
+        rule.prepare(run, comparable_listings().exclude(_earlier_condition(rules, rule)))
+
+    counts = {rule.name: 0 for rule in rules}
+    pk_range = PropertyListing.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if pk_range['low'] is None:
+        return counts
+    for window_start in range(pk_range['low'], pk_range['high'] + 1, batch_size):
+        window = comparable_listings().filter(pk__gte=window_start, pk__lt=window_start + batch_size)
+        for rule in rules:
+            matches = window.filter(rule.condition())
+            if dry_run:
+                # Nothing is deactivated, so later rules would see the
+                # same rows again; exclude what earlier rules matched.
+                matches = matches.exclude(_earlier_condition(rules, rule))
+                counts[rule.name] += matches.count()
+            else:
+                counts[rule.name] += matches.update(
+                    is_active=False,
+                    quality_flag=rule.flag,
+                    quality_run=run,
+                )
+    return counts
+
+
+def _earlier_condition(rules, rule):
+    """Q matching the listings a rule before ``rule`` flags"""
+    earlier = Q()
+    for other in rules[:rules.index(rule)]:
+        earlier |= Q(other.condition())
+    return earlier
+
+
+def revert_quality_run(run):
+    """Reactivate every listing a run flagged"""
+    restored = PropertyListing.objects.filter(quality_run=run).update(
+        is_active=True,
+        quality_flag='',
+        quality_run=None,
+    )
+    run.reverted_at = timezone.now()
+    run.save(update_fields=['reverted_at'])
+    return restored
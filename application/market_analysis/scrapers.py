@@ -1,73 +1,19 @@
 import requests
 from bs4 import BeautifulSoup
 import time
-import random
 from urllib.parse import urljoin, urlparse, parse_qs
 import re
 from decimal import Decimal
 from datetime import datetime
 from .models import PropertyListing, ScrapingJob
+from .gating import admit_listing
+from .throttle import SourceUnavailable, polite_get
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Try to import Scrapy runner, fallback to basic scraping if not available
-try:
-    from scrapers.scrape_runner import scraper_runner
-    SCRAPY_AVAILABLE = True
-except ImportError:
-    SCRAPY_AVAILABLE = False
-    logger.warning("Scrapy not available, using basic scraping")
-
-
-def run_market_analysis_scraping(user, property_type='house', bedrooms=4, location='london'):
-    """
-    Run comprehensive market analysis scraping
-    Uses the new simple scraper that works reliably
-    """
-    
-    # Create scraping job
-    job = ScrapingJob.objects.create(
-        user=user,
-        property_type=property_type,
-        bedrooms=bedrooms,
-        location=location,
-        status='running',
-        started_at=timezone.now()
-    )
-    
-    try:
-        # Import the working simple scraper
-        from simple_scraper import run_property_scraping
-        
-        logger.info(f"Running property scraping for {property_type}s in {location}")
-        
-        # Run the scraping
-        saved_count = run_property_scraping(
-            property_type=property_type.lower(),
-            bedrooms=bedrooms,
-            location=location.lower()
-        )
-        
-        # Update job status
-        job.status = 'completed'
-        job.properties_scraped = saved_count
-        job.completed_at = timezone.now()
-        job.save()
-        
-        logger.info(f"Scraping completed: {saved_count} properties saved")
-        return saved_count
-        
-    except Exception as e:
-        job.status = 'failed'
-        job.error_message = str(e)
-        job.completed_at = timezone.now()
-        job.save()
-        
-        logger.error(f"Scraping failed: {e}")
-        return 0
-
 
 def run_basic_scraping(user, property_type='house', bedrooms=4, location='london'):
     """
@@ -127,15 +73,26 @@ def run_basic_scraping(user, property_type='house', bedrooms=4, location='london
 class PropertyScraper:
     """Base class for property website scrapers"""
     
-    def __init__(self):
+    # Longest wait for any one HTTP response
+    REQUEST_TIMEOUT = 15
+
+    def __init__(self, deadline=None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
-        
-    def random_delay(self, min_seconds=1, max_seconds=3):
-        """Add random delay between requests to be respectful"""
-        time.sleep(random.uniform(min_seconds, max_seconds))
+        # time.monotonic() by which scrape_listings() returns what it has (see sources.py)
+        self.deadline = deadline
+
+    def time_left(self):
+        return float('inf') if self.deadline is None else self.deadline - time.monotonic()
+
+    def request_timeout(self):
+        return max(1, min(self.REQUEST_TIMEOUT, self.time_left()))
+
+    def get(self, url, **kwargs):
+        """GET through the site's throttle and circuit breaker (see throttle.py)"""
+        return polite_get(self.session, url, deadline=self.deadline, timeout=self.request_timeout(), **kwargs)
         
     def extract_price(self, price_text):
         """Extract price from various formats"""
@@ -156,8 +113,8 @@ class PropertyScraper:
 class RightmoveScraper(PropertyScraper):
     """Scraper for Rightmove property listings"""
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, deadline=None):
+        super().__init__(deadline)
         self.base_url = "https://www.rightmove.co.uk"
         
     def build_search_url(self, location, property_type='', min_bedrooms=1, max_bedrooms=None, radius=2):
@@ -185,7 +142,7 @@ class RightmoveScraper(PropertyScraper):
             search_url = self.build_search_url(location, property_type, bedrooms, bedrooms + 1)
             
             logger.info(f"Scraping Rightmove: {search_url}")
-            response = self.session.get(search_url)
+            response = self.get(search_url)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -194,17 +151,19 @@ class RightmoveScraper(PropertyScraper):
             property_cards = soup.find_all('div', class_='l-searchResult')[:max_results]
             
             for card in property_cards:
+                if self.time_left() <= 0:
+                    break
                 try:
                     listing_data = self.extract_listing_data(card, property_type)
                     if listing_data:
                         listings.append(listing_data)
-                        
-                    self.random_delay(0.5, 1.5)
                     
                 except Exception as e:
                     logger.error(f"Error extracting listing data: {e}")
                     continue
                     
+        except SourceUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error scraping Rightmove: {e}")
             
@@ -263,8 +222,8 @@ class RightmoveScraper(PropertyScraper):
 class OpenRentScraper(PropertyScraper):
     """Scraper for OpenRent property listings"""
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, deadline=None):
+        super().__init__(deadline)
         self.base_url = "https://www.openrent.co.uk"
         
     def scrape_listings(self, location, property_type='flat', bedrooms=2, max_results=50):
@@ -282,7 +241,7 @@ class OpenRentScraper(PropertyScraper):
             }
             
             logger.info(f"Scraping OpenRent: {search_url}")
-            response = self.session.get(search_url, params=params)
+            response = self.get(search_url, params=params)
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -291,17 +250,19 @@ class OpenRentScraper(PropertyScraper):
             property_cards = soup.find_all('div', class_='pli')[:max_results]
             
             for card in property_cards:
+                if self.time_left() <= 0:
+                    break
                 try:
                     listing_data = self.extract_listing_data(card, property_type)
                     if listing_data:
                         listings.append(listing_data)
-                        
-                    self.random_delay(0.5, 1.5)
                     
                 except Exception as e:
                     logger.error(f"Error extracting OpenRent listing: {e}")
                     continue
                     
+        except SourceUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error scraping OpenRent: {e}")
             
@@ -347,68 +308,82 @@ class OpenRentScraper(PropertyScraper):
             return None
 
 
-def run_market_analysis_scraping(user, property_type='flat', bedrooms=2, location='london'):
-    """Run comprehensive market analysis by scraping multiple sources"""
-    
-    # Create scraping job
-    job = ScrapingJob.objects.create(
-        user=user,
-        property_type=property_type,
-        bedrooms=bedrooms,
-        location=location,
-        status='running',
-        started_at=timezone.now()
-    )
-    
-    all_listings = []
-    
+def save_listings(listings):
+    """
+    Write scraped listing dicts as PropertyListings, skipping incomplete ones,
+    ones already stored and ones the listing gate rejects. Returns the number saved.
+    """
+    listings = [data for data in listings if data.get('weekly_rent') and data.get('title')]
+    # What's already stored, in one query, so the gate only judges new listings
+    stored = set(PropertyListing.objects.filter(
+        source__in={data['source'] for data in listings},
+        source_id__in={data['source_id'] for data in listings},
+    ).values_list('source', 'source_id'))
+    saved_count = 0
+    for listing_data in listings:
+        key = (listing_data['source'], listing_data['source_id'])
+        if key in stored:
+            continue
+        try:
+            if not admit_listing(listing_data):
+                continue
+            with transaction.atomic():
+                PropertyListing.objects.create(**listing_data)
+        except IntegrityError:
+            # Stored by a concurrent job since the lookup
+            pass
+        except Exception as e:
+            logger.error(f"Error saving listing: {e}")
+        else:
+            saved_count += 1
+        stored.add(key)
+    return saved_count
+
+
+def run_market_analysis_scraping(user, property_type='flat', bedrooms=2, location='london', job=None, sources=None):
+    """
+    Search every listing source at once (see sources.py) and save what they
+    find. Returns the number of new listings.
+
+    Progress is recorded on ``job``, or on a new ScrapingJob if none is given.
+    Each source's outcome is recorded in the job's source_status, and those
+    that fail, miss their deadline or are cut off by their circuit breaker in
+    its error_message. If none of them answer (RuntimeError) or anything else
+    raises, the job is marked failed and the exception re-raised.
+    """
+    from .sources import run_sources
+
+    if job is None:
+        job = ScrapingJob.objects.create(
+            user=user,
+            property_type=property_type,
+            bedrooms=bedrooms,
+            location=location,
+            status='running',
+            started_at=timezone.now()
+        )
+
     try:
-        # Initialize scrapers
-        rightmove_scraper = RightmoveScraper()
-        openrent_scraper = OpenRentScraper()
-        
-        # Scrape Rightmove
-        logger.info("Starting Rightmove scraping...")
-        rightmove_listings = rightmove_scraper.scrape_listings(location, property_type, bedrooms)
-        all_listings.extend(rightmove_listings)
-        
-        time.sleep(2)  # Delay between different sites
-        
-        # Scrape OpenRent
-        logger.info("Starting OpenRent scraping...")
-        openrent_listings = openrent_scraper.scrape_listings(location, property_type, bedrooms)
-        all_listings.extend(openrent_listings)
-        
-        # Save listings to database
-        saved_count = 0
-        for listing_data in all_listings:
-            try:
-                if listing_data.get('weekly_rent') and listing_data.get('title'):
-                    listing, created = PropertyListing.objects.get_or_create(
-                        source=listing_data['source'],
-                        source_id=listing_data['source_id'],
-                        defaults=listing_data
-                    )
-                    if created:
-                        saved_count += 1
-            except Exception as e:
-                logger.error(f"Error saving listing: {e}")
-                
-        # Update job status
-        job.status = 'completed'
-        job.completed_at = timezone.now()
-        job.properties_scraped = saved_count
-        job.save()
-        
-        logger.info(f"Scraping completed. {saved_count} new properties saved.")
-        return saved_count
-        
+        results = run_sources(location, property_type, bedrooms, names=sources)
+        answered = [result for result in results if result.status == 'ok']
+        job.source_status = {result.source: result.summary() for result in results}
+        job.error_message = '; '.join(f"{result.source}: {result.error}" for result in results if result.status != 'ok')
+        if not answered:
+            raise RuntimeError(f"No listing source answered: {job.error_message or 'no sources available'}")
+        saved_count = save_listings([listing for result in answered for listing in result.listings])
     except Exception as e:
-        # Update job with error
+        # A job left running would block the user's next analysis
         job.status = 'failed'
-        job.error_message = str(e)
+        job.error_message = job.error_message or str(e)
         job.completed_at = timezone.now()
         job.save()
-        
         logger.error(f"Scraping failed: {e}")
-        raise e
\ No newline at end of file
+        raise
+
+    job.status = 'completed'
+    job.properties_scraped = saved_count
+    job.completed_at = timezone.now()
+    job.save()
+
+    logger.info(f"Scraping completed. {saved_count} new properties saved from {', '.join(r.source for r in answered)}.")
+    return saved_count
@@ -0,0 +1,256 @@
+"""
+Where listings come from, and the fan-out that searches them all at once.
+
+Each source is a fetch function registered with @listing_source, declaring
+what it is and can do:
+
+    kind            'requests', 'scrapy' or 'synthetic'
+    property_types  the property types it lists, or None for any
+    requires        modules it needs; without them it is skipped
+    domain          the site it fetches from, whose circuit breaker it answers to (see throttle.py)
+    deadline        seconds a search waits for it (LISTING_SOURCE_DEADLINE if not given)
+    enabled         whether searches use it when LISTING_SOURCES doesn't name sources
+
+``fetch(location, property_type, bedrooms, deadline)`` returns listing dicts
+in the shape save_listings() takes. ``deadline`` is a time.monotonic()
+value; sources that can stop early should return what they have by then.
+Fetch functions import their scraping code when called, so web workers that
+never scrape never load it (see application/startup.py).
+
+run_sources() runs the applicable sources in parallel on a thread pool of
+its own and collects each one's listings until its deadline. A source still
+running then is left to finish in the background and its listings are
+dropped; one that raises is logged. A source whose domain's circuit breaker
+is open is not run at all. Either way the search returns what the others
+found.
+
+Python threads can't be stopped, so a late source is bounded in two ways:
+its HTTP requests time out by its deadline (throttle.polite_get), so it
+finishes soon after, and until then it only holds a thread of its own
+search's pool, never one another search is waiting for.
+"""
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass, field
+import importlib.util
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .throttle import CircuitBreaker, CircuitOpen, SourceUnavailable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ListingSource:
+    name: str
+    fetch: object
+    kind: str
+    property_types: frozenset = None
+    requires: tuple = ()
+    domain: str = ''
+    deadline: float = None
+    enabled: bool = True
+
+    @property
+    def installed(self):
+        return all(importlib.util.find_spec(module) for module in self.requires)
+
+    def lists(self, property_type):
+        return self.property_types is None or property_type in self.property_types
+
+    @property
+    def timeout(self):
+        return self.deadline or settings.LISTING_SOURCE_DEADLINE
+
+
+@dataclass
+class SourceResult:
+    source: str
+    status: str  # 'ok', 'timeout', 'failed', 'throttled' or 'circuit_open'
+    listings: list = field(default_factory=list)
+    seconds: float = 0.0
+    error: str = ''
+    breaker: str = ''  # the domain's breaker state afterwards
+
+    def summary(self):
+        """What ScrapingJob.source_status records for the source"""
+        return {
+            'status': self.status, 'listings': len(self.listings), 'seconds': self.seconds,
+            'error': self.error, 'breaker': self.breaker,
+        }
+
+
+_sources = {}
+
+
+def listing_source(name, kind, property_types=None, requires=(), domain='', deadline=None, enabled=True):
+    """Register the decorated fetch function as the listing source ``name``"""
+    def register(fetch):
+        _sources[name] = ListingSource(
+            name, fetch, kind, frozenset(property_types) if property_types else None, tuple(requires), domain,
+            deadline, enabled,
+        )
+        return fetch
+    return register
+
+
+def registered_sources():
+    return dict(_sources)
+
+
+def sources_for(property_type, names=None):
+    """
+    The sources a search for ``property_type`` uses: ``names``, else
+    LISTING_SOURCES, else every source enabled by default. Sources whose
+    modules aren't installed or that don't list the property type are left out.
+    """
+    names = names or settings.LISTING_SOURCES
+    if names:
+        unknown = set(names) - _sources.keys()
+        if unknown:
+            logger.warning(f"Unknown listing sources ignored: {', '.join(sorted(unknown))}")
+        chosen = [_sources[name] for name in names if name in _sources]
+    else:
+        chosen = [source for source in _sources.values() if source.enabled]
+    return [source for source in chosen if source.installed and source.lists(property_type)]
+
+
+def _fetch(source, location, property_type, bedrooms, deadline):
+    try:
+        return list(source.fetch(location=location, property_type=property_type, bedrooms=bedrooms, deadline=deadline))
+    finally:
+        # Pool threads aren't covered by request_finished
+        close_old_connections()
+
+
+def run_sources(location, property_type, bedrooms, names=None):
+    """Search every applicable source at once; returns a SourceResult per source, in registration order"""
+    started = time.monotonic()
+    sources = sources_for(property_type, names)
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(len(sources), settings.LISTING_SOURCE_THREADS)), thread_name_prefix='listing-source',
+    )
+    running = []
+    for source in sources:
+        if source.domain and CircuitBreaker(source.domain).state == CircuitBreaker.OPEN:
+            running.append((source, None))
+        else:
+            running.append((source, executor.submit(
+                _fetch, source, location, property_type, bedrooms, started + source.timeout,
+            )))
+
+    results = []
+    for source, future in running:
+        try:
+            if future is None:
+                raise CircuitOpen(f'{source.domain} circuit breaker is open')
+            listings = future.result(timeout=max(0, started + source.timeout - time.monotonic()))
+            result = SourceResult(source.name, 'ok', listings)
+        except (TimeoutError, CancelledError):
+            result = SourceResult(source.name, 'timeout', error=f'no answer within {source.timeout:g}s')
+        except CircuitOpen as e:
+            result = SourceResult(source.name, 'circuit_open', error=str(e))
+        except SourceUnavailable as e:
+            result = SourceResult(source.name, 'throttled', error=str(e))
+        except Exception as e:
+            logger.exception(f"Listing source {source.name} failed")
+            result = SourceResult(source.name, 'failed', error=str(e))
+        result.seconds = round(time.monotonic() - started, 2)
+        result.breaker = CircuitBreaker(source.domain).state if source.domain else ''
+        logger.info(f"Listing source {source.name}: {result.status}, {len(result.listings)} listings in {result.seconds}s")
+        results.append(result)
+    # Sources still queued past their deadline never start; late ones
+    # finish on their own without anyone waiting for them
+    executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+# Built-in sources
+
+@listing_source('rightmove', kind='requests', domain='www.rightmove.co.uk')
+def rightmove(location, property_type, bedrooms, deadline):
+    from .scrapers import RightmoveScraper
+    return RightmoveScraper(deadline=deadline).scrape_listings(location, property_type, bedrooms)
+
+
+@listing_source('openrent', kind='requests', domain='www.openrent.co.uk')
+def openrent(location, property_type, bedrooms, deadline):
+    from .scrapers import OpenRentScraper
+    return OpenRentScraper(deadline=deadline).scrape_listings(location, property_type, bedrooms)
+
+
+@listing_source('simulated', kind='synthetic', enabled=False)
+def simulated(location, property_type, bedrooms, deadline):
+    """Generated listings modelled on the UK market (simple_scraper), for demos and empty towns"""
+    from simple_scraper import RespectfulPropertyScraper
+    return RespectfulPropertyScraper().collect_properties(property_type, bedrooms, location)
+
+
+# Runs one spider and prints the items it yields as JSON lines
+SPIDER_SCRIPT = """
+import json, sys
+from scrapy.crawler import CrawlerProcess
+from scrapers import property_spiders
+process = CrawlerProcess({'LOG_ENABLED': False, 'FEEDS': {'stdout:': {'format': 'jsonlines'}}})
+process.crawl(getattr(property_spiders, sys.argv[1]), **json.loads(sys.argv[2]))
+process.start()
+"""
+
+
+# Seconds before the deadline a spider is stopped, so the listings it had
+# yielded reach run_sources() while it's still waiting for them
+SPIDER_STOP_MARGIN = 2
+
+
+def run_spider(spider, domain, location, property_type, bedrooms, deadline):
+    """
+    Run a Scrapy spider in a child process and return the listings it yields.
+    Twisted's reactor can't be restarted within a process, and a child
+    process, unlike a thread, can be stopped before the deadline. Scrapy's
+    AutoThrottle paces the spider's own requests; the domain's circuit
+    breaker counts each run as one request.
+    """
+    breaker = CircuitBreaker(domain)
+    if not breaker.allow():
+        raise CircuitOpen(f'{domain} circuit breaker is {breaker.state}')
+    arguments = json.dumps({'location': location, 'property_type': property_type, 'bedrooms': str(bedrooms)})
+    try:
+        result = subprocess.run(
+            [sys.executable, '-c', SPIDER_SCRIPT, spider, arguments],
+            # Unbuffered, so the items printed before it's killed aren't lost
+            cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'application.settings', 'PYTHONUNBUFFERED': '1'},
+            capture_output=True, text=True, timeout=max(0.1, deadline - SPIDER_STOP_MARGIN - time.monotonic()),
+        )
+    except subprocess.TimeoutExpired as e:
+        # Keep what the spider had printed when it was stopped
+        output = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or '')
+    else:
+        if result.returncode:
+            breaker.record_failure()
+            raise RuntimeError(result.stderr.strip()[-500:] or f'{spider} exited with {result.returncode}')
+        output = result.stdout
+        breaker.record_success()
+    listings = []
+    for line in output.splitlines():
+        try:
+            listings.append(json.loads(line))
+        except ValueError:
+            continue
+    return listings
+
+
+@listing_source('rightmove_spider', kind='scrapy', requires=['scrapy'], domain='www.rightmove.co.uk', enabled=False)
+def rightmove_spider(location, property_type, bedrooms, deadline):
+    return run_spider('RightmoveSpider', 'www.rightmove.co.uk', location, property_type, bedrooms, deadline)
+
+
+@listing_source('bestagent_spider', kind='scrapy', requires=['scrapy'], domain='bestagent.property', enabled=False)
+def bestagent_spider(location, property_type, bedrooms, deadline):
+    return run_spider('BestAgentSpider', 'bestagent.property', location, property_type, bedrooms, deadline)
@@ -0,0 +1,41 @@
+"""
+Synthetic listings for benchmarks and load tests, shaped like the scrapers'
+output: towns, property types and bedroom counts in rough proportion to the
+real data, with rents spread log-normally around each town's typical rent.
+"""
+from decimal import Decimal
+
+# (town, postcode prefix, typical 1-bed weekly rent, relative frequency)
+TOWNS = [
+    ('London', 'E1', 380, 30), ('Manchester', 'M1', 230, 12), ('Birmingham', 'B1', 200, 10),
+    ('Leeds', 'LS1', 190, 7), ('Bristol', 'BS1', 260, 6), ('Liverpool', 'L1', 170, 6),
+    ('Nottingham', 'NG1', 170, 5), ('Sheffield', 'S1', 160, 5), ('Salford', 'M5', 210, 4),
+    ('Cambridge', 'CB1', 330, 3), ('Oxford', 'OX1', 340, 3), ('York', 'YO1', 220, 3),
+    ('Exeter', 'EX1', 210, 2), ('Bath', 'BA1', 280, 2), ('Newcastle', 'NE1', 165, 2),
+]
+STREETS = ['High Street', 'Station Road', 'Church Lane', 'Victoria Road', 'Park Avenue', 'Mill Lane']
+PROPERTY_TYPES = [('flat', 55), ('house', 25), ('studio', 8), ('room', 6), ('maisonette', 4), ('bungalow', 2)]
+SOURCES = ['rightmove', 'openrent', 'spareroom', 'zoopla']
+
+
+def synthetic_listing(rng, source_id, prefix='bench'):
+    """A listing dict shaped like the scrapers' output, with plausible rents"""
+    town, outward, base_rent, _ = rng.choices(TOWNS, weights=[t[3] for t in TOWNS])[0]
+    property_type = rng.choices([p[0] for p in PROPERTY_TYPES], weights=[p[1] for p in PROPERTY_TYPES])[0]
+    bedrooms = 1 if property_type in ('studio', 'room') else rng.choices([1, 2, 3, 4], weights=[30, 40, 20, 10])[0]
+    weekly_rent = Decimal(round(base_rent * (1 + 0.3 * (bedrooms - 1)) * rng.lognormvariate(0, 0.2)))
+    address = f'{rng.randint(1, 300)} {rng.choice(STREETS)}, {town}'
+    postcode = f'{outward} {rng.randint(1, 9)}{rng.choice("ABDEFGHJLNPQRSTUWXYZ")}{rng.choice("ABDEFGHJLNPQRSTUWXYZ")}'
+    return {
+        'title': f'{bedrooms} bedroom {property_type} to rent',
+        'address': address,
+        'postcode': postcode,
+        'area': town,
+        'weekly_rent': weekly_rent,
+        'monthly_rent': (weekly_rent * 52 / 12).quantize(Decimal('0.01')),
+        'bedrooms': bedrooms,
+        'property_type': property_type,
+        'source': SOURCES[source_id % len(SOURCES)],
+        'source_id': f'{prefix}-{source_id}',
+        'source_url': f'https://example.com/listing/{source_id}',
+    }
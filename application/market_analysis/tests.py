@@ -1,3 +1,358 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import logging
+import random
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from application.models import User
+from .gating import ListingGate, P2Quantile, admit_listing
+from .models import PropertyListing, QuarantinedListing, ScrapeDomainState, ScrapingJob, SegmentPriceBounds
+from .quality import revert_quality_run, run_quality_rules
+from .scrapers import run_market_analysis_scraping
+from .sources import ListingSource, run_sources
+from .throttle import CircuitBreaker, DomainThrottle, SourceUnavailable, polite_get
+
+
+class ScrapingJobTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Failed jobs and the performance middleware log
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+
+    def login(self):
+        client = Client()
+        session = client.session
+        session.update({'user_id': self.user.id, 'username': self.user.username, 'is_authenticated': True})
+        session.save()
+        return client
+
+    def running_job(self, started_at):
+        return ScrapingJob.objects.create(
+            user=self.user, property_type='flat', bedrooms=2, location='leeds', status='running', started_at=started_at,
+        )
+
+    def test_job_fails_when_scraping_raises(self):
+        job = self.running_job(timezone.now())
+        with mock.patch('market_analysis.sources.run_sources', side_effect=ValueError('parser broke')):
+            with self.assertRaises(ValueError):
+                run_market_analysis_scraping(self.user, 'flat', 2, 'leeds', job=job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_message, 'parser broke')
+        self.assertIsNotNone(job.completed_at)
+
+    def test_running_job_blocks_a_new_analysis(self):
+        job = self.running_job(timezone.now())
+        response = self.login().post(reverse('market_analysis:start_analysis'), secure=True)
+        self.assertEqual(response.json()['job_id'], job.id)
+        self.assertFalse(response.json()['success'])
+
+    def test_stale_running_job_is_failed_and_does_not_block(self):
+        job = self.running_job(timezone.now() - timedelta(hours=1))
+        with mock.patch('market_analysis.views.run_blocking', side_effect=RuntimeError('not scraping in tests')):
+            self.login().post(reverse('market_analysis:start_analysis'), secure=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(ScrapingJob.objects.filter(user=self.user).count(), 2)
+
+
+def listing(rent, source_id='1'):
+    return {
+        'source': 'test', 'source_id': source_id, 'address': '1 Test Street, Manchester',
+        'property_type': 'flat', 'bedrooms': 2, 'weekly_rent': Decimal(rent),
+    }
+
+
+class ListingGateTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The gate logs every quarantined listing
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def test_p2_estimates_quartiles(self):
+        rng = random.Random(1)
+        quartiles = {p: P2Quantile(p) for p in (0.25, 0.5, 0.75)}
+        for _ in range(5000):
+            x = rng.uniform(0, 1000)
+            for quartile in quartiles.values():
+                quartile.add(x)
+        for p, quartile in quartiles.items():
+            self.assertAlmostEqual(quartile.value(), p * 1000, delta=25)
+
+    def test_outlier_is_rejected_once_the_segment_has_enough_samples(self):
+        gate = ListingGate(min_samples=20)
+        self.assertEqual(gate.check(listing(2000))[:2], (True, ''))
+        for rent in range(200, 220):
+            gate.check(listing(rent))
+        self.assertEqual(gate.check(listing(2000))[:2], (False, 'price_outlier'))
+        self.assertEqual(gate.check(listing(210))[:2], (True, ''))
+
+    def test_estimate_follows_a_market_that_moves(self):
+        gate = ListingGate(min_samples=20)
+        for rent in range(200, 220):
+            gate.check(listing(rent))
+        # Rejected listings still feed the estimate, so the new price level
+        # is accepted once it is most of what is being scraped
+        results = [gate.check(listing(300 + i % 10))[0] for i in range(60)]
+        self.assertFalse(results[0])
+        self.assertTrue(results[-1])
+
+    def test_stored_bounds_are_used_before_any_samples(self):
+        SegmentPriceBounds.objects.create(
+            location_key='manchester', property_type='flat', bedrooms=2, sample_size=50, method='iqr',
+            q1=180, median=200, q3=220, lower_bound=120, upper_bound=280, computed_at=timezone.now(),
+        )
+        gate = ListingGate()
+        self.assertEqual(gate.check(listing(300)), (False, 'price_outlier', (120.0, 280.0)))
+        self.assertEqual(gate.check(listing(250))[:2], (True, ''))
+
+    def test_listing_rejected_again_updates_its_quarantine_row(self):
+        self.assertFalse(admit_listing(listing(0)))
+        self.assertFalse(admit_listing(listing(-5)))
+        quarantined = QuarantinedListing.objects.get()
+        self.assertEqual(quarantined.reason, 'invalid_rent')
+        self.assertEqual(quarantined.weekly_rent, Decimal(-5))
+
+
+class ListingQualityTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Quality runs log what they flag
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.source_ids = iter(range(1000))
+        for rent in range(200, 208):
+            self.listing(rent)
+        self.outlier = self.listing(400)
+        # pw/pcm mix-ups: weekly rents that are really monthly
+        self.mixed_up = [self.listing(900, monthly=900) for _ in range(4)]
+        self.unpriced = self.listing(0, monthly=0)
+
+    def listing(self, weekly, monthly=None):
+        weekly = Decimal(weekly)
+        return PropertyListing.objects.create(
+            title='Flat', address='5 Elm Road, Leeds', property_type='flat', bedrooms=2, weekly_rent=weekly,
+            monthly_rent=weekly * 52 / 12 if monthly is None else Decimal(monthly),
+            source='test', source_url='#', source_id=str(next(self.source_ids)),
+        )
+
+    def flags(self):
+        return dict(PropertyListing.objects.filter(is_active=False).values_list('pk', 'quality_flag'))
+
+    def test_each_listing_is_flagged_by_the_first_rule_it_fails(self):
+        run = run_quality_rules()
+        self.assertEqual(run.flagged_counts, {'non_positive_rent': 1, 'rent_consistency': 4, 'segment_rent_outlier': 1})
+        self.assertEqual(self.flags(), {
+            self.unpriced.pk: 'invalid_rent',
+            **{listing.pk: 'inconsistent_rent' for listing in self.mixed_up},
+            self.outlier.pk: 'price_outlier',
+        })
+
+    def test_rents_failing_earlier_rules_are_left_out_of_the_bounds(self):
+        run_quality_rules()
+        bounds = SegmentPriceBounds.objects.get()
+        # With the mixed-up 900s counted, q3 would be 900 and nothing an outlier
+        self.assertEqual((bounds.sample_size, bounds.q3), (9, Decimal(206)))
+
+    def test_dry_run_counts_without_changing_anything(self):
+        out = StringIO()
+        call_command('listing_quality', '--dry-run', stdout=out)
+        self.assertEqual(self.flags(), {})
+        self.assertFalse(SegmentPriceBounds.objects.exists())
+        # The bounds the run computed are reported, though not kept
+        self.assertIn('2-bed flat in leeds: £171.40-£236.60/week (n=9', out.getvalue())
+        self.assertIn('Would flag 6 listings', out.getvalue())
+
+    def test_reverted_run_reactivates_its_listings(self):
+        run = run_quality_rules()
+        self.assertEqual(revert_quality_run(run), 6)
+        self.assertEqual(self.flags(), {})
+
+
+@override_settings(SCRAPE_MIN_DELAY=1.0, SCRAPE_MAX_DELAY=10.0, SCRAPE_BREAKER_FAILURES=3, SCRAPE_BREAKER_COOLDOWN=60)
+class ThrottleTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Backing off and the breaker opening are logged
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.throttle = DomainThrottle('example.com')
+        self.breaker = CircuitBreaker('example.com')
+
+    def state(self):
+        return ScrapeDomainState.objects.get(domain='example.com')
+
+    def test_reservations_are_spaced_by_the_delay(self):
+        waits = [self.throttle.reserve() for _ in range(3)]
+        for wait, expected in zip(waits, [0, 1, 2]):
+            self.assertAlmostEqual(wait, expected, delta=0.1)
+
+    def test_slot_past_the_limit_is_not_claimed(self):
+        self.throttle.reserve()
+        self.throttle.reserve()
+        self.assertIsNone(self.throttle.reserve(limit=0.5))
+        self.assertAlmostEqual(self.throttle.reserve(), 2, delta=0.1)
+
+    def test_delay_follows_latency_within_bounds(self):
+        self.throttle.observe(5)
+        self.assertEqual(self.throttle.delay, 3)
+        self.throttle.back_off()
+        self.throttle.back_off()
+        self.assertEqual(self.throttle.delay, 10)
+        for _ in range(4):
+            self.throttle.observe(0)
+        self.assertEqual(self.throttle.delay, 1)
+
+    def test_retry_after_holds_every_request(self):
+        self.throttle.back_off(retry_after=30)
+        self.assertAlmostEqual(self.throttle.reserve(), 30, delta=0.5)
+
+    def test_breaker_opens_after_failures_in_a_row(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_failures_while_open_do_not_extend_the_cooldown(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        open_until = self.state().open_until
+        self.breaker.record_failure()
+        self.assertEqual(self.state().open_until, open_until)
+
+    def test_half_open_breaker_lets_one_probe_through(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        ScrapeDomainState.objects.update(open_until=time.time() - 1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        # A failed probe opens it again, a successful one closes it
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        ScrapeDomainState.objects.update(open_until=time.time() - 1)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failures_are_forgotten_after_a_quiet_spell(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        ScrapeDomainState.objects.update(last_failure_at=time.time() - 3600)
+        self.breaker.record_failure()
+        self.assertEqual(self.state().failures, 1)
+
+
+class RecordingSession:
+    """A requests session that records each request's arguments"""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, **kwargs):
+        self.requests.append(kwargs)
+        return mock.Mock(status_code=200)
+
+
+@override_settings(LISTING_SOURCES=[], LISTING_SOURCE_THREADS=1, SCRAPE_MIN_DELAY=0.0)
+class SourceDeadlineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Every source's outcome is logged
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+        def stuck(**kwargs):
+            self.release.wait(5)
+            return []
+
+        def fast(**kwargs):
+            return [listing(200)]
+
+        sources = mock.patch.dict('market_analysis.sources._sources', {
+            'stuck': ListingSource('stuck', stuck, 'synthetic', deadline=0.2),
+            'fast': ListingSource('fast', fast, 'synthetic', deadline=1),
+        })
+        sources.start()
+        self.addCleanup(sources.stop)
+
+    def test_late_source_times_out_without_holding_up_the_next_search(self):
+        started = time.monotonic()
+        result, = run_sources('manchester', 'flat', 2, names=['stuck'])
+        self.assertEqual(result.status, 'timeout')
+        self.assertLess(time.monotonic() - started, 1)
+
+        # The stuck source still has its thread; the next search has its own
+        result, = run_sources('manchester', 'flat', 2, names=['fast'])
+        self.assertEqual((result.status, len(result.listings)), ('ok', 1))
+
+    def test_request_timeout_is_capped_at_the_deadline(self):
+        session = RecordingSession()
+        polite_get(session, 'https://example.com/', deadline=time.monotonic() + 2, timeout=15)
+        polite_get(session, 'https://example.com/', deadline=time.monotonic() + 30, timeout=15)
+        self.assertLessEqual(session.requests[0]['timeout'], 2)
+        self.assertEqual(session.requests[1]['timeout'], 15)
+
+    def test_passed_deadline_sends_no_request(self):
+        session = RecordingSession()
+        with self.assertRaises(SourceUnavailable):
+            polite_get(session, 'https://example.com/', deadline=time.monotonic() - 1, timeout=15)
+        self.assertEqual(session.requests, [])
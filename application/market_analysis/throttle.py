@@ -0,0 +1,236 @@
+"""
+Per-domain politeness and circuit breaking for the listing scrapers.
+
+State lives in one ScrapeDomainState row per domain, which every worker
+shares, so they all space their requests to a portal and see the same
+breaker. Each change is a single conditional UPDATE, so it is atomic
+without a lock to poll for: a concurrent worker's UPDATE of the row waits
+for the first one's transaction instead.
+
+Throttle: the delay between requests to a domain follows its response time
+(the average of the current delay and the latest latency, within
+SCRAPE_MIN_DELAY and SCRAPE_MAX_DELAY), so a portal that slows down is asked
+less often. A 429 or 5xx doubles the delay, and a Retry-After header holds
+every request to the domain until the time it gives.
+
+Circuit breaker: after SCRAPE_BREAKER_FAILURES failures in a row (errors,
+429 or 5xx), the domain's breaker opens and requests fail at once with
+CircuitOpen for SCRAPE_BREAKER_COOLDOWN seconds. Failures reported while it
+is open (requests already in flight) don't extend that. It then lets one
+probe request through at a time: a success closes it, a failure opens it
+again.
+"""
+from email.utils import parsedate_to_datetime
+import logging
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest, Least
+
+from .models import ScrapeDomainState
+
+logger = logging.getLogger(__name__)
+
+# Responses that mean "slow down" rather than "no results"
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+# Retries of a 429/503 that named a Retry-After short enough to wait out
+MAX_RETRIES = 2
+
+
+class SourceUnavailable(Exception):
+    """A request was not made: the domain's breaker is open, or waiting for it would pass the deadline"""
+
+
+class CircuitOpen(SourceUnavailable):
+    pass
+
+
+def retry_after_seconds(value):
+    """Seconds to wait from a Retry-After header (seconds or an HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def domain_state(domain):
+    """The domain's state row as a queryset, for conditional updates"""
+    return ScrapeDomainState.objects.filter(domain=domain)
+
+
+def ensure_state(domain):
+    """Create the domain's row unless it exists; returns whether it did"""
+    if domain_state(domain).exists():
+        return False
+    try:
+        with transaction.atomic():
+            ScrapeDomainState.objects.create(domain=domain, delay=settings.SCRAPE_MIN_DELAY)
+    except IntegrityError:
+        # Created by another worker in the meantime
+        pass
+    return True
+
+
+def update_state(domain, condition=Q(), **changes):
+    """
+    Apply ``changes`` to the domain's row if it matches ``condition``,
+    creating the row on first use; returns whether it matched
+    """
+    if domain_state(domain).filter(condition).update(**changes):
+        return True
+    return ensure_state(domain) and bool(domain_state(domain).filter(condition).update(**changes))
+
+
+def clamped_delay(delay):
+    return Least(Greatest(delay, Value(settings.SCRAPE_MIN_DELAY)), Value(settings.SCRAPE_MAX_DELAY))
+
+
+class DomainThrottle:
+    def __init__(self, domain):
+        self.domain = domain
+
+    @property
+    def delay(self):
+        delay = domain_state(self.domain).values_list('delay', flat=True).first()
+        return settings.SCRAPE_MIN_DELAY if delay is None else delay
+
+    def reserve(self, limit=None):
+        """
+        Claim the next request slot for the domain and return the seconds to
+        wait for it, or None without claiming it if that's over ``limit``
+        """
+        now = time.time()
+        slots = domain_state(self.domain)
+        if limit is not None:
+            slots = slots.filter(next_request_at__lte=now + limit)
+        while True:
+            with transaction.atomic():
+                # The UPDATE locks the row until the slot it claimed has been read back
+                if slots.update(next_request_at=Greatest(F('next_request_at'), Value(now)) + F('delay')):
+                    next_request_at, delay = domain_state(self.domain).values_list('next_request_at', 'delay').get()
+                    return max(0.0, next_request_at - delay - now)
+            if not ensure_state(self.domain):
+                return None
+
+    def observe(self, latency):
+        """A successful response took ``latency`` seconds"""
+        update_state(self.domain, delay=clamped_delay((F('delay') + Value(latency)) / 2))
+
+    def back_off(self, retry_after=None):
+        changes = {'delay': clamped_delay(F('delay') * 2)}
+        if retry_after:
+            # Slots already claimed past the pause stand
+            changes['next_request_at'] = Greatest(F('next_request_at'), Value(time.time() + retry_after))
+        update_state(self.domain, **changes)
+        logger.warning(f"Backing off {self.domain}: {self.delay:g}s between requests" + (f", paused {retry_after:g}s" if retry_after else ''))
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, domain):
+        self.domain = domain
+
+    @property
+    def state(self):
+        open_until = domain_state(self.domain).values_list('open_until', flat=True).first()
+        if open_until is None:
+            return self.CLOSED
+        return self.OPEN if time.time() < open_until else self.HALF_OPEN
+
+    def allow(self):
+        """Whether a request may go out now; in half-open state, only one probe at a time across workers"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        now = time.time()
+        return bool(domain_state(self.domain).filter(
+            Q(probe_until__isnull=True) | Q(probe_until__lte=now), open_until__lte=now,
+        ).update(probe_until=now + settings.SCRAPE_MAX_DELAY))
+
+    def record_success(self):
+        if domain_state(self.domain).filter(open_until__isnull=False).update(failures=0, open_until=None, probe_until=None):
+            logger.info(f"Circuit breaker for {self.domain} closed")
+        else:
+            domain_state(self.domain).filter(failures__gt=0).update(failures=0)
+
+    def record_failure(self):
+        now = time.time()
+        cooldown = settings.SCRAPE_BREAKER_COOLDOWN
+        opened = {'open_until': now + cooldown, 'probe_until': None, 'failures': 0}
+        # The probe failed: open again. While open nothing changes, so
+        # failures of requests already in flight don't extend the cooldown
+        if domain_state(self.domain).filter(open_until__lte=now).update(**opened):
+            logger.warning(f"Circuit breaker for {self.domain} opened again for {cooldown}s")
+            return
+        # Failures are forgotten after a quiet spell as well as on success
+        quiet_since = now - cooldown * 4
+        counted = update_state(
+            self.domain, Q(open_until__isnull=True),
+            failures=Case(When(last_failure_at__lt=quiet_since, then=Value(1)), default=F('failures') + 1),
+            last_failure_at=now,
+        )
+        if counted and domain_state(self.domain).filter(
+            open_until__isnull=True, failures__gte=settings.SCRAPE_BREAKER_FAILURES,
+        ).update(**opened):
+            logger.warning(f"Circuit breaker for {self.domain} opened for {cooldown}s")
+
+
+def polite_get(session, url, deadline=None, **kwargs):
+    """
+    session.get(url) through the domain's breaker and throttle. Raises
+    CircuitOpen if the breaker is open, SourceUnavailable if waiting for a
+    slot would pass ``deadline`` (a time.monotonic() value), and whatever
+    requests raises otherwise. No request's timeout runs past the deadline.
+    429/5xx responses are returned after any retries, for the caller's
+    raise_for_status().
+    """
+    import requests
+
+    domain = urlparse(url).hostname
+    breaker, throttle = CircuitBreaker(domain), DomainThrottle(domain)
+    for _ in range(MAX_RETRIES + 1):
+        if not breaker.allow():
+            raise CircuitOpen(f'{domain} circuit breaker is {breaker.state}')
+        wait = throttle.reserve(None if deadline is None else deadline - time.monotonic())
+        if wait is None:
+            raise SourceUnavailable(f'{domain} is throttled past the deadline')
+        time.sleep(wait)
+
+        started = time.monotonic()
+        request_kwargs = kwargs
+        if deadline is not None:
+            if deadline <= started:
+                raise SourceUnavailable(f'{domain} deadline passed')
+            timeout = deadline - started
+            if kwargs.get('timeout') is not None:
+                timeout = min(kwargs['timeout'], timeout)
+            request_kwargs = {**kwargs, 'timeout': timeout}
+        try:
+            response = session.get(url, **request_kwargs)
+        except requests.RequestException:
+            breaker.record_failure()
+            throttle.back_off()
+            raise
+        if response.status_code not in BACKOFF_STATUSES:
+            breaker.record_success()
+            throttle.observe(time.monotonic() - started)
+            return response
+
+        retry_after = retry_after_seconds(response.headers.get('Retry-After'))
+        breaker.record_failure()
+        throttle.back_off(retry_after)
+        time_left = float('inf') if deadline is None else deadline - time.monotonic()
+        if response.status_code not in (429, 503) or retry_after is None or retry_after >= time_left:
+            return response
+    return response
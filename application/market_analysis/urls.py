@@ -7,4 +7,5 @@ urlpatterns = [
     path('', views.market_analysis_view, name='analysis'),
     path('start/', views.start_market_analysis, name='start_analysis'),
     path('history/', views.analysis_history, name='history'),
+    path('jobs/<int:job_id>/', views.job_status, name='job_status'),
 ]
\ No newline at end of file
@@ -1,66 +1,34 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import render
+from django.http import Http404, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.db.models import Avg, Count, Q
 from django.utils import timezone
 from decimal import Decimal
 import statistics
-from application.models import User
+from application.decorators import require_authentication
+from application.executors import run_blocking
+from application.normalizers import bedroom_count
 from .models import PropertyListing, MarketAnalysis, ScrapingJob
-from .scrapers import run_market_analysis_scraping
 import logging
 import re
 
 logger = logging.getLogger(__name__)
 
 def parse_bedrooms(bedrooms_value):
-    """Parse bedrooms value to integer"""
-    if bedrooms_value is None:
-        return 2
-    
-    # If it's already an integer, return it
-    if isinstance(bedrooms_value, int):
-        return bedrooms_value
-    
-    # If it's a string, try to extract number
-    bedrooms_str = str(bedrooms_value).lower().strip()
-    
-    # Remove common words
-    bedrooms_str = bedrooms_str.replace('bedrooms', '').replace('bedroom', '').replace('bed', '').strip()
-    
-    # Handle word numbers
-    word_to_num = {
-        'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
-        'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10
-    }
-    
-    if bedrooms_str in word_to_num:
-        return word_to_num[bedrooms_str]
-    
-    # Try to extract first number
-    import re
-    numbers = re.findall(r'\d+', bedrooms_str)
-    if numbers:
-        return int(numbers[0])
-    
-    # Default fallback
-    return 2
-
-def require_authentication(view_func):
-    """Decorator to require authentication"""
-    def wrapper(request, *args, **kwargs):
-        if not request.session.get('is_authenticated'):
-            return redirect('login')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+    """Parse bedrooms value to integer, defaulting to 2 when it can't be read"""
+    bedrooms = bedroom_count(bedrooms_value)
+    return 2 if bedrooms is None else bedrooms
 
 
 @require_authentication
-def market_analysis_view(request):
+async def market_analysis_view(request):
     """Display market analysis for the user's property"""
-    user_id = request.session.get('user_id')
-    user = get_object_or_404(User, id=user_id)
+    user = await request.aapp_user()
     
     # Get user's property details
     property_type = user.property_type.lower() if user.property_type else 'flat'
@@ -73,30 +41,31 @@ def market_analysis_view(request):
     # Check for existing recent analysis (skip if force refresh)
     recent_analysis = None
     if not force_refresh:
-        recent_analysis = MarketAnalysis.objects.filter(
+        recent_analysis = await MarketAnalysis.objects.filter(
             user=user,
             created_at__gte=timezone.now() - timezone.timedelta(days=7)
-        ).first()
+        ).afirst()
     
     if recent_analysis:
         # Use existing analysis
         analysis = recent_analysis
-        comparable_properties = analysis.comparable_properties.all()[:20]
+        comparable_properties = [prop async for prop in analysis.comparable_properties.all()[:20]]
     else:
         # Delete any existing analyses for this user if force refresh
         if force_refresh:
-            MarketAnalysis.objects.filter(user=user).delete()
+            await MarketAnalysis.objects.filter(user=user).adelete()
             logger.info(f"Force refresh: deleted existing analyses for user {user.id}")
         
         # Create new analysis
-        analysis, comparable_properties = create_market_analysis(user, property_type, bedrooms, location)
+        analysis, comparable_properties = await sync_to_async(create_market_analysis)(user, property_type, bedrooms, location)
+        comparable_properties = list(comparable_properties)
     
     # Calculate market position
     user_weekly_rent = None
     if user.weekly_rent:
         try:
             # Clean the weekly rent string and convert to decimal
-            rent_str = user.weekly_rent.replace('£', '').replace(',', '').strip()
+            rent_str = str(user.weekly_rent).replace('£', '').replace(',', '').strip()
             user_weekly_rent = Decimal(rent_str)
         except (ValueError, Exception):
             user_weekly_rent = None
@@ -114,14 +83,39 @@ def market_analysis_view(request):
     return render(request, 'market_analysis/analysis_results.html', context)
 
 
+def run_analysis_job(job, user, property_type, bedrooms, location):
+    """
+    Scrape listings for a job and build the analysis from them.
+
+    Blocking (HTTP requests, politeness sleeps, ORM), so async views run
+    it in a worker thread. Returns (analysis, comparable_properties, scraped_count).
+    """
+    # Imported here so web workers that never scrape don't load requests and bs4 at boot
+    from .scrapers import run_market_analysis_scraping
+
+    try:
+        try:
+            scraped_count = run_market_analysis_scraping(user, property_type, bedrooms, location, job=job)
+        except Exception as scraping_error:
+            logger.warning(f"Scraping failed, using sample data: {scraping_error}")
+            # Fallback to sample data if scraping fails
+            scraped_count = create_sample_data(user, property_type, bedrooms, location)
+        
+        # Create new analysis
+        analysis, comparable_properties = create_market_analysis(user, property_type, bedrooms, location)
+        return analysis, list(comparable_properties), scraped_count
+    finally:
+        # Worker threads aren't covered by request_finished
+        close_old_connections()
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_authentication
-def start_market_analysis(request):
+async def start_market_analysis(request):
     """Start a new market analysis by scraping current data"""
     try:
-        user_id = request.session.get('user_id')
-        user = get_object_or_404(User, id=user_id)
+        user = await request.aapp_user()
         
         # Get parameters from request
         property_type = request.POST.get('property_type', user.property_type or 'flat').lower()
@@ -129,37 +123,49 @@ def start_market_analysis(request):
         bedrooms = parse_bedrooms(bedrooms_param)
         location = request.POST.get('location', user.town or 'london')
         
-        # Check for running jobs
-        running_job = ScrapingJob.objects.filter(
+        # Check for running jobs; one running past SCRAPING_JOB_TIMEOUT was
+        # cut off and is marked failed
+        stale_before = timezone.now() - timedelta(seconds=settings.SCRAPING_JOB_TIMEOUT)
+        await ScrapingJob.objects.filter(user=user, status='running', started_at__lt=stale_before).aupdate(
+            status='failed', error_message='Timed out', completed_at=timezone.now(),
+        )
+        running_job = await ScrapingJob.objects.filter(
             user=user,
             status='running'
-        ).first()
+        ).afirst()
         
         if running_job:
             return JsonResponse({
                 'success': False,
-                'message': 'Analysis already in progress. Please wait.'
+                'message': 'Analysis already in progress. Please wait.',
+                'job_id': running_job.id,
             })
         
+        job = await ScrapingJob.objects.acreate(
+            user=user,
+            property_type=property_type,
+            bedrooms=bedrooms,
+            location=location,
+            status='running',
+            started_at=timezone.now()
+        )
+        
         # Start scraping job (in a real app, this would be queued)
         try:
             # Use real scraping now that dependencies are available
             logger.info(f"Starting market analysis for {user.name}: {property_type}, {bedrooms} beds in {location}")
             
-            try:
-                scraped_count = run_market_analysis_scraping(user, property_type, bedrooms, location)
-            except Exception as scraping_error:
-                logger.warning(f"Scraping failed, using sample data: {scraping_error}")
-                # Fallback to sample data if scraping fails
-                scraped_count = create_sample_data(user, property_type, bedrooms, location)
-            
-            # Create new analysis
-            analysis, comparable_properties = create_market_analysis(user, property_type, bedrooms, location)
+            # Scraping waits on other sites for tens of seconds; running it
+            # off the event loop lets this process keep serving other requests
+            analysis, comparable_properties, scraped_count = await run_blocking(
+                run_analysis_job, job, user, property_type, bedrooms, location
+            )
             
             return JsonResponse({
                 'success': True,
                 'message': f'Market analysis completed! Found {len(comparable_properties)} comparable properties.',
                 'analysis_id': analysis.id,
+                'job_id': job.id,
                 'scraped_count': scraped_count
             })
             
@@ -177,6 +183,18 @@ def start_market_analysis(request):
         }, status=400)
 
 
+@require_authentication
+async def job_status(request, job_id):
+    """Poll the progress of one of the user's scraping jobs"""
+    user = await request.aapp_user()
+    job = await ScrapingJob.objects.filter(pk=job_id, user=user).values(
+        'id', 'status', 'properties_scraped', 'error_message', 'source_status', 'started_at', 'completed_at',
+    ).afirst()
+    if job is None:
+        raise Http404("No such job")
+    return JsonResponse(job)
+
+
 def get_similar_market_tier(location):
     """Get similar market tier locations for fallback property matching"""
     location_lower = location.lower()
@@ -251,12 +269,8 @@ def create_market_analysis(user, property_type, bedrooms, location):
             Q(postcode__icontains=location)
         )
         
-        logger.warning(f"DEBUG: Location filtering for '{location}'")
-        logger.warning(f"DEBUG: Total comparable properties: {comparable_properties.count()}")
-        logger.warning(f"DEBUG: Location filtered properties: {location_filtered.count()}")
-        
         # If no local properties found, fall back to similar market tier
-        if location_filtered.count() == 0:
+        if not location_filtered.exists():
             logger.warning(f"No properties found in {location}, using similar market properties")
             
             # Determine market tier and find similar locations
@@ -282,14 +296,12 @@ def create_market_analysis(user, property_type, bedrooms, location):
                 )
             
             # Final fallback - use all properties if still no matches
-            if location_filtered.count() == 0:
+            if not location_filtered.exists():
                 logger.warning(f"Using all available properties as fallback")
                 location_filtered = comparable_properties
     
     comparable_properties = location_filtered
     
-    logger.warning(f"DEBUG: Properties before time filter: {comparable_properties.count()}")
-    
     # Limit to recent listings - TEMPORARILY DISABLED FOR DEBUGGING
     # recent_cutoff = timezone.now() - timezone.timedelta(days=30)
     # comparable_properties = comparable_properties.filter(
@@ -297,9 +309,6 @@ def create_market_analysis(user, property_type, bedrooms, location):
     # ).order_by('-scraped_at')[:100]
     comparable_properties = comparable_properties.order_by('-scraped_at')[:100]
     
-    logger.warning(f"DEBUG: Properties after limiting to 100: {comparable_properties.count()}")
-    # logger.info(f"DEBUG: Time cutoff: {recent_cutoff}")
-    
     # Calculate statistics
     rent_values = [float(prop.weekly_rent) for prop in comparable_properties if prop.weekly_rent]
     
@@ -382,8 +391,7 @@ def generate_market_summary(analysis, rent_values):
 @require_authentication
 def analysis_history(request):
     """Show user's analysis history"""
-    user_id = request.session.get('user_id')
-    user = get_object_or_404(User, id=user_id)
+    user = request.app_user
     
     analyses = MarketAnalysis.objects.filter(user=user).order_by('-created_at')[:10]
     
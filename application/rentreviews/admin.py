@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import RentReview
+from . import reputation
+from .models import RentReview, ReputationAggregate
 
 @admin.register(RentReview)
 class RentReviewAdmin(admin.ModelAdmin):
@@ -50,12 +51,22 @@ class RentReviewAdmin(admin.ModelAdmin):
         self.message_user(request, f'{queryset.count()} reviews marked as unverified.')
     mark_as_unverified.short_description = "Mark selected reviews as unverified"
     
+    # Through reputation.set_published() so landlord and address totals follow
     def publish_reviews(self, request, queryset):
-        queryset.update(is_published=True)
-        self.message_user(request, f'{queryset.count()} reviews published.')
+        changed = reputation.set_published(queryset, True)
+        self.message_user(request, f'{changed} reviews published.')
     publish_reviews.short_description = "Publish selected reviews"
     
     def unpublish_reviews(self, request, queryset):
-        queryset.update(is_published=False)
-        self.message_user(request, f'{queryset.count()} reviews unpublished.')
+        changed = reputation.set_published(queryset, False)
+        self.message_user(request, f'{changed} reviews unpublished.')
     unpublish_reviews.short_description = "Unpublish selected reviews"
+
+
+@admin.register(ReputationAggregate)
+class ReputationAggregateAdmin(admin.ModelAdmin):
+    list_display = ('display_name', 'kind', 'review_count', 'average_rating', 'recommend_percentage', 'updated_at')
+    list_filter = ('kind',)
+    search_fields = ('display_name', 'key')
+    # Maintained from the reviews; see rentreviews.reputation
+    readonly_fields = [field.name for field in ReputationAggregate._meta.fields]
@@ -0,0 +1,58 @@
+"""
+Reviewed rents against the scraped market, aggregated in SQL.
+
+Reviews carry weekly_rent, bedroom_count and location_key parsed by the same
+normalizers as PropertyListing, so both sides group by (town, bedrooms) in
+the database, each served by its segment index.
+The compare_rents management command prints the comparison.
+"""
+from django.db.models import Avg, Count, Max, Min
+
+from market_analysis.models import PropertyListing
+from .models import RentReview
+
+
+def _segments(queryset, bedrooms_field):
+    return {
+        (row['location_key'], row[bedrooms_field]): row
+        for row in queryset.values('location_key', bedrooms_field).annotate(
+            count=Count('pk'),
+            average=Avg('weekly_rent'),
+            lowest=Min('weekly_rent'),
+            highest=Max('weekly_rent'),
+        )
+    }
+
+
+def compare_with_market(location=None, bedrooms=None):
+    """
+    Per (town, bedrooms) segment with reviewed rents: the reviewed and listed
+    weekly rent counts, averages and ranges, and how far the reviewed average
+    sits above (positive) or below the market, in percent.
+    """
+    reviews = RentReview.objects.filter(is_published=True, weekly_rent__isnull=False, bedroom_count__isnull=False).exclude(location_key='')
+    listings = PropertyListing.objects.filter(is_active=True, is_duplicate=False)
+    if location:
+        reviews = reviews.filter(location_key=location)
+        listings = listings.filter(location_key=location)
+    if bedrooms is not None:
+        reviews = reviews.filter(bedroom_count=bedrooms)
+        listings = listings.filter(bedrooms=bedrooms)
+
+    reviewed = _segments(reviews.order_by(), 'bedroom_count')
+    market = _segments(listings.filter(location_key__in={key[0] for key in reviewed}).order_by(), 'bedrooms')
+
+    comparison = []
+    for (town, beds), review_row in sorted(reviewed.items()):
+        market_row = market.get((town, beds))
+        difference = None
+        if market_row and market_row['average']:
+            difference = round(float((review_row['average'] - market_row['average']) / market_row['average'] * 100), 1)
+        comparison.append({
+            'location_key': town,
+            'bedrooms': beds,
+            'reviews': review_row,
+            'market': market_row,
+            'difference_percent': difference,
+        })
+    return comparison
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from application.normalizers import location_key
+from rentreviews.analytics import compare_with_market
+
+
+class Command(BaseCommand):
+    help = 'Compare the weekly rents tenants reviewed with the scraped market, per town and bedroom count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--location', help='Only this town (e.g. Manchester)')
+        parser.add_argument('--bedrooms', type=int, help='Only this bedroom count')
+
+    def handle(self, *args, **options):
+        location = location_key(options['location']) if options['location'] else None
+        comparison = compare_with_market(location, options['bedrooms'])
+        if not comparison:
+            self.stdout.write('No reviewed rents to compare')
+            return
+
+        self.stdout.write(f'{"town":<20} {"beds":>4} {"reviews":>7} {"avg £/wk":>9} {"listings":>8} {"avg £/wk":>9} {"diff":>7}')
+        for segment in comparison:
+            reviews, market = segment['reviews'], segment['market']
+            listed = f'{market["count"]:>8} {market["average"]:>9.2f}' if market else f'{0:>8} {"-":>9}'
+            difference = segment['difference_percent']
+            self.stdout.write(
+                f'{segment["location_key"]:<20} {segment["bedrooms"]:>4} {reviews["count"]:>7} '
+                f'{reviews["average"]:>9.2f} {listed} {"-" if difference is None else f"{difference:+.1f}%":>7}'
+            )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from rentreviews.reputation import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute landlord and address reputation totals from the published reviews, '
+        'e.g. after reviews were changed with update() or bulk_create()'
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f'Rebuilt {count} reputation aggregates')
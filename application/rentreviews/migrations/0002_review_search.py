@@ -0,0 +1,86 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:32
+
+from django.db import migrations, models
+
+# A later migration that makes SQLite rebuild rentreviews_rentreview (adding
+# a NOT NULL column, altering or removing one: CREATE new__..., DROP, RENAME)
+# drops these triggers with the old table; rentreviews.search.
+# restore_search_triggers puts them back after every migrate.
+SQLITE_TABLE = [
+    # External-content FTS5 table: the text lives only in rentreviews_rentreview
+    """CREATE VIRTUAL TABLE rentreviews_rentreview_fts USING fts5(
+        title, property_address, landlord_name, review_text,
+        content='rentreviews_rentreview', content_rowid='id', tokenize='porter unicode61'
+    )""",
+]
+
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER rentreviews_rentreview_fts_insert AFTER INSERT ON rentreviews_rentreview BEGIN
+        INSERT INTO rentreviews_rentreview_fts(rowid, title, property_address, landlord_name, review_text)
+        VALUES (new.id, new.title, new.property_address, new.landlord_name, new.review_text);
+    END""",
+    """CREATE TRIGGER rentreviews_rentreview_fts_delete AFTER DELETE ON rentreviews_rentreview BEGIN
+        INSERT INTO rentreviews_rentreview_fts(rentreviews_rentreview_fts, rowid, title, property_address, landlord_name, review_text)
+        VALUES ('delete', old.id, old.title, old.property_address, old.landlord_name, old.review_text);
+    END""",
+    """CREATE TRIGGER rentreviews_rentreview_fts_update
+    AFTER UPDATE OF title, property_address, landlord_name, review_text ON rentreviews_rentreview BEGIN
+        INSERT INTO rentreviews_rentreview_fts(rentreviews_rentreview_fts, rowid, title, property_address, landlord_name, review_text)
+        VALUES ('delete', old.id, old.title, old.property_address, old.landlord_name, old.review_text);
+        INSERT INTO rentreviews_rentreview_fts(rowid, title, property_address, landlord_name, review_text)
+        VALUES (new.id, new.title, new.property_address, new.landlord_name, new.review_text);
+    END""",
+]
+
+SQLITE_REBUILD = [
+    "INSERT INTO rentreviews_rentreview_fts(rentreviews_rentreview_fts) VALUES ('rebuild')",
+]
+
+SQLITE_FORWARD = SQLITE_TABLE + SQLITE_TRIGGERS + SQLITE_REBUILD
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS rentreviews_rentreview_fts_update',
+    'DROP TRIGGER IF EXISTS rentreviews_rentreview_fts_delete',
+    'DROP TRIGGER IF EXISTS rentreviews_rentreview_fts_insert',
+    'DROP TABLE IF EXISTS rentreviews_rentreview_fts',
+]
+
+# The expression must match rentreviews.search.PG_DOCUMENT exactly
+POSTGRESQL_FORWARD = [
+    """CREATE INDEX review_search_idx ON rentreviews_rentreview USING gin (
+        to_tsvector('english', coalesce(title, '') || ' ' || coalesce(property_address, '') || ' '
+        || coalesce(landlord_name, '') || ' ' || coalesce(review_text, ''))
+    )""",
+]
+
+POSTGRESQL_REVERSE = [
+    'DROP INDEX IF EXISTS review_search_idx',
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('rentreviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rentreview',
+            index=models.Index(
+                condition=models.Q(('is_published', True)), fields=['-created_at', '-id'], name='review_published_created_idx',
+            ),
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:42
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_reputation(apps, schema_editor):
+    from rentreviews.reputation import collect
+
+    RentReview = apps.get_model('rentreviews', 'RentReview')
+    ReputationAggregate = apps.get_model('rentreviews', 'ReputationAggregate')
+    fields = [
+        'is_published', 'landlord_name', 'property_address', 'overall_rating', 'would_recommend',
+        'property_condition_rating', 'landlord_communication_rating', 'value_for_money_rating',
+        'maintenance_response_rating',
+    ]
+    totals = {}
+    for review in RentReview.objects.filter(is_published=True).values(*fields).iterator(chunk_size=2000):
+        collect(totals, review, 1)
+    ReputationAggregate.objects.bulk_create([
+        ReputationAggregate(kind=kind, key=key, display_name=display_name[:300], **counts)
+        for (kind, key), (display_name, counts) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentreviews', '0002_review_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReputationAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('landlord', 'Landlord'), ('address', 'Property address')], max_length=20)),
+                ('key', models.CharField(help_text='Normalized landlord name or address', max_length=300)),
+                ('display_name', models.CharField(help_text='As written in the first review counted', max_length=300)),
+                ('review_count', models.IntegerField(default=0)),
+                ('overall_rating_sum', models.IntegerField(default=0)),
+                ('recommend_count', models.IntegerField(default=0)),
+                ('property_condition_sum', models.IntegerField(default=0)),
+                ('property_condition_count', models.IntegerField(default=0)),
+                ('landlord_communication_sum', models.IntegerField(default=0)),
+                ('landlord_communication_count', models.IntegerField(default=0)),
+                ('value_for_money_sum', models.IntegerField(default=0)),
+                ('value_for_money_count', models.IntegerField(default=0)),
+                ('maintenance_response_sum', models.IntegerField(default=0)),
+                ('maintenance_response_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='reputation_kind_key_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_reputation, migrations.RunPython.noop),
+    ]
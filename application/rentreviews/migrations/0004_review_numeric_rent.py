@@ -0,0 +1,143 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:45
+
+from decimal import ROUND_HALF_UP, Decimal
+import re
+
+from django.db import migrations, models
+
+# Frozen copies of the application.normalizers parsers, so that changing
+# those later doesn't change what this migration does
+
+# Full UK postcode, e.g. "M3 7AG", "SW1A 1AA"
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b', re.IGNORECASE)
+# Bare outward code on its own, e.g. "M3", "NW2"
+OUTWARD_CODE_RE = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$', re.IGNORECASE)
+
+COUNTRY_SUFFIXES = {'uk', 'united kingdom', 'england', 'scotland', 'wales', 'northern ireland', 'gb'}
+
+
+def clean_text(value):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    value = re.sub(r'[^\w\s]', ' ', str(value or '').lower())
+    return ' '.join(value.split())
+
+
+def location_key(address):
+    """The town ``address`` is in"""
+    parts = []
+    for part in str(address or '').split(','):
+        part = clean_text(POSTCODE_RE.sub('', part))
+        if part and part not in COUNTRY_SUFFIXES and not OUTWARD_CODE_RE.match(part):
+            parts.append(part)
+
+    return parts[-1][:100] if parts else ''
+
+
+# Rent period markers, checked in order; they may follow the amount directly, as in "250pw"
+PERIOD_MARKERS = {
+    'week': r'pw|p/w|per\s*week|a\s*week|weekly|week|wk',
+    'month': r'pcm|pm|p/m|per\s*(?:calendar\s*)?month|a\s*month|monthly|month|mth',
+    'year': r'pa|p/a|per\s*(?:annum|year)|a\s*year|yearly|annually|year',
+}
+RENT_PERIODS = [
+    (period, re.compile(rf'(?<![a-z])(?:{markers})(?![a-z])', re.IGNORECASE))
+    for period, markers in PERIOD_MARKERS.items()
+]
+# An amount written after a pound sign; thousands may be separated by commas or spaces
+CURRENCY_AMOUNT_RE = re.compile(r'(?:£|gbp)\s*(\d{1,3}(?:[,\s]\d{3})+|\d+)(?![\d,])(\.\d+)?(\s*k\b)?', re.IGNORECASE)
+# Any other amount, except a bedroom count as in "2 bed"
+AMOUNT_RE = re.compile(
+    r'(?<![\d.,])(\d{1,3}(?:,\d{3})+|\d+)(?![\d,])(\.\d+)?(\s*k\b)?(?!\s*(?:bed|br\b|b/r))', re.IGNORECASE,
+)
+
+# An amount with no period at or above this is taken to be monthly
+UNLABELLED_MONTHLY_FROM = Decimal('500')
+# Weekly rents outside these are taken to be misreadings rather than rents
+MIN_WEEKLY_RENT = Decimal('20')
+MAX_WEEKLY_RENT = Decimal('20000')
+
+WORD_NUMBERS = {
+    'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10,
+}
+
+
+def weekly_rent(text):
+    """Weekly rent in pounds from a hand-typed price, or None"""
+    text = str(text or '')
+    match = CURRENCY_AMOUNT_RE.search(text) or AMOUNT_RE.search(text)
+    if not match:
+        return None
+    whole, fraction, thousands = match.groups()
+    amount = Decimal(re.sub(r'[,\s]', '', whole) + (fraction or '')) * (1000 if thousands else 1)
+
+    period = next((name for name, pattern in RENT_PERIODS if pattern.search(text)), None)
+    if period is None:
+        period = 'month' if amount >= UNLABELLED_MONTHLY_FROM else 'week'
+    if period == 'month':
+        amount = amount * 12 / 52
+    elif period == 'year':
+        amount = amount / 52
+    if not MIN_WEEKLY_RENT <= amount <= MAX_WEEKLY_RENT:
+        return None
+    return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def bedroom_count(text):
+    """Number of bedrooms from a hand-typed value, or None"""
+    if isinstance(text, int):
+        return text
+    text = clean_text(text)
+    if not text:
+        return None
+    if 'studio' in text:
+        return 0
+    match = re.search(r'\d+', text)
+    if match:
+        return int(match.group())
+    return next((number for word, number in WORD_NUMBERS.items() if re.search(rf'\b{word}\b', text)), None)
+
+
+def parse_existing_reviews(apps, schema_editor):
+    RentReview = apps.get_model('rentreviews', 'RentReview')
+    batch = []
+    for review in RentReview.objects.only('rent_amount', 'bedrooms', 'property_address').iterator(chunk_size=2000):
+        review.weekly_rent = weekly_rent(review.rent_amount)
+        review.bedroom_count = bedroom_count(review.bedrooms)
+        review.location_key = location_key(review.property_address)
+        batch.append(review)
+        if len(batch) == 2000:
+            RentReview.objects.bulk_update(batch, ['weekly_rent', 'bedroom_count', 'location_key'])
+            batch = []
+    RentReview.objects.bulk_update(batch, ['weekly_rent', 'bedroom_count', 'location_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('rentreviews', '0003_reputationaggregate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentreview',
+            name='bedroom_count',
+            field=models.IntegerField(blank=True, help_text='Parsed from bedrooms', null=True),
+        ),
+        migrations.AddField(
+            model_name='rentreview',
+            name='location_key',
+            field=models.CharField(blank=True, help_text='Normalised town, as on PropertyListing', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='rentreview',
+            name='weekly_rent',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Parsed from rent_amount', max_digits=10, null=True),
+        ),
+        migrations.RunPython(parse_existing_reviews, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rentreview',
+            index=models.Index(fields=['location_key', 'bedroom_count', 'weekly_rent'], name='review_segment_rent_idx'),
+        ),
+    ]
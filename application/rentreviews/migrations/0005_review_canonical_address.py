@@ -0,0 +1,116 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:50
+
+from collections import Counter
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the application.normalizers and rentreviews.reputation
+# helpers the address aggregates are keyed by, so that changing those later
+# doesn't change what this migration does
+
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2}\d[A-Z\d]?)\s*(\d[A-Z]{2})\b', re.IGNORECASE)
+OUTWARD_CODE_RE = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$', re.IGNORECASE)
+COUNTRY_SUFFIXES = {'uk', 'united kingdom', 'england', 'scotland', 'wales', 'northern ireland', 'gb'}
+STREET_ABBREVIATIONS = {
+    'rd': 'road', 'st': 'street', 'ave': 'avenue', 'av': 'avenue', 'ln': 'lane', 'dr': 'drive',
+    'ct': 'court', 'pl': 'place', 'sq': 'square', 'cres': 'crescent', 'gdns': 'gardens',
+    'gdn': 'garden', 'terr': 'terrace', 'ter': 'terrace', 'cl': 'close', 'gr': 'grove',
+    'pde': 'parade', 'hwy': 'highway', 'bldgs': 'buildings', 'wlk': 'walk',
+}
+FLAT_RE = re.compile(r'^(flat|apartment|apt|unit|room)\b\s*(\w+)', re.IGNORECASE)
+NUMBERED_STREET_RE = re.compile(r'^(\d+[a-z]?)(?:\s*-\s*\d+[a-z]?)?\s+(.+)$', re.IGNORECASE)
+
+SUB_RATINGS = {
+    'property_condition_rating': 'property_condition',
+    'landlord_communication_rating': 'landlord_communication',
+    'value_for_money_rating': 'value_for_money',
+    'maintenance_response_rating': 'maintenance_response',
+}
+REVIEW_FIELDS = ['is_published', 'property_address', 'overall_rating', 'would_recommend', *SUB_RATINGS]
+
+
+def clean_text(value):
+    value = re.sub(r'[^\w\s]', ' ', str(value or '').lower())
+    return ' '.join(value.split())
+
+
+def location_key(address):
+    parts = []
+    for part in str(address or '').split(','):
+        part = clean_text(POSTCODE_RE.sub('', part))
+        if part and part not in COUNTRY_SUFFIXES and not OUTWARD_CODE_RE.match(part):
+            parts.append(part)
+    return parts[-1][:100] if parts else ''
+
+
+def parse_address(address):
+    match = POSTCODE_RE.search(str(address or ''))
+    postcode = f'{match.group(1)} {match.group(2)}'.upper() if match else ''
+    number = street = ''
+    rest = []
+    for part in str(address or '').split(','):
+        match = NUMBERED_STREET_RE.match(FLAT_RE.sub('', POSTCODE_RE.sub('', part)).strip(' ,'))
+        if not number and match and not match.group(2)[:1].isdigit():
+            street = ' '.join(STREET_ABBREVIATIONS.get(word, word) for word in clean_text(match.group(2)).split())
+            number, street = match.group(1).lower()[:20], street[:150]
+        elif not FLAT_RE.match(part.strip()):
+            rest.append(part)
+    return {'postcode': postcode, 'number': number, 'street': street, 'town': location_key(','.join(rest))}
+
+
+def normalize_address(address):
+    parts = parse_address(address)
+    if parts['number'] and parts['street'] and (parts['postcode'] or parts['town']):
+        return f"{parts['postcode'] or parts['town']}|{parts['number']}|{parts['street']}"[:200]
+    return clean_text(address)
+
+
+def contribution(review):
+    counts = Counter(review_count=1, overall_rating_sum=review['overall_rating'] or 0)
+    counts['recommend_count'] = 1 if review['would_recommend'] else 0
+    for field, prefix in SUB_RATINGS.items():
+        if review[field] is not None:
+            counts[f'{prefix}_sum'] = review[field]
+            counts[f'{prefix}_count'] = 1
+    return counts
+
+
+def rekey_address_reputation(apps, schema_editor):
+    # Address aggregates are now keyed by the building's address key
+    RentReview = apps.get_model('rentreviews', 'RentReview')
+    ReputationAggregate = apps.get_model('rentreviews', 'ReputationAggregate')
+    totals = {}
+    for review in RentReview.objects.filter(is_published=True).values(*REVIEW_FIELDS).iterator(chunk_size=2000):
+        key = normalize_address(review['property_address'])
+        if key:
+            display_name, counts = totals.setdefault(key, [(review['property_address'] or '').strip(), Counter()])
+            counts.update(contribution(review))
+    ReputationAggregate.objects.filter(kind='address').delete()
+    ReputationAggregate.objects.bulk_create([
+        ReputationAggregate(kind='address', key=key, display_name=display_name[:300], **counts)
+        for key, (display_name, counts) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0011_canonical_address'),
+        ('rentreviews', '0004_review_numeric_rent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentreview',
+            name='address_key',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='rentreview',
+            name='canonical_address',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reviews', to='application.canonicaladdress'),
+        ),
+        migrations.RunPython(rekey_address_reputation, migrations.RunPython.noop),
+    ]
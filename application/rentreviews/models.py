@@ -1,7 +1,9 @@
 from django.db import models
-from application.models import User
+from django.utils import timezone
+from application.models import AddressLinked, CanonicalAddress, User
+from application.normalizers import bedroom_count, location_key, weekly_rent
 
-class RentReview(models.Model):
+class RentReview(AddressLinked):
     """Model for rent reviews submitted by tenants"""
     
     # Review details
@@ -39,6 +41,16 @@ class RentReview(models.Model):
     # Issues reported
     issues_reported = models.TextField(blank=True, help_text="Any issues during tenancy")
     
+    # Parsed from the text fields above on save, for analysis in SQL
+    weekly_rent = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, help_text="Parsed from rent_amount")
+    bedroom_count = models.IntegerField(blank=True, null=True, help_text="Parsed from bedrooms")
+    location_key = models.CharField(max_length=100, blank=True, help_text="Normalised town, as on PropertyListing")
+    
+    # The building property_address refers to, shared with listings and users (see application/addresses.py)
+    address_key = models.CharField(max_length=200, blank=True, editable=False)
+    canonical_address = models.ForeignKey(CanonicalAddress, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='reviews')
+    address_fields = ('property_address',)
+    
     # Moderation
     is_verified = models.BooleanField(default=False)
     is_published = models.BooleanField(default=True)
@@ -50,12 +62,33 @@ class RentReview(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Browsing published reviews newest first, a keyset page at a time (see search.py)
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(is_published=True), name='review_published_created_idx',
+            ),
+            # Reviewed rents per market segment, the same shape as listing_segment_rent_idx
+            models.Index(fields=['location_key', 'bedroom_count', 'weekly_rent'], name='review_segment_rent_idx'),
+        ]
         verbose_name = "Rent Review"
         verbose_name_plural = "Rent Reviews"
     
     def __str__(self):
         return f"{self.title} - {self.property_address} ({self.overall_rating}★)"
     
+    def parse_text_fields(self):
+        """Fill the typed rent, bedroom and location fields from what the tenant typed"""
+        self.weekly_rent = weekly_rent(self.rent_amount)
+        self.bedroom_count = bedroom_count(self.bedrooms)
+        self.location_key = location_key(self.property_address)
+    
+    def save(self, *args, **kwargs):
+        self.parse_text_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'weekly_rent', 'bedroom_count', 'location_key'}
+        super().save(*args, **kwargs)
+    
     @property
     def average_rating(self):
         """Calculate average of all specific ratings"""
@@ -67,3 +100,75 @@ class RentReview(models.Model):
         ]
         valid_ratings = [r for r in ratings if r is not None]
         return round(sum(valid_ratings) / len(valid_ratings), 1) if valid_ratings else self.overall_rating
+
+
+class ReputationAggregate(models.Model):
+    """
+    Running totals over the published reviews of one landlord or one property
+    address, keyed by its normalized name (see rentreviews.reputation).
+    """
+
+    LANDLORD = 'landlord'
+    ADDRESS = 'address'
+    KIND_CHOICES = [
+        (LANDLORD, 'Landlord'),
+        (ADDRESS, 'Property address'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=300, help_text="Normalized landlord name or address")
+    display_name = models.CharField(max_length=300, help_text="As written in the first review counted")
+
+    review_count = models.IntegerField(default=0)
+    overall_rating_sum = models.IntegerField(default=0)
+    recommend_count = models.IntegerField(default=0)
+    # Sub-ratings are optional, so each keeps its own count
+    property_condition_sum = models.IntegerField(default=0)
+    property_condition_count = models.IntegerField(default=0)
+    landlord_communication_sum = models.IntegerField(default=0)
+    landlord_communication_count = models.IntegerField(default=0)
+    value_for_money_sum = models.IntegerField(default=0)
+    value_for_money_count = models.IntegerField(default=0)
+    maintenance_response_sum = models.IntegerField(default=0)
+    maintenance_response_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='reputation_kind_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.display_name} ({self.average_rating}★ from {self.review_count})"
+
+    def _average(self, total, count):
+        return round(total / count, 1) if count else None
+
+    @property
+    def average_rating(self):
+        return self._average(self.overall_rating_sum, self.review_count)
+
+    @property
+    def recommend_ratio(self):
+        return self.recommend_count / self.review_count if self.review_count else None
+
+    @property
+    def recommend_percentage(self):
+        return round(self.recommend_ratio * 100) if self.review_count else None
+
+    @property
+    def property_condition_average(self):
+        return self._average(self.property_condition_sum, self.property_condition_count)
+
+    @property
+    def landlord_communication_average(self):
+        return self._average(self.landlord_communication_sum, self.landlord_communication_count)
+
+    @property
+    def value_for_money_average(self):
+        return self._average(self.value_for_money_sum, self.value_for_money_count)
+
+    @property
+    def maintenance_response_average(self):
+        return self._average(self.maintenance_response_sum, self.maintenance_response_count)
@@ -0,0 +1,183 @@
+"""
+Per-landlord and per-address reputation, kept as running totals.
+
+For every normalized landlord name and property address, ReputationAggregate
+holds the review count, the sum of each rating and the number of tenants who
+would recommend, over published reviews only. Showing a landlord's score is
+one indexed lookup however many reviews they have.
+
+The totals change incrementally: signals.py adds or takes away a review's
+contribution when it is created, edited, published, unpublished or deleted,
+and set_published() does the same for bulk (un)publishing. Writes that skip
+both, such as a raw queryset.update(), leave the totals stale until
+``manage.py rebuild_reputation`` recomputes them from the reviews.
+"""
+from collections import Counter
+from functools import reduce
+import operator
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from application.normalizers import address_key, clean_text, parse_address
+from .models import RentReview, ReputationAggregate
+
+# RentReview field -> ReputationAggregate prefix, for the optional sub-ratings
+SUB_RATINGS = {
+    'property_condition_rating': 'property_condition',
+    'landlord_communication_rating': 'landlord_communication',
+    'value_for_money_rating': 'value_for_money',
+    'maintenance_response_rating': 'maintenance_response',
+}
+
+# Everything a review's contribution depends on
+REVIEW_FIELDS = [
+    'is_published', 'landlord_name', 'property_address', 'overall_rating', 'would_recommend', *SUB_RATINGS,
+]
+
+LANDLORD_SUFFIXES = re.compile(r'\b(ltd|limited|llp|plc|inc|co)\b')
+
+
+def normalize_landlord_name(name):
+    """'ABC Lettings Ltd.' and 'abc lettings' count as the same landlord"""
+    return ' '.join(LANDLORD_SUFFIXES.sub(' ', clean_text(name)).split())
+
+
+def normalize_address(address):
+    """
+    The building's address key, so 'Flat 2, 5 Blackfriars Rd, Salford' and
+    '5 Blackfriars Road, Salford' count as the same address; the cleaned
+    text when it has no house number and street.
+    """
+    return address_key(parse_address(address)) or clean_text(address)
+
+
+def review_keys(review):
+    """The (kind, key, display name) aggregates ``review`` counts towards"""
+    keys = []
+    landlord = normalize_landlord_name(review['landlord_name'])
+    if landlord:
+        keys.append((ReputationAggregate.LANDLORD, landlord, (review['landlord_name'] or '').strip()))
+    address = normalize_address(review['property_address'])
+    if address:
+        keys.append((ReputationAggregate.ADDRESS, address, (review['property_address'] or '').strip()))
+    return keys
+
+
+def contribution(review):
+    """What one published review adds to each of its aggregates"""
+    counts = Counter(review_count=1, overall_rating_sum=review['overall_rating'] or 0)
+    counts['recommend_count'] = 1 if review['would_recommend'] else 0
+    for field, prefix in SUB_RATINGS.items():
+        if review[field] is not None:
+            counts[f'{prefix}_sum'] = review[field]
+            counts[f'{prefix}_count'] = 1
+    return counts
+
+
+def review_state(review):
+    """The fields of a RentReview instance the totals depend on, as a dict"""
+    return {field: getattr(review, field) for field in REVIEW_FIELDS}
+
+
+def collect(deltas, review, sign):
+    """Add ``sign`` times a review's contribution to ``deltas``, if it is published"""
+    if not review or not review['is_published']:
+        return
+    for kind, key, display_name in review_keys(review):
+        entry = deltas.setdefault((kind, key), [display_name, Counter()])
+        for field, value in contribution(review).items():
+            entry[1][field] += sign * value
+
+
+def apply_deltas(deltas):
+    """Add each collected delta to its aggregate, creating or dropping rows as needed"""
+    now = timezone.now()
+    emptied = []
+    with transaction.atomic():
+        for (kind, key), (display_name, counts) in deltas.items():
+            counts = {field: value for field, value in counts.items() if value}
+            if not counts:
+                continue
+            increments = {field: F(field) + value for field, value in counts.items()}
+            updated = ReputationAggregate.objects.filter(kind=kind, key=key).update(updated_at=now, **increments)
+            if not updated and counts.get('review_count', 0) > 0:
+                try:
+                    with transaction.atomic():
+                        ReputationAggregate.objects.create(
+                            kind=kind, key=key, display_name=display_name[:300], updated_at=now, **counts,
+                        )
+                except IntegrityError:
+                    # Created by a concurrent review in the meantime
+                    ReputationAggregate.objects.filter(kind=kind, key=key).update(updated_at=now, **increments)
+            if counts.get('review_count', 0) < 0:
+                emptied.append(Q(kind=kind, key=key))
+        # A landlord or address whose last published review went away
+        if emptied:
+            ReputationAggregate.objects.filter(reduce(operator.or_, emptied), review_count__lte=0).delete()
+
+
+def review_changed(before, after):
+    """Move a review's contribution from its ``before`` state to its ``after`` state (either may be None)"""
+    if before == after:
+        return
+    deltas = {}
+    collect(deltas, before, -1)
+    collect(deltas, after, 1)
+    apply_deltas(deltas)
+
+
+def set_published(queryset, published):
+    """Publish or unpublish every review in ``queryset``, updating the totals; returns the number changed"""
+    with transaction.atomic():
+        changing = list(queryset.exclude(is_published=published).select_for_update().values('pk', *REVIEW_FIELDS))
+        RentReview.objects.filter(pk__in=[review['pk'] for review in changing]).update(is_published=published)
+        deltas = {}
+        for review in changing:
+            collect(deltas, {**review, 'is_published': True}, 1 if published else -1)
+        apply_deltas(deltas)
+    return len(changing)
+
+
+def rebuild():
+    """Recompute every aggregate from the published reviews; returns the number of aggregates"""
+    totals = {}
+    for review in RentReview.objects.filter(is_published=True).values(*REVIEW_FIELDS).iterator(chunk_size=2000):
+        collect(totals, review, 1)
+    with transaction.atomic():
+        ReputationAggregate.objects.all().delete()
+        ReputationAggregate.objects.bulk_create([
+            ReputationAggregate(kind=kind, key=key, display_name=display_name[:300], **counts)
+            for (kind, key), (display_name, counts) in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def attach_reputations(reviews):
+    """
+    Set ``landlord_reputation`` and ``address_reputation`` (an aggregate or
+    None) on each review, with one query for the whole list.
+    """
+    reviews = list(reviews)
+    keys = {review.pk: review_keys(review_state(review)) for review in reviews}
+    wanted = Q(pk__in=[])
+    for pairs in keys.values():
+        for kind, key, _ in pairs:
+            wanted |= Q(kind=kind, key=key)
+    aggregates = {
+        (aggregate.kind, aggregate.key): aggregate
+        for aggregate in ReputationAggregate.objects.filter(wanted)
+    } if any(keys.values()) else {}
+    for review in reviews:
+        review.landlord_reputation = review.address_reputation = None
+        for kind, key, _ in keys[review.pk]:
+            setattr(review, f'{kind}_reputation', aggregates.get((kind, key)))
+    return reviews
+
+
+def lookup(kind, name):
+    """The aggregate for a landlord name or address as a user typed it, or None"""
+    normalize = normalize_landlord_name if kind == ReputationAggregate.LANDLORD else normalize_address
+    return ReputationAggregate.objects.filter(kind=kind, key=normalize(name)).first()
@@ -0,0 +1,189 @@
+"""
+Ranked full-text search over published rent reviews, a page at a time.
+
+The title, address, landlord name and review text are indexed by the
+database itself (see migration 0002): an FTS5 table kept in step by
+triggers on SQLite, and a GIN index over their tsvector on PostgreSQL.
+Other databases fall back to ``icontains``. SQLite drops the triggers
+whenever a migration rebuilds the reviews table, so
+``restore_search_triggers`` recreates them after every migrate.
+
+Pages are keyset-paginated: the cursor carries the sort key of the last
+review shown, so fetching page 500 costs the same as page 1. Searches sort
+by relevance, browsing by newest first; ties are broken by id.
+"""
+import base64
+import json
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import RentReview
+
+FTS_TABLE = 'rentreviews_rentreview_fts'
+
+# Must stay identical to the GIN index expression in migration 0002, or
+# PostgreSQL won't use the index
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(r.title, '') || ' ' || coalesce(r.property_address, '') || ' ' "
+    "|| coalesce(r.landlord_name, '') || ' ' || coalesce(r.review_text, ''))"
+)
+
+# As created by migration 0002
+SQLITE_TRIGGERS = {
+    'rentreviews_rentreview_fts_insert': f"""CREATE TRIGGER rentreviews_rentreview_fts_insert
+    AFTER INSERT ON rentreviews_rentreview BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, property_address, landlord_name, review_text)
+        VALUES (new.id, new.title, new.property_address, new.landlord_name, new.review_text);
+    END""",
+    'rentreviews_rentreview_fts_delete': f"""CREATE TRIGGER rentreviews_rentreview_fts_delete
+    AFTER DELETE ON rentreviews_rentreview BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, property_address, landlord_name, review_text)
+        VALUES ('delete', old.id, old.title, old.property_address, old.landlord_name, old.review_text);
+    END""",
+    'rentreviews_rentreview_fts_update': f"""CREATE TRIGGER rentreviews_rentreview_fts_update
+    AFTER UPDATE OF title, property_address, landlord_name, review_text ON rentreviews_rentreview BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, property_address, landlord_name, review_text)
+        VALUES ('delete', old.id, old.title, old.property_address, old.landlord_name, old.review_text);
+        INSERT INTO {FTS_TABLE}(rowid, title, property_address, landlord_name, review_text)
+        VALUES (new.id, new.title, new.property_address, new.landlord_name, new.review_text);
+    END""",
+}
+
+PAGE_SIZE = 20
+
+
+def restore_search_triggers(using='default', **kwargs):
+    """
+    post_migrate receiver: recreate any SQLite search trigger a table
+    rebuild dropped, then rebuild the FTS index so reviews saved without
+    them are found again. Does nothing when all are present.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE (type = 'table' AND name = %s) "
+            "OR (type = 'trigger' AND tbl_name = 'rentreviews_rentreview')",
+            [FTS_TABLE],
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        # Before migration 0002, or after rolling it back
+        if FTS_TABLE not in existing or not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The sort key in ``cursor``, or None for a missing or mangled one (the first page)"""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[1], int):
+        return None
+    return key
+
+
+def fts5_query(text):
+    """
+    A MATCH expression requiring every word of ``text`` as a prefix. User
+    input is never passed through as FTS5 syntax, so stray quotes or
+    operators can't make the query fail.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+
+def _ranked_ids(query, min_rating, after, limit):
+    """(id, score) pairs for the best matches after ``after``; lower scores rank higher"""
+    filters, params = ['r.is_published'], []
+    if min_rating:
+        filters.append('r.overall_rating >= %s')
+        params.append(min_rating)
+
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return []
+        # bm25() is already "lower is better"
+        sql = (
+            f'SELECT r.id, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+            f'JOIN rentreviews_rentreview r ON r.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND {" AND ".join(filters)}'
+        )
+        params.insert(0, match)
+    else:
+        # Negated so that, as with bm25(), lower is better
+        sql = (
+            f'SELECT r.id, -ts_rank({PG_DOCUMENT}, q) AS score '
+            f"FROM rentreviews_rentreview r, websearch_to_tsquery('english', %s) q "
+            f'WHERE {PG_DOCUMENT} @@ q AND {" AND ".join(filters)}'
+        )
+        params.insert(0, query)
+
+    outer = 'WHERE score > %s OR (score = %s AND id < %s) ' if after else ''
+    if after:
+        params += [after[0], after[0], after[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, score FROM ({sql}) matches {outer}ORDER BY score, id DESC LIMIT %s',
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+def search_reviews(query='', min_rating=None, cursor=None, page_size=PAGE_SIZE):
+    """
+    One page of published reviews matching ``query`` (all of them when
+    blank) with at least ``min_rating`` stars. Returns ``(reviews,
+    next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    after = decode_cursor(cursor)
+    query = query.strip()
+
+    if query and connection.vendor in ('sqlite', 'postgresql'):
+        # A cursor from browsing (or another search mode) starts over
+        if after and not isinstance(after[0], (int, float)):
+            after = None
+        rows = _ranked_ids(query, min_rating, after, page_size + 1)
+        page, more = rows[:page_size], len(rows) > page_size
+        by_id = RentReview.objects.in_bulk([review_id for review_id, _ in page])
+        reviews = [by_id[review_id] for review_id, _ in page if review_id in by_id]
+        if not more:
+            return reviews, None
+        last_id, last_score = page[-1]
+        return reviews, encode_cursor([last_score, last_id])
+
+    reviews = RentReview.objects.filter(is_published=True)
+    if query:
+        reviews = reviews.filter(
+            Q(title__icontains=query) | Q(property_address__icontains=query)
+            | Q(landlord_name__icontains=query) | Q(review_text__icontains=query)
+        )
+    if min_rating:
+        reviews = reviews.filter(overall_rating__gte=min_rating)
+    try:
+        created_at = parse_datetime(after[0]) if after and isinstance(after[0], str) else None
+    except ValueError:
+        created_at = None
+    if created_at:
+        reviews = reviews.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=after[1])
+        )
+    page = list(reviews.order_by('-created_at', '-id')[:page_size + 1])
+    if len(page) <= page_size:
+        return page, None
+    page = page[:page_size]
+    return page, encode_cursor([page[-1].created_at.isoformat(), page[-1].id])
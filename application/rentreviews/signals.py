@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from . import reputation
+from .models import RentReview
+
+
+@receiver(pre_save, sender=RentReview)
+def remember_reputation_state(sender, instance, raw=False, **kwargs):
+    # The stored row, not the instance, is what the totals currently include
+    instance._reputation_before = None
+    if instance.pk and not raw:
+        instance._reputation_before = (
+            RentReview.objects.filter(pk=instance.pk).values(*reputation.REVIEW_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=RentReview)
+def update_reputation(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reputation.review_changed(getattr(instance, '_reputation_before', None), reputation.review_state(instance))
+
+
+@receiver(post_delete, sender=RentReview)
+def remove_from_reputation(sender, instance, **kwargs):
+    reputation.review_changed(reputation.review_state(instance), None)
@@ -1,3 +1,120 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from application.models import User
+from market_analysis.models import PropertyListing
+from .analytics import compare_with_market
+from .models import RentReview
+from .search import SQLITE_TRIGGERS, restore_search_triggers, search_reviews
+
+
+class ReviewSearchTests(TestCase):
+    """
+    The SQLite index is kept in step by triggers (migration 0002) that a
+    table rebuild drops silently and a post_migrate receiver restores, so
+    search is checked against saves made through the ORM after every
+    migration has run.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='author@example.com', name='Author')
+
+    def search_ids(self, query):
+        reviews, _ = search_reviews(query)
+        return [review.id for review in reviews]
+
+    def test_new_review_is_searchable(self):
+        review = RentReview.objects.create(
+            user=self.author, property_address='1 Zebra Crossing', overall_rating=4,
+            title='Quiet flat', review_text='Helpful landlord',
+        )
+        self.assertEqual(self.search_ids('zebra'), [review.id])
+
+    def test_edited_review_is_searched_by_new_text(self):
+        review = RentReview.objects.create(
+            user=self.author, property_address='2 High Street', overall_rating=2,
+            title='Damp flat', review_text='Mould in the bathroom',
+        )
+        review.review_text = 'Mould fixed after a month of chasing'
+        review.save()
+        self.assertEqual(self.search_ids('chasing'), [review.id])
+        self.assertEqual(self.search_ids('bathroom'), [])
+
+    def test_deleted_review_leaves_search(self):
+        review = RentReview.objects.create(
+            user=self.author, property_address='3 Low Road', overall_rating=3,
+            title='Fine', review_text='Nothing to report',
+        )
+        review.delete()
+        self.assertEqual(self.search_ids('report'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite keeps the index in step with triggers')
+    def test_search_triggers_exist_after_migrating(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'rentreviews_rentreview'")
+            self.assertEqual({name for name, in cursor.fetchall()}, set(SQLITE_TRIGGERS))
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite keeps the index in step with triggers')
+    def test_dropped_trigger_is_restored_and_index_rebuilt(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER rentreviews_rentreview_fts_insert')
+        review = RentReview.objects.create(
+            user=self.author, property_address='3 Yak Lane', overall_rating=3,
+            title='Saved while the trigger was missing', review_text='Noisy neighbours',
+        )
+        self.assertEqual(self.search_ids('yak'), [])
+
+        restore_search_triggers()
+        self.assertEqual(self.search_ids('yak'), [review.id])
+        self.test_search_triggers_exist_after_migrating()
+
+
+class RentComparisonTests(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='author@example.com', name='Author')
+
+    def review(self, rent, bedrooms='two bed', address='1 Oak Street, Leeds'):
+        return RentReview.objects.create(
+            user=self.author, property_address=address, overall_rating=4, title='Review', review_text='Fine',
+            rent_amount=rent, bedrooms=bedrooms,
+        )
+
+    def listing(self, weekly_rent, source_id, bedrooms=2, address='5 Elm Road, Leeds'):
+        return PropertyListing.objects.create(
+            title='Flat', address=address, weekly_rent=Decimal(weekly_rent), monthly_rent=Decimal(weekly_rent) * 52 / 12,
+            bedrooms=bedrooms, property_type='flat', source='test', source_url='#', source_id=source_id,
+        )
+
+    def test_reviewed_rents_are_compared_with_listings_in_the_same_segment(self):
+        self.review('£220 pw')
+        self.review('£1,040 pcm')  # 240 a week
+        self.listing(200, '1')
+        self.listing(200, '2')
+        # Other segments don't count towards this one
+        self.listing(500, '3', bedrooms=3)
+        self.listing(500, '4', address='5 Elm Road, York')
+
+        segment, = compare_with_market()
+        self.assertEqual((segment['location_key'], segment['bedrooms']), ('leeds', 2))
+        self.assertEqual((segment['reviews']['count'], segment['reviews']['average']), (2, Decimal(230)))
+        self.assertEqual((segment['market']['count'], segment['market']['average']), (2, Decimal(200)))
+        self.assertEqual(segment['difference_percent'], 15.0)
+
+    def test_segment_without_listings_has_no_difference(self):
+        self.review('£220 pw', address='1 Oak Street, Hull')
+        segment, = compare_with_market(location='hull')
+        self.assertIsNone(segment['market'])
+        self.assertIsNone(segment['difference_percent'])
+
+    def test_command_reports_each_segment(self):
+        self.review('£220 pw')
+        self.listing(200, '1')
+        out = StringIO()
+        call_command('compare_rents', '--location', 'Leeds', stdout=out)
+        self.assertIn('+10.0%', out.getvalue())
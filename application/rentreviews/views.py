@@ -1,36 +1,30 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .models import RentReview
-from application.models import User
-
-
-def require_authentication(view_func):
-    """Decorator to require authentication for review views"""
-    def wrapper(request, *args, **kwargs):
-        if not request.session.get('is_authenticated'):
-            return redirect('login')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+from .reputation import attach_reputations
+from .search import search_reviews
+from application.decorators import require_authentication
 
 
 def review_list(request):
-    """Public view showing all published rent reviews"""
-    reviews = RentReview.objects.filter(is_published=True)
-    
-    # Filter by search parameters
+    """Public view showing published rent reviews, a page at a time"""
     search_query = request.GET.get('search', '')
-    if search_query:
-        reviews = reviews.filter(property_address__icontains=search_query)
     
     # Filter by rating
     min_rating = request.GET.get('min_rating')
-    if min_rating:
-        reviews = reviews.filter(overall_rating__gte=min_rating)
+    try:
+        min_rating = int(min_rating) if min_rating else None
+    except ValueError:
+        min_rating = None
+    
+    reviews, next_cursor = search_reviews(search_query, min_rating, request.GET.get('cursor'))
+    attach_reputations(reviews)
     
     context = {
         'reviews': reviews,
+        'next_cursor': next_cursor,
         'search_query': search_query,
         'min_rating': min_rating,
     }
@@ -63,8 +57,7 @@ def create_review(request):
 def create_review_submit(request):
     """Handle review creation form submission"""
     try:
-        user_id = request.session.get('user_id')
-        user = User.objects.get(id=user_id)
+        user = request.app_user
         
         # Get form data
         review_data = {
@@ -109,8 +102,7 @@ def create_review_submit(request):
 @require_authentication
 def my_reviews(request):
     """Show current user's reviews"""
-    user_id = request.session.get('user_id')
-    user = get_object_or_404(User, id=user_id)
+    user = request.app_user
     
     reviews = RentReview.objects.filter(user=user)
     
@@ -124,8 +116,7 @@ def my_reviews(request):
 @require_authentication
 def review_my_rent(request):
     """Display rent review options page."""
-    user_id = request.session.get('user_id')
-    user = get_object_or_404(User, id=user_id)
+    user = request.app_user
     
     context = {
         'user': user,
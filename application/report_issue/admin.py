@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     IssueCategory, PropertyIssue, IssuePhoto, IssueEmail,
-    IssueUpdate, IssueTemplate, EmailTemplate
+    IssueUpdate, IssueTemplate, EmailTemplate, ContactDetails, ComplianceAssessment, PhotoBlob
 )
 
 
@@ -14,6 +14,7 @@ class IssueCategoryAdmin(admin.ModelAdmin):
 class IssuePhotoInline(admin.TabularInline):
     model = IssuePhoto
     extra = 0
+    readonly_fields = ['blob']
 
 
 class IssueEmailInline(admin.TabularInline):
@@ -60,8 +61,8 @@ class PropertyIssueAdmin(admin.ModelAdmin):
 
 @admin.register(IssueEmail)
 class IssueEmailAdmin(admin.ModelAdmin):
-    list_display = ['issue', 'email_type', 'to_email', 'is_sent', 'sent_at', 'response_received']
-    list_filter = ['email_type', 'is_sent', 'response_received']
+    list_display = ['issue', 'email_type', 'to_email', 'delivery_status', 'attempts', 'sent_at', 'response_received']
+    list_filter = ['email_type', 'delivery_status', 'is_sent', 'response_received']
     search_fields = ['issue__title', 'to_email', 'subject']
     readonly_fields = ['sent_at']
 
@@ -86,3 +87,26 @@ class EmailTemplateAdmin(admin.ModelAdmin):
     list_display = ['name', 'template_type', 'is_default']
     list_filter = ['template_type', 'is_default']
     search_fields = ['name', 'subject_template']
+
+
+@admin.register(ContactDetails)
+class ContactDetailsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'primary_contact', 'landlord_email', 'property_manager_email', 'confirmed_at']
+    list_filter = ['primary_contact']
+    search_fields = ['user__username', 'landlord_email', 'property_manager_email']
+    readonly_fields = ['confirmed_at']
+
+
+@admin.register(ComplianceAssessment)
+class ComplianceAssessmentAdmin(admin.ModelAdmin):
+    list_display = ['user', 'compliance_percentage', 'compliant_items', 'total_items', 'completed_at']
+    search_fields = ['user__username']
+    readonly_fields = ['completed_at']
+
+
+@admin.register(PhotoBlob)
+class PhotoBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'processing_status', 'created_at']
+    list_filter = ['processing_status']
+    search_fields = ['sha256']
+    readonly_fields = ['sha256', 'image', 'size', 'ref_count', 'created_at', 'width', 'height', 'renditions']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ReportIssueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'report_issue'
+
+    def ready(self):
+        from . import signals
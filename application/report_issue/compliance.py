@@ -0,0 +1,97 @@
+"""
+The landlord compliance checklist, and recording a tenant's answers to it.
+
+An assessment stores only whether each item was met, keyed by item id; the
+wording is taken from COMPLIANCE_CHECKLIST whenever results are shown. The
+draft issues for unmet items are written with one bulk insert, in the same
+transaction as the assessment.
+"""
+from django.db import transaction
+
+from .models import ComplianceAssessment, PropertyIssue
+
+COMPLIANCE_CHECKLIST = {
+    'Property Condition': [
+        {'id': 'habitability', 'text': 'Property is maintained in habitable condition', 'description': 'Landlord ensures property meets basic health and safety standards'},
+        {'id': 'repairs', 'text': 'Repairs are completed in reasonable timeframe', 'description': 'Essential repairs addressed within 24-48 hours, non-essential within 30 days'},
+        {'id': 'heating', 'text': 'Adequate heating provided', 'description': 'Heating system maintains at least 68°F during heating season'},
+        {'id': 'water_plumbing', 'text': 'Running water and working plumbing', 'description': 'Hot and cold water available, toilets and drains function properly'},
+        {'id': 'electrical', 'text': 'Safe electrical systems', 'description': 'Electrical systems are up to code and safely maintained'},
+    ],
+    'Safety & Security': [
+        {'id': 'smoke_detectors', 'text': 'Working smoke detectors installed', 'description': 'Smoke detectors in required locations and batteries maintained'},
+        {'id': 'carbon_monoxide', 'text': 'Carbon monoxide detectors (where required)', 'description': 'CO detectors installed near fuel-burning appliances and bedrooms'},
+        {'id': 'locks', 'text': 'Proper locks on doors and windows', 'description': 'Secure locks provided for entry doors and accessible windows'},
+        {'id': 'emergency_exits', 'text': 'Clear emergency exits', 'description': 'Fire exits are clearly marked and unobstructed'},
+    ],
+    'Legal Documentation': [
+        {'id': 'lease_agreement', 'text': 'Written lease agreement provided', 'description': 'Clear written lease with terms, conditions, and both parties\' obligations'},
+        {'id': 'deposit_receipt', 'text': 'Security deposit receipt given', 'description': 'Written receipt for security deposit with terms for return'},
+        {'id': 'move_in_inspection', 'text': 'Move-in inspection completed', 'description': 'Property condition documented before tenancy begins'},
+        {'id': 'landlord_info', 'text': 'Landlord contact information provided', 'description': 'Name, address, and contact details of landlord or property manager'},
+    ],
+    'Privacy & Access': [
+        {'id': 'notice_entry', 'text': 'Proper notice given for entry', 'description': 'Landlord provides required notice (usually 24-48 hours) before entering'},
+        {'id': 'quiet_enjoyment', 'text': 'Right to quiet enjoyment respected', 'description': 'Tenant can use property without unreasonable interference'},
+        {'id': 'emergency_contact', 'text': 'Emergency contact information available', 'description': 'Contact available for emergency repairs and urgent situations'},
+    ],
+    'Financial Obligations': [
+        {'id': 'rent_receipts', 'text': 'Rent receipts provided when requested', 'description': 'Written receipts for rent payments when requested by tenant'},
+        {'id': 'deposit_interest', 'text': 'Security deposit interest (where required)', 'description': 'Interest paid on security deposits as required by local law'},
+        {'id': 'fee_disclosure', 'text': 'All fees and charges disclosed', 'description': 'Transparent disclosure of all fees, charges, and payment terms'},
+    ]
+}
+
+
+# item id -> (category, item)
+CHECKLIST_ITEMS = {
+    item['id']: (category, item)
+    for category, items in COMPLIANCE_CHECKLIST.items()
+    for item in items
+}
+
+
+def grouped_results(answers):
+    """The checklist grouped by category, each item with its ``compliant`` answer"""
+    return {
+        category: [{**item, 'compliant': answers[item['id']]} for item in items if item['id'] in answers]
+        for category, items in COMPLIANCE_CHECKLIST.items()
+    }
+
+
+def draft_issue(user, category, item):
+    return PropertyIssue(
+        user=user,
+        title=f"Non-compliance: {item['text']}",
+        description=f"Compliance Issue - {category}\n\n{item['description']}\n\nThis issue was automatically created from your landlord compliance assessment. Please review and add any additional details or photos as needed.",
+        location="General Property",
+        priority="medium",
+        status="draft",
+        is_safety_issue=category == "Safety & Security",
+        affects_habitability=category in ["Property Condition", "Safety & Security"],
+        created_from_compliance=True
+    )
+
+
+def record_assessment(user, answers):
+    """
+    Save ``answers`` ({item id: met?}) as the user's latest assessment and
+    create a draft issue for every unmet item; returns the assessment.
+    """
+    unmet = [item_id for item_id in CHECKLIST_ITEMS if not answers.get(item_id, False)]
+    total_items = len(CHECKLIST_ITEMS)
+    compliant_items = total_items - len(unmet)
+    compliance_percentage = (compliant_items / total_items * 100) if total_items > 0 else 0
+
+    with transaction.atomic():
+        issues = PropertyIssue.objects.bulk_create([
+            draft_issue(user, *CHECKLIST_ITEMS[item_id]) for item_id in unmet
+        ])
+        return ComplianceAssessment.objects.create(
+            user=user,
+            answers={item_id: item_id not in unmet for item_id in CHECKLIST_ITEMS},
+            created_issue_ids={item_id: issue.pk for item_id, issue in zip(unmet, issues)},
+            total_items=total_items,
+            compliant_items=compliant_items,
+            compliance_percentage=round(compliance_percentage, 1),
+        )
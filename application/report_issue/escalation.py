@@ -0,0 +1,135 @@
+"""
+Automatic reminders and escalation for overdue and stale issues.
+
+An open issue is due for its next step once it is past its deadline or has
+been open ISSUE_STALE_DAYS without resolution, and nothing was sent for it
+in the last ISSUE_FOLLOW_UP_DAYS. The steps, in order:
+
+    reminder        up to ISSUE_AUTO_REMINDERS times
+    escalation      escalation_level 0 -> 1, status escalated
+    final_notice    escalation_level 1 -> 2; nothing more is sent after this
+
+Candidates come from one query served by the (status, deadline) and
+(status, submitted_at) indexes and are processed in batches: each batch is
+claimed with one UPDATE per step, then its emails and IssueUpdates are
+written with bulk_create and handed to the outbox, which delivers them in
+its own batches.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import EmailTemplate, IssueEmail, IssueUpdate, PropertyIssue
+from .outbox import queue_emails
+from .views import generate_email_body, generate_email_subject
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ['submitted', 'acknowledged', 'in_progress', 'escalated']
+FINAL_ESCALATION_LEVEL = 2
+
+
+@dataclass
+class EscalationRun:
+    candidates: int = 0
+    steps: dict = field(default_factory=lambda: {'reminder': 0, 'escalation': 0, 'final_notice': 0})
+
+
+def due_issues(now=None):
+    """Open issues due for their next automatic step"""
+    now = now or timezone.now()
+    follow_up_cutoff = now - timedelta(days=getattr(settings, 'ISSUE_FOLLOW_UP_DAYS', 7))
+    stale_cutoff = now - timedelta(days=getattr(settings, 'ISSUE_STALE_DAYS', 14))
+    return PropertyIssue.objects.filter(
+        Q(deadline__lt=now.date()) | Q(submitted_at__lt=stale_cutoff),
+        Q(last_reminded_at__isnull=True) | Q(last_reminded_at__lt=follow_up_cutoff),
+        Q(last_escalated_at__isnull=True) | Q(last_escalated_at__lt=follow_up_cutoff),
+        Q(landlord_email__gt='') | Q(property_manager_email__gt=''),
+        status__in=OPEN_STATUSES,
+        escalation_level__lt=FINAL_ESCALATION_LEVEL,
+    )
+
+
+def next_step(issue):
+    if issue.reminders_sent < getattr(settings, 'ISSUE_AUTO_REMINDERS', 2) and issue.escalation_level == 0:
+        return 'reminder'
+    return 'escalation' if issue.escalation_level == 0 else 'final_notice'
+
+
+def recipient(issue):
+    if issue.contact_preference == 'property_manager' and issue.property_manager_email:
+        return issue.property_manager_email
+    return issue.landlord_email or issue.property_manager_email
+
+
+def claim(issue_ids, step, now):
+    """
+    Advance ``issue_ids`` to ``step``, skipping any another run advanced
+    meanwhile; returns the ids this run now owns. Stamping the run's ``now``
+    identifies them afterwards without RETURNING.
+    """
+    due = due_issues(now).filter(pk__in=issue_ids)
+    if step == 'reminder':
+        due.update(reminders_sent=F('reminders_sent') + 1, last_reminded_at=now)
+        return set(PropertyIssue.objects.filter(pk__in=issue_ids, last_reminded_at=now).values_list('pk', flat=True))
+    due.update(escalation_level=F('escalation_level') + 1, status='escalated', last_escalated_at=now)
+    return set(PropertyIssue.objects.filter(pk__in=issue_ids, last_escalated_at=now).values_list('pk', flat=True))
+
+
+def process_batch(issues, templates, now, run):
+    by_step = {}
+    for issue in issues:
+        by_step.setdefault(next_step(issue), []).append(issue)
+
+    emails, updates = [], []
+    with transaction.atomic():
+        for step, step_issues in by_step.items():
+            owned = claim([issue.pk for issue in step_issues], step, now)
+            for issue in step_issues:
+                if issue.pk not in owned:
+                    continue
+                to_email = recipient(issue)
+                emails.append(IssueEmail(
+                    issue=issue,
+                    email_type=step,
+                    to_email=to_email,
+                    subject=generate_email_subject(issue, step, templates.get(step)),
+                    body=generate_email_body(issue, step, templates.get(step)),
+                ))
+                if step == 'reminder':
+                    notes = f'Automatic reminder sent to {to_email}.'
+                    updates.append(IssueUpdate(issue=issue, update_type='user_note', notes=notes))
+                else:
+                    level = issue.escalation_level + 1
+                    notes = f'Issue automatically escalated to level {level}; {step.replace("_", " ")} sent to {to_email}.'
+                    updates.append(IssueUpdate(
+                        issue=issue, update_type='escalation', notes=notes,
+                        old_status=issue.status, new_status='escalated',
+                    ))
+                run.steps[step] += 1
+        queue_emails(emails)
+        IssueUpdate.objects.bulk_create(updates)
+
+
+def run_escalations(batch_size=500, limit=None, dry_run=False):
+    """Take every due issue one step up the ladder; returns an EscalationRun with the counts"""
+    now = timezone.now()
+    run = EscalationRun()
+    issue_ids = list(due_issues(now).order_by('pk').values_list('pk', flat=True)[:limit])
+    run.candidates = len(issue_ids)
+    templates = {template.template_type: template for template in EmailTemplate.objects.filter(is_default=True)}
+
+    for start in range(0, len(issue_ids), batch_size):
+        issues = list(PropertyIssue.objects.filter(pk__in=issue_ids[start:start + batch_size]).select_related('user'))
+        if dry_run:
+            for issue in issues:
+                run.steps[next_step(issue)] += 1
+            continue
+        process_batch(issues, templates, now, run)
+    logger.info(f"Escalation run: {run.candidates} due issues, steps taken {run.steps}")
+    return run
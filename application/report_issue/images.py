@@ -0,0 +1,265 @@
+"""
+Resized renditions of issue photos.
+
+The original is served until its renditions are ready and phone photos
+carry the GPS position they were taken at, so JPEG uploads are stored
+without their camera metadata (strip_jpeg), which only rewrites the header
+segments. The request then returns straight away; once a new PhotoBlob is
+committed it is queued on a small thread pool that strips other formats by
+re-encoding them (strip_reencoded), then writes WebP and JPEG copies at each
+of ISSUE_PHOTO_WIDTHS (never wider than the original) and records them on
+the blob for srcset. A non-JPEG original with metadata is therefore served
+as uploaded for the few seconds until its job runs. A photo whose content is
+already stored reuses that blob's renditions.
+
+JPEGs are decoded with Pillow's draft mode, which lets libjpeg scale by 1/2,
+1/4 or 1/8 while decoding, so a 12-megapixel phone photo is never held in
+memory at full size. EXIF orientation is applied to the pixels and the
+metadata (including GPS position) is not copied to the renditions.
+
+Blobs left pending by a restarted worker are picked up by
+``manage.py process_issue_photos``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import logging
+import math
+import os
+import shutil
+import struct
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import close_old_connections
+from PIL import ExifTags, Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# MIME type, Pillow format and save options for each rendition format
+FORMATS = {
+    'webp': ('image/webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('image/jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# JPEG segments carrying camera metadata: APP1 (EXIF, XMP), APP13 (IPTC) and comments
+JPEG_METADATA_MARKERS = {0xE1, 0xED, 0xFE}
+JPEG_APP0, JPEG_SOS, JPEG_EOI = 0xE0, 0xDA, 0xD9
+
+_photo_pool = None
+
+
+def _get_photo_pool():
+    global _photo_pool
+    if _photo_pool is None:
+        _photo_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ISSUE_PHOTO_WORKERS', 1),
+            thread_name_prefix='issue-photos',
+        )
+    return _photo_pool
+
+
+def configured_widths():
+    return sorted(getattr(settings, 'ISSUE_PHOTO_WIDTHS', [320, 640, 1280]))
+
+
+def rendition_widths(original_width):
+    """Configured widths narrower than the original, plus the original if any were skipped"""
+    configured = configured_widths()
+    widths = [width for width in configured if width < original_width]
+    if len(widths) < len(configured):
+        widths.append(original_width)
+    return widths
+
+
+def strip_jpeg(file):
+    """
+    A JPEG upload without its EXIF, XMP or IPTC segments, ready to store, or
+    None when ``file`` isn't a JPEG or carries none. Only the segments before
+    the image data are read and rewritten (keeping the EXIF orientation);
+    the compressed data is copied in chunks through a spooled temporary
+    file, so the upload is never held in memory whole or re-encoded.
+    """
+    file.seek(0)
+    if file.read(2) != b'\xff\xd8':
+        return None
+    kept, orientation, stripped = [b'\xff\xd8'], None, False
+    while True:
+        header = file.read(4)
+        if len(header) < 4 or header[0] != 0xFF or header[1] in (JPEG_SOS, JPEG_EOI):
+            break
+        segment = header + file.read(struct.unpack('>H', header[2:4])[0] - 2)
+        if header[1] not in JPEG_METADATA_MARKERS:
+            kept.append(segment)
+            continue
+        stripped = True
+        if segment[4:10] == b'Exif\x00\x00':
+            try:
+                exif = Image.Exif()
+                exif.load(segment[4:])
+                orientation = exif.get(ExifTags.Base.Orientation) or orientation
+            except Exception:
+                pass
+    if not stripped:
+        return None
+    if orientation and orientation != 1:
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        payload = exif.tobytes()
+        # After the JFIF header when there is one, where readers look for it
+        at = 2 if len(kept) > 1 and kept[1][1] == JPEG_APP0 else 1
+        kept.insert(at, b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload)
+
+    output = tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    output.write(b''.join(kept) + header)
+    shutil.copyfileobj(file, output)
+    output.seek(0)
+    return File(output, name=file.name)
+
+
+def strip_reencoded(data):
+    """
+    A non-JPEG image's bytes re-encoded upright without their EXIF or XMP
+    metadata, or ``data`` itself when there is none or it isn't an image
+    Pillow can read. This decodes the whole image, so it runs in
+    process_blob rather than in the upload request.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        exif = image.getexif()
+    except Exception:
+        return data
+    if image.format == 'JPEG' or not (
+        exif or 'exif' in image.info or 'xmp' in image.info or 'XML:com.adobe.xmp' in image.info
+    ):
+        return data
+
+    pillow_format, frames = image.format, getattr(image, 'n_frames', 1)
+    if frames == 1:
+        image = ImageOps.exif_transpose(image)
+    buffer = BytesIO()
+    # Pillow only writes the metadata it's given
+    image.save(buffer, pillow_format, save_all=frames > 1, icc_profile=image.info.get('icc_profile'))
+    return buffer.getvalue()
+
+
+def strip_stored_original(blob):
+    """Rewrite a blob's original without its metadata; returns whether it had any"""
+    from .models import IssuePhoto, PhotoBlob
+
+    with blob.image.open('rb') as file:
+        content = strip_jpeg(file)
+        if content is None:
+            file.seek(0)
+            data = file.read()
+            stripped = strip_reencoded(data)
+            if stripped == data:
+                return False
+            content = ContentFile(stripped)
+        size = content.size
+        storage = blob.image.storage
+        # Named as before: the name may already be in pages and caches
+        storage.delete(blob.image.name)
+        name = storage.save(blob.image.name, content)
+    PhotoBlob.objects.filter(pk=blob.pk).update(image=name, size=size)
+    IssuePhoto.objects.filter(blob=blob).update(image=name)
+    blob.image.name, blob.size = name, size
+    return True
+
+
+def load_oriented(file, max_width):
+    """
+    Open an image upright and at least ``max_width`` wide (or full size if
+    smaller), decoding JPEGs at the smallest scale that allows it.
+    Returns (image, original_width, original_height).
+    """
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+
+    if max_width and max_width < width:
+        scale = max_width / width
+        # A no-op for anything but JPEG
+        image.draft('RGB', (math.ceil(image.size[0] * scale), math.ceil(image.size[1] * scale)))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    return image, width, height
+
+
+def encode(image, fmt):
+    _, pillow_format, options = FORMATS[fmt]
+    if pillow_format == 'JPEG' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(blob):
+    """Write every rendition of ``blob`` to storage; return (width, height, renditions)"""
+    storage = blob.image.storage
+    delete_renditions(blob)
+
+    with blob.image.open('rb') as file:
+        # Decoded once at the largest size needed; every rendition is downscaled from that
+        source, width, height = load_oriented(file, configured_widths()[-1])
+
+    stem = os.path.splitext(blob.image.name)[0]
+    renditions = {fmt: {} for fmt in FORMATS}
+    for target in rendition_widths(width):
+        size = (target, max(1, round(source.height * target / source.width)))
+        resized = source if size == source.size else source.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in FORMATS:
+            name = storage.save(f'{stem}-{target}w.{fmt}', ContentFile(encode(resized, fmt)))
+            renditions[fmt][str(target)] = name
+    return width, height, renditions
+
+
+def delete_renditions(blob):
+    for names in (blob.renditions or {}).values():
+        for name in names.values():
+            blob.image.storage.delete(name)
+
+
+def process_blob(blob_id):
+    """Generate the renditions of one stored image and mark it ready (or failed)"""
+    from .models import PhotoBlob
+
+    blob = PhotoBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return
+    try:
+        strip_stored_original(blob)
+        width, height, renditions = generate_renditions(blob)
+    except Exception:
+        logger.exception(f"Could not process photo blob {blob_id} ({blob.image.name})")
+        # Any earlier renditions were deleted before generating new ones
+        PhotoBlob.objects.filter(pk=blob_id).update(processing_status=PhotoBlob.FAILED, renditions={})
+        return
+    PhotoBlob.objects.filter(pk=blob_id).update(
+        processing_status=PhotoBlob.READY, width=width, height=height, renditions=renditions,
+    )
+
+
+def _process_in_background(blob_id):
+    try:
+        process_blob(blob_id)
+    except Exception:
+        logger.exception(f"Photo processing failed for blob {blob_id}")
+    finally:
+        close_old_connections()
+
+
+def schedule_blob_processing(blob_id):
+    """Queue renditions for a new blob, off the request path when ISSUE_PHOTO_PROCESS_IN_BACKGROUND is set"""
+    if getattr(settings, 'ISSUE_PHOTO_PROCESS_IN_BACKGROUND', True):
+        _get_photo_pool().submit(_process_in_background, blob_id)
+    else:
+        process_blob(blob_id)
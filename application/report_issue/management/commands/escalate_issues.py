@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from report_issue.escalation import run_escalations
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the next automatic reminder, escalation or final notice for every open issue that '
+        'is overdue or stale. Run daily, e.g. from cron; emails are queued for the outbox.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Issues processed per transaction (default: 500)'
+        )
+        parser.add_argument('--limit', type=int, help='Process at most this many issues')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be sent without sending it')
+
+    def handle(self, *args, **options):
+        run = run_escalations(batch_size=options['batch_size'], limit=options['limit'], dry_run=options['dry_run'])
+        verb = 'Would send' if options['dry_run'] else 'Queued'
+        steps = ', '.join(f'{count} {step.replace("_", " ")}' for step, count in run.steps.items())
+        self.stdout.write(self.style.SUCCESS(f'{run.candidates} issues due: {verb.lower()} {steps}'))
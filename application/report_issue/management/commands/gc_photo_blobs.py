@@ -0,0 +1,88 @@
+import os
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F
+from django.utils import timezone
+from report_issue.images import delete_renditions
+from report_issue.models import IssuePhoto, PhotoBlob
+
+# Storage directories holding issue photo files: blobs, and uploads from before blobs existed
+PHOTO_DIRECTORIES = ['photo_blobs', 'issue_photos']
+
+
+class Command(BaseCommand):
+    help = 'Delete stored issue photos (and their renditions) that no issue photo references any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help='Keep blobs and files younger than this many minutes; an upload may be about to use them (default: 60)'
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recompute reference counts from the photos first, e.g. after rows were changed with update()'
+        )
+        parser.add_argument(
+            '--orphans',
+            action='store_true',
+            help='Also delete files under the photo directories that no blob or photo names'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting it')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        dry_run = options['dry_run']
+        verb = 'Would delete' if dry_run else 'Deleted'
+
+        if options['recount']:
+            fixed = 0
+            for blob in PhotoBlob.objects.annotate(photo_count=Count('photos')).exclude(ref_count=F('photo_count')):
+                fixed += 1
+                if not dry_run:
+                    PhotoBlob.objects.filter(pk=blob.pk).update(ref_count=blob.photo_count)
+            self.stdout.write(f'{"Would fix" if dry_run else "Fixed"} {fixed} reference counts')
+
+        deleted, freed = 0, 0
+        for blob in PhotoBlob.objects.filter(ref_count__lte=0, created_at__lt=cutoff).iterator():
+            # Conditional, so a blob picked up by an upload since the query above survives
+            if not dry_run and not PhotoBlob.objects.filter(pk=blob.pk, ref_count__lte=0).delete()[0]:
+                continue
+            if not dry_run:
+                delete_renditions(blob)
+                blob.image.storage.delete(blob.image.name)
+            deleted += 1
+            freed += blob.size
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} unreferenced photos ({freed / 1_000_000:.1f} MB)'))
+
+        if options['orphans']:
+            self.delete_orphans(cutoff, dry_run, verb)
+
+    def delete_orphans(self, cutoff, dry_run, verb):
+        storage = PhotoBlob._meta.get_field('image').storage
+        referenced = set(IssuePhoto.objects.values_list('image', flat=True))
+        for name, renditions in PhotoBlob.objects.values_list('image', 'renditions'):
+            referenced.add(name)
+            for names in (renditions or {}).values():
+                referenced.update(names.values())
+
+        deleted, freed = 0, 0
+        for name in self.walk(storage, PHOTO_DIRECTORIES):
+            if name in referenced or storage.get_modified_time(name) >= cutoff:
+                continue
+            freed += storage.size(name)
+            deleted += 1
+            if not dry_run:
+                storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} orphaned files ({freed / 1_000_000:.1f} MB)'))
+
+    def walk(self, storage, directories):
+        for directory in directories:
+            if not storage.exists(directory):
+                continue
+            subdirectories, files = storage.listdir(directory)
+            for name in files:
+                yield f'{directory}/{name}'
+            yield from self.walk(storage, [os.path.join(directory, sub) for sub in subdirectories])
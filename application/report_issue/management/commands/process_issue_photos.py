@@ -0,0 +1,55 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from report_issue.images import process_blob, strip_stored_original
+from report_issue.models import PhotoBlob
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate resized renditions for stored issue photos still pending, e.g. uploaded '
+        'before a worker restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=10,
+            help='Skip photos stored less than this many minutes ago; a worker may still be on them (default: 10)'
+        )
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry photos that failed before')
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate renditions for every photo, e.g. after changing ISSUE_PHOTO_WIDTHS'
+        )
+        parser.add_argument(
+            '--strip-originals',
+            action='store_true',
+            help='Remove camera metadata (GPS position included) from originals stored before uploads were stripped'
+        )
+
+    def handle(self, *args, **options):
+        if options['strip_originals']:
+            stripped = sum(strip_stored_original(blob) for blob in PhotoBlob.objects.order_by('pk').iterator())
+            self.stdout.write(self.style.SUCCESS(f'Stripped metadata from {stripped} stored originals'))
+            return
+
+        blobs = PhotoBlob.objects.all()
+        if not options['all']:
+            statuses = [PhotoBlob.PENDING] + ([PhotoBlob.FAILED] if options['retry_failed'] else [])
+            cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+            blobs = blobs.filter(processing_status__in=statuses, created_at__lt=cutoff)
+
+        blob_ids = list(blobs.order_by('pk').values_list('pk', flat=True))
+        for blob_id in blob_ids:
+            process_blob(blob_id)
+
+        counts = {
+            status: PhotoBlob.objects.filter(pk__in=blob_ids, processing_status=status).count()
+            for status in (PhotoBlob.READY, PhotoBlob.FAILED)
+        }
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(blob_ids)} photos: {counts[PhotoBlob.READY]} ready, {counts[PhotoBlob.FAILED]} failed'
+        ))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from report_issue.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued issue emails in batches over one SMTP connection, retrying failures '
+        'with backoff. Run once (e.g. from cron) or with --loop as a worker process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Emails claimed per batch (default: EMAIL_OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for queued emails')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            run = send_queued_emails(batch_size=options['batch_size'])
+            if run.sent or run.retrying or run.failed or not options['loop']:
+                self.stdout.write(
+                    f'Sent {run.sent} emails, {run.retrying} to retry, {run.failed} failed permanently'
+                )
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
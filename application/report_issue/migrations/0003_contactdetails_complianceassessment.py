@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 04:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('report_issue', '0002_propertyissue_created_from_compliance_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactDetails',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('primary_contact', models.CharField(max_length=20)),
+                ('landlord_company_name', models.CharField(blank=True, max_length=200)),
+                ('landlord_contact_name', models.CharField(blank=True, max_length=200)),
+                ('landlord_email', models.EmailField(blank=True, max_length=254)),
+                ('landlord_phone', models.CharField(blank=True, max_length=20)),
+                ('landlord_address', models.TextField(blank=True)),
+                ('property_manager_company_name', models.CharField(blank=True, max_length=200)),
+                ('property_manager_contact_name', models.CharField(blank=True, max_length=200)),
+                ('property_manager_email', models.EmailField(blank=True, max_length=254)),
+                ('property_manager_phone', models.CharField(blank=True, max_length=20)),
+                ('property_manager_address', models.TextField(blank=True)),
+                ('confirmed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='contact_details', to='application.user')),
+            ],
+            options={
+                'verbose_name_plural': 'Contact Details',
+            },
+        ),
+        migrations.CreateModel(
+            name='ComplianceAssessment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results', models.JSONField(default=dict, help_text='Checklist answers grouped by category')),
+                ('issues_created', models.JSONField(default=list)),
+                ('total_items', models.IntegerField(default=0)),
+                ('compliant_items', models.IntegerField(default=0)),
+                ('compliance_percentage', models.FloatField(default=0)),
+                ('completed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compliance_assessments', to='application.user')),
+            ],
+            options={
+                'ordering': ['-completed_at'],
+                'indexes': [models.Index(fields=['user', '-completed_at'], name='compliance_user_latest_idx')],
+            },
+        ),
+    ]
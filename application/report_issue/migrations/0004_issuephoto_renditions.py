@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_issue', '0003_contactdetails_complianceassessment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issuephoto',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuephoto',
+            name='processing_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='issuephoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='issuephoto',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:16
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_photos_to_blobs(apps, schema_editor):
+    """
+    Give every existing photo a blob, hashing its file. Files stay where they
+    are; a duplicate's own copy is left for ``gc_photo_blobs --orphans``.
+    """
+    IssuePhoto = apps.get_model('report_issue', 'IssuePhoto')
+    PhotoBlob = apps.get_model('report_issue', 'PhotoBlob')
+
+    for photo in IssuePhoto.objects.exclude(image='').iterator():
+        try:
+            digest = hashlib.sha256()
+            with photo.image.open('rb') as file:
+                for chunk in file.chunks():
+                    digest.update(chunk)
+            size = photo.image.size
+        except (OSError, ValueError):
+            # The file is gone; the photo keeps pointing at its old name
+            continue
+        blob, _ = PhotoBlob.objects.get_or_create(sha256=digest.hexdigest(), defaults={
+            'image': photo.image.name,
+            'size': size,
+            'processing_status': photo.processing_status,
+            'width': photo.width,
+            'height': photo.height,
+            'renditions': photo.renditions,
+        })
+        IssuePhoto.objects.filter(pk=photo.pk).update(blob=blob, image=blob.image.name)
+
+    for blob in PhotoBlob.objects.annotate(photo_count=models.Count('photos')):
+        PhotoBlob.objects.filter(pk=blob.pk).update(ref_count=blob.photo_count)
+
+
+def copy_blobs_to_photos(apps, schema_editor):
+    IssuePhoto = apps.get_model('report_issue', 'IssuePhoto')
+    for photo in IssuePhoto.objects.exclude(blob=None).select_related('blob').iterator():
+        IssuePhoto.objects.filter(pk=photo.pk).update(
+            processing_status=photo.blob.processing_status,
+            width=photo.blob.width,
+            height=photo.blob.height,
+            renditions=photo.blob.renditions,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_issue', '0004_issuephoto_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('image', models.ImageField(upload_to='photo_blobs')),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processing_status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('renditions', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='issuephoto',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='photos', to='report_issue.photoblob'),
+        ),
+        migrations.RunPython(move_photos_to_blobs, copy_blobs_to_photos),
+        migrations.RemoveField(
+            model_name='issuephoto',
+            name='height',
+        ),
+        migrations.RemoveField(
+            model_name='issuephoto',
+            name='processing_status',
+        ),
+        migrations.RemoveField(
+            model_name='issuephoto',
+            name='renditions',
+        ),
+        migrations.RemoveField(
+            model_name='issuephoto',
+            name='width',
+        ),
+    ]
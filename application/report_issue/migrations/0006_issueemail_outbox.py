@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('report_issue', '0005_photoblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issueemail',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='delivery_status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='draft', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='issueemail',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='issueemail',
+            index=models.Index(fields=['delivery_status', 'next_attempt_at'], name='issueemail_outbox_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('report_issue', '0006_issueemail_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyissue',
+            name='last_reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='propertyissue',
+            name='reminders_sent',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='propertyissue',
+            index=models.Index(fields=['status', 'deadline'], name='issue_status_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyissue',
+            index=models.Index(fields=['status', 'submitted_at'], name='issue_status_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('application', '0010_onboardingdraft'),
+        ('report_issue', '0007_issue_escalation'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propertyissue',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='issue_user_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertyissue',
+            index=models.Index(fields=['user', 'deadline'], name='issue_user_deadline_idx'),
+        ),
+    ]
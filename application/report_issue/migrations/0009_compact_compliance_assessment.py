@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+def compact_assessments(apps, schema_editor):
+    """Keep only each item's answer; the checklist wording is the same for everyone"""
+    ComplianceAssessment = apps.get_model('report_issue', 'ComplianceAssessment')
+    for assessment in ComplianceAssessment.objects.iterator():
+        item_ids = {}
+        answers = {}
+        for items in assessment.results.values():
+            for item in items:
+                answers[item['id']] = item['compliant']
+                item_ids[item['text']] = item['id']
+        created_issue_ids = {
+            item_ids[created['title']]: created['issue_id']
+            for created in assessment.issues_created
+            if created.get('title') in item_ids
+        }
+        ComplianceAssessment.objects.filter(pk=assessment.pk).update(
+            answers=answers, created_issue_ids=created_issue_ids,
+        )
+
+
+def expand_assessments(apps, schema_editor):
+    from report_issue.compliance import CHECKLIST_ITEMS, grouped_results
+
+    ComplianceAssessment = apps.get_model('report_issue', 'ComplianceAssessment')
+    for assessment in ComplianceAssessment.objects.iterator():
+        issues_created = [
+            {'title': CHECKLIST_ITEMS[item_id][1]['text'], 'category': CHECKLIST_ITEMS[item_id][0], 'issue_id': issue_id}
+            for item_id, issue_id in assessment.created_issue_ids.items()
+            if item_id in CHECKLIST_ITEMS
+        ]
+        ComplianceAssessment.objects.filter(pk=assessment.pk).update(
+            results=grouped_results(assessment.answers), issues_created=issues_created,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_issue', '0008_issue_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='complianceassessment',
+            name='answers',
+            field=models.JSONField(default=dict, help_text='Whether each checklist item was met, by item id'),
+        ),
+        migrations.AddField(
+            model_name='complianceassessment',
+            name='created_issue_ids',
+            field=models.JSONField(default=dict, help_text='Draft issue created for each unmet item, by item id'),
+        ),
+        migrations.RunPython(compact_assessments, expand_assessments),
+        migrations.RemoveField(
+            model_name='complianceassessment',
+            name='results',
+        ),
+        migrations.RemoveField(
+            model_name='complianceassessment',
+            name='issues_created',
+        ),
+    ]
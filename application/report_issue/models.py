@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from application.models import User
 from django.utils import timezone
-from PIL import Image
+from functools import partial
+import hashlib
 import uuid
 import os
 
@@ -79,6 +81,9 @@ class PropertyIssue(models.Model):
     # Escalation tracking
     escalation_level = models.IntegerField(default=0, help_text="0=Normal, 1=First escalation, 2=Second escalation, etc.")
     last_escalated_at = models.DateTimeField(null=True, blank=True)
+    # Automatic reminders sent by report_issue.escalation before escalating
+    reminders_sent = models.PositiveSmallIntegerField(default=0)
+    last_reminded_at = models.DateTimeField(null=True, blank=True)
     
     # Additional info
     cost_estimate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
@@ -131,28 +136,187 @@ class PropertyIssue(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's issues by status and newest first, and their overdue count, for the dashboard
+            models.Index(fields=['user', 'status', 'created_at'], name='issue_user_status_created_idx'),
+            models.Index(fields=['user', 'deadline'], name='issue_user_deadline_idx'),
+            # Overdue and stale open issues, for report_issue.escalation
+            models.Index(fields=['status', 'deadline'], name='issue_status_deadline_idx'),
+            models.Index(fields=['status', 'submitted_at'], name='issue_status_submitted_idx'),
+        ]
+
+
+class PhotoBlob(models.Model):
+    """
+    One stored image file, shared by every IssuePhoto with the same content.
+
+    Files are named by the SHA-256 of the uploaded content, so attaching the
+    same photo to several issues stores (and resizes) it once. ``ref_count``
+    tracks the IssuePhotos using the blob; ``manage.py gc_photo_blobs``
+    deletes blobs nothing references any more, with their renditions.
+    """
+
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    PROCESSING_STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(upload_to='photo_blobs')
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Resized copies written by report_issue.images after upload:
+    # {"webp": {"320": "<storage name>", ...}, "jpeg": {...}}
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_STATUS_CHOICES, default=PENDING)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return self.sha256
+
+    @classmethod
+    def store(cls, file):
+        """
+        The blob holding ``file``'s content, writing the file to storage if
+        it is new, with a reference taken for the caller. Returns (blob,
+        created).
+
+        An existing blob is referenced by the same UPDATE that finds it, so
+        gc_photo_blobs, whose delete is conditional on ref_count still being
+        0, can't collect it in between.
+        """
+        digest = getattr(file, 'sha256', None) or content_hash(file)
+        if cls.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1):
+            return cls.objects.get(sha256=digest), False
+
+        from .images import strip_jpeg
+
+        ext = os.path.splitext(file.name or '')[1].lower()
+        storage = cls._meta.get_field('image').storage
+        # The original is served until renditions are ready, so a JPEG is
+        # stored without the camera's metadata (GPS position included);
+        # process_blob strips other formats
+        content = strip_jpeg(file) or file
+        content.seek(0)
+        # Always written, under a new name if one is taken: a file left by a
+        # collected blob may be deleted by the gc_photo_blobs run that
+        # collected it (--orphans cleans up the leftovers)
+        name = storage.save(f'photo_blobs/{digest[:2]}/{digest}{ext}', content)
+        try:
+            with transaction.atomic():
+                return cls.objects.create(sha256=digest, image=name, size=content.size, ref_count=1), True
+        except IntegrityError:
+            # Stored concurrently by another upload of the same image
+            storage.delete(name)
+            cls.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1)
+            return cls.objects.get(sha256=digest), False
+
+    def _rendition_urls(self, fmt):
+        names = (self.renditions or {}).get(fmt, {})
+        return sorted((int(width), self.image.storage.url(name)) for width, name in names.items())
+
+    @property
+    def webp_srcset(self):
+        return ', '.join(f'{url} {width}w' for width, url in self._rendition_urls('webp'))
+
+    @property
+    def jpeg_srcset(self):
+        return ', '.join(f'{url} {width}w' for width, url in self._rendition_urls('jpeg'))
+
+    @property
+    def display_url(self):
+        """The smallest JPEG rendition, or the original while renditions are pending"""
+        urls = self._rendition_urls('jpeg')
+        return urls[0][1] if urls else self.image.url
+
+    @property
+    def full_url(self):
+        """The largest JPEG rendition, or the original while renditions are pending"""
+        urls = self._rendition_urls('jpeg')
+        return urls[-1][1] if urls else self.image.url
+
+
+def content_hash(file):
+    """SHA-256 of a file not hashed on upload (see application.uploadhandlers)"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
 
 
 class IssuePhoto(models.Model):
     """Photos attached to property issues"""
     issue = models.ForeignKey(PropertyIssue, on_delete=models.CASCADE, related_name='photos')
+    # Names the blob's file once saved; kept so forms and admin can upload through it
     image = models.ImageField(upload_to=issue_photo_upload_path)
+    blob = models.ForeignKey(PhotoBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='photos')
     caption = models.CharField(max_length=200, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    
+
     def __str__(self):
         return f"Photo for {self.issue.title}"
-    
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Resize image if it's too large
-        if self.image:
-            img = Image.open(self.image.path)
-            if img.height > 800 or img.width > 800:
-                output_size = (800, 800)
-                img.thumbnail(output_size)
-                img.save(self.image.path)
+        if not (self.image and not self.image._committed):
+            return super().save(*args, **kwargs)
+
+        # A new upload: point at the blob with the same content instead of storing another copy
+        blob, created = PhotoBlob.store(self.image.file)
+        previous_blob_id = None
+        if not self._state.adding:
+            previous_blob_id = IssuePhoto.objects.filter(pk=self.pk).values_list('blob_id', flat=True).first()
+        self.blob = blob
+        self.image = blob.image.name
+
+        # store() took this photo's reference; give back the one it held
+        # before (the same blob's, when the same content is uploaded again),
+        # or the new one if the photo isn't saved
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if previous_blob_id:
+                    PhotoBlob.objects.filter(pk=previous_blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        except Exception:
+            PhotoBlob.objects.filter(pk=blob.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            raise
+
+        # Renditions are generated once, for a blob's first photo, after the row is committed
+        if created:
+            from .images import schedule_blob_processing
+            transaction.on_commit(partial(schedule_blob_processing, blob.pk))
+
+    @property
+    def webp_srcset(self):
+        return self.blob.webp_srcset if self.blob_id else ''
+
+    @property
+    def jpeg_srcset(self):
+        return self.blob.jpeg_srcset if self.blob_id else ''
+
+    @property
+    def display_url(self):
+        return self.blob.display_url if self.blob_id else self.image.url
+
+    @property
+    def full_url(self):
+        return self.blob.full_url if self.blob_id else self.image.url
+
+    @property
+    def width(self):
+        return self.blob.width if self.blob_id else None
+
+    @property
+    def height(self):
+        return self.blob.height if self.blob_id else None
 
 
 class IssueEmail(models.Model):
@@ -179,6 +343,27 @@ class IssueEmail(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
     is_sent = models.BooleanField(default=False)
     sent_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+
+    # Outbox: queued emails are delivered by report_issue.outbox, not in the request
+    DRAFT = 'draft'
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    DELIVERY_STATUS_CHOICES = [
+        (DRAFT, 'Draft'),
+        (QUEUED, 'Queued'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+    delivery_status = models.CharField(max_length=10, choices=DELIVERY_STATUS_CHOICES, default=DRAFT)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
     
     # Response tracking
     response_received = models.BooleanField(default=False)
@@ -190,6 +375,9 @@ class IssueEmail(models.Model):
     
     class Meta:
         ordering = ['-sent_at']
+        indexes = [
+            models.Index(fields=['delivery_status', 'next_attempt_at'], name='issueemail_outbox_idx'),
+        ]
 
 
 class IssueUpdate(models.Model):
@@ -253,3 +441,66 @@ class EmailTemplate(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.get_template_type_display()})"
+
+
+class ContactDetails(models.Model):
+    """Confirmed landlord/property manager contact details for a tenant"""
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='contact_details')
+    primary_contact = models.CharField(max_length=20)
+
+    landlord_company_name = models.CharField(max_length=200, blank=True)
+    landlord_contact_name = models.CharField(max_length=200, blank=True)
+    landlord_email = models.EmailField(blank=True)
+    landlord_phone = models.CharField(max_length=20, blank=True)
+    landlord_address = models.TextField(blank=True)
+
+    property_manager_company_name = models.CharField(max_length=200, blank=True)
+    property_manager_contact_name = models.CharField(max_length=200, blank=True)
+    property_manager_email = models.EmailField(blank=True)
+    property_manager_phone = models.CharField(max_length=20, blank=True)
+    property_manager_address = models.TextField(blank=True)
+
+    confirmed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Contact details for {self.user}"
+
+    class Meta:
+        verbose_name_plural = "Contact Details"
+
+
+class ComplianceAssessment(models.Model):
+    """A completed landlord compliance checklist (see report_issue.compliance)"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='compliance_assessments')
+    answers = models.JSONField(default=dict, help_text="Whether each checklist item was met, by item id")
+    created_issue_ids = models.JSONField(default=dict, help_text="Draft issue created for each unmet item, by item id")
+    total_items = models.IntegerField(default=0)
+    compliant_items = models.IntegerField(default=0)
+    compliance_percentage = models.FloatField(default=0)
+    completed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Compliance assessment for {self.user} ({self.compliance_percentage}%)"
+
+    @property
+    def results(self):
+        """Checklist items grouped by category, each with its ``compliant`` answer"""
+        from .compliance import grouped_results
+        return grouped_results(self.answers)
+
+    @property
+    def issues_created(self):
+        from .compliance import CHECKLIST_ITEMS
+        return [
+            {'title': CHECKLIST_ITEMS[item_id][1]['text'], 'category': CHECKLIST_ITEMS[item_id][0], 'issue_id': issue_id}
+            for item_id, issue_id in self.created_issue_ids.items()
+            if item_id in CHECKLIST_ITEMS
+        ]
+
+    class Meta:
+        ordering = ['-completed_at']
+        indexes = [
+            models.Index(fields=['user', '-completed_at'], name='compliance_user_latest_idx'),
+        ]
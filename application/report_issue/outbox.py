@@ -0,0 +1,229 @@
+"""
+Outbox for issue emails.
+
+Views only record an IssueEmail as queued; delivery happens here, in batches
+over a single SMTP connection, so a page never waits on the mail server and
+a batch of reminders costs one connection rather than one each.
+
+Emails are claimed by stamping a batch with a claim token in one UPDATE, so
+several senders (the in-process kick after each queued email and any number
+of ``manage.py send_queued_emails`` workers) never deliver the same email
+twice. A claim not finished within EMAIL_OUTBOX_CLAIM_TIMEOUT (a sender that
+died mid-batch) becomes claimable again. Failed attempts are retried with
+exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+
+Delivery is at-least-once, not exactly-once. A sender that dies after the
+mail server accepted an email but before recording it as sent leaves the
+row in SENDING; once the claim goes stale it is sent again. SMTP has no
+idempotency key to let the server drop the repeat, so the recipient may
+get the email twice. A shorter EMAIL_OUTBOX_CLAIM_TIMEOUT only makes this
+more likely: it has to exceed the time a batch can take.
+
+A message the server refuses is retried on its own. When the connection
+can't be opened or drops, the batch stops and the emails not yet attempted
+are handed back for later, rather than reconnecting once per email to a
+server that is down.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+import random
+import smtplib
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_outbox_pool = None
+
+
+def _get_outbox_pool():
+    global _outbox_pool
+    if _outbox_pool is None:
+        # One thread: kicks queue behind each other instead of racing for the same emails
+        _outbox_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-outbox')
+    return _outbox_pool
+
+
+@dataclass
+class OutboxRun:
+    sent: int = 0
+    retrying: int = 0
+    failed: int = 0
+
+
+def queue_email(email):
+    """Mark a saved IssueEmail for delivery; it goes out after the current transaction commits"""
+    from .models import IssueEmail
+
+    IssueEmail.objects.filter(pk=email.pk).update(
+        delivery_status=IssueEmail.QUEUED, next_attempt_at=timezone.now(), last_error='',
+    )
+    email.delivery_status = IssueEmail.QUEUED
+    if getattr(settings, 'EMAIL_OUTBOX_SEND_IN_BACKGROUND', True):
+        transaction.on_commit(_kick)
+
+
+def queue_emails(emails):
+    """Insert unsaved IssueEmails straight into the outbox with one bulk insert"""
+    from .models import IssueEmail
+
+    now = timezone.now()
+    for email in emails:
+        email.delivery_status = IssueEmail.QUEUED
+        email.next_attempt_at = now
+    created = IssueEmail.objects.bulk_create(emails, batch_size=500)
+    if created and getattr(settings, 'EMAIL_OUTBOX_SEND_IN_BACKGROUND', True):
+        transaction.on_commit(_kick)
+    return created
+
+
+def _kick():
+    _get_outbox_pool().submit(_send_in_background)
+
+
+def _send_in_background():
+    try:
+        send_queued_emails()
+    except Exception:
+        logger.exception("Sending queued emails failed")
+    finally:
+        close_old_connections()
+
+
+def claim_batch(batch_size):
+    """Claim up to ``batch_size`` emails that are due; returns them with their issues"""
+    from .models import IssueEmail
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_CLAIM_TIMEOUT', 600))
+    due = (
+        Q(delivery_status=IssueEmail.QUEUED, next_attempt_at__lte=now)
+        | Q(delivery_status=IssueEmail.SENDING, claimed_at__lt=stale)
+    )
+    token = uuid.uuid4().hex
+    candidates = IssueEmail.objects.filter(due).order_by('next_attempt_at').values('pk')[:batch_size]
+    # Re-checking ``due`` in the UPDATE makes a concurrent claim of the same rows lose
+    IssueEmail.objects.filter(due, pk__in=candidates).update(
+        delivery_status=IssueEmail.SENDING, claimed_at=now, claim_token=token,
+    )
+    return list(IssueEmail.objects.filter(claim_token=token, delivery_status=IssueEmail.SENDING).select_related('issue'))
+
+
+def build_message(email):
+    return EmailMessage(
+        subject=email.subject,
+        body=email.body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[email.to_email],
+        cc=[email.cc_email] if email.cc_email else None,
+    )
+
+
+def record_failure(email, error, run):
+    from .models import IssueEmail
+
+    attempts = email.attempts + 1
+    max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    if attempts >= max_attempts:
+        status, next_attempt_at = IssueEmail.FAILED, None
+        run.failed += 1
+        logger.error(f"Giving up on email {email.pk} to {email.to_email} after {attempts} attempts: {error}")
+    else:
+        # 1, 2, 4, 8... times the base delay, with jitter so retries don't arrive together
+        delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+        status, next_attempt_at = IssueEmail.QUEUED, timezone.now() + timedelta(seconds=delay * random.uniform(1, 1.5))
+        run.retrying += 1
+        logger.warning(f"Email {email.pk} to {email.to_email} failed (attempt {attempts}), retrying: {error}")
+    IssueEmail.objects.filter(pk=email.pk, claim_token=email.claim_token).update(
+        delivery_status=status, attempts=attempts, next_attempt_at=next_attempt_at,
+        claim_token='', last_error=str(error)[:1000],
+    )
+
+
+def record_success(email, run):
+    from .models import IssueEmail, PropertyIssue
+
+    now = timezone.now()
+    IssueEmail.objects.filter(pk=email.pk, claim_token=email.claim_token).update(
+        delivery_status=IssueEmail.SENT, is_sent=True, delivered_at=now,
+        attempts=email.attempts + 1, claim_token='', last_error='',
+    )
+    # The first email out submits a draft issue
+    PropertyIssue.objects.filter(pk=email.issue_id, status='draft').update(status='submitted', submitted_at=now)
+    run.sent += 1
+
+
+def is_connection_error(error):
+    """Whether ``error`` means the SMTP connection is gone, rather than that one message was refused"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError; other OSErrors are socket failures
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def release(emails):
+    """Hand claimed emails back without counting an attempt, due again after EMAIL_OUTBOX_RETRY_DELAY"""
+    from .models import IssueEmail
+
+    if not emails:
+        return 0
+    next_attempt_at = timezone.now() + timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60))
+    # Every email in a batch carries the batch's claim token
+    return IssueEmail.objects.filter(pk__in=[email.pk for email in emails], claim_token=emails[0].claim_token).update(
+        delivery_status=IssueEmail.QUEUED, next_attempt_at=next_attempt_at, claim_token='',
+    )
+
+
+def send_batch(emails, run):
+    """
+    Deliver ``emails`` over one connection. Returns False if the connection
+    failed, after handing back the emails not yet attempted.
+    """
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not connect to the mail server, deferring {len(emails)} emails: {e}")
+        run.retrying += release(emails)
+        return False
+    try:
+        for position, email in enumerate(emails):
+            try:
+                connection.send_messages([build_message(email)])
+            except Exception as e:
+                record_failure(email, e, run)
+                if is_connection_error(e):
+                    logger.error(f"Lost the mail server connection, deferring the rest of the batch: {e}")
+                    run.retrying += release(emails[position + 1:])
+                    return False
+            else:
+                record_success(email, run)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return True
+
+
+def send_queued_emails(batch_size=None, max_batches=None):
+    """Deliver every due email, a batch at a time; returns an OutboxRun with the counts"""
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100)
+    run = OutboxRun()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        emails = claim_batch(batch_size)
+        if not emails:
+            break
+        batches += 1
+        # Left for the next run when the mail server is unreachable
+        if not send_batch(emails, run):
+            break
+    return run
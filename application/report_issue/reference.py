@@ -0,0 +1,78 @@
+"""
+Process-level cache of the small lookup tables issue pages render.
+
+Categories, issue templates and email templates only change through the
+admin or ``setup_issue_tracking``, yet most issue pages list one of them.
+Each process keeps them in memory for up to REFERENCE_DATA_CACHE_TIMEOUT
+seconds (0 disables the cache). Saving or deleting a row (see signals.py)
+drops this process's copy at once and bumps a generation number in the
+shared cache, which other processes compare against on every read, so with
+REDIS_URL set an admin edit shows up everywhere on the next request.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import EmailTemplate, IssueCategory, IssueTemplate
+
+GENERATION_KEY = 'report-issue-reference-generation'
+
+_LOADERS = {
+    'categories': lambda: list(IssueCategory.objects.all()),
+    'issue_templates': lambda: list(IssueTemplate.objects.select_related('category')),
+    'email_templates': lambda: list(EmailTemplate.objects.order_by('pk')),
+}
+
+# table name -> (loaded at, generation, rows)
+_tables = {}
+_lock = threading.Lock()
+
+
+def _rows(name):
+    timeout = getattr(settings, 'REFERENCE_DATA_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return _LOADERS[name]()
+    generation = cache.get(GENERATION_KEY, 0)
+    entry = _tables.get(name)
+    if entry and entry[1] == generation and time.monotonic() - entry[0] < timeout:
+        return entry[2]
+    rows = _LOADERS[name]()
+    with _lock:
+        _tables[name] = (time.monotonic(), generation, rows)
+    return rows
+
+
+def invalidate():
+    """Forget the cached tables here and in every process sharing the cache"""
+    with _lock:
+        _tables.clear()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def categories():
+    return _rows('categories')
+
+
+def issue_templates():
+    return _rows('issue_templates')
+
+
+def email_templates(template_type=None):
+    templates = _rows('email_templates')
+    if template_type is None:
+        return templates
+    return [template for template in templates if template.template_type == template_type]
+
+
+def issue_template(pk):
+    """The IssueTemplate with primary key ``pk`` (an int or the string from a query parameter), or None"""
+    return next((template for template in issue_templates() if str(template.pk) == str(pk)), None)
+
+
+def default_email_template(template_type):
+    return next((template for template in email_templates(template_type) if template.is_default), None)
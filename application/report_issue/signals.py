@@ -0,0 +1,21 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from . import reference
+from .models import EmailTemplate, IssueCategory, IssuePhoto, IssueTemplate, PhotoBlob
+
+
+@receiver(post_delete, sender=IssuePhoto)
+def release_photo_blob(sender, instance, **kwargs):
+    # Also runs for photos deleted along with their issue; the file goes when gc_photo_blobs runs.
+    # A count that has drifted to 0 stays there (gc_photo_blobs --recount fixes it) rather
+    # than failing the delete on the ref_count >= 0 check
+    if instance.blob_id:
+        PhotoBlob.objects.filter(pk=instance.blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+@receiver([post_save, post_delete], sender=IssueCategory)
+@receiver([post_save, post_delete], sender=IssueTemplate)
+@receiver([post_save, post_delete], sender=EmailTemplate)
+def invalidate_reference_data(sender, instance, **kwargs):
+    reference.invalidate()
@@ -1,3 +1,270 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import BytesIO, StringIO
+import logging
+import shutil
+import smtplib
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import ExifTags, Image
+
+from application.models import User
+from .images import process_blob
+from .outbox import OutboxRun, claim_batch, queue_email, record_success, send_queued_emails
+from .models import ComplianceAssessment, ContactDetails, IssueEmail, IssuePhoto, PhotoBlob, PropertyIssue
+
+
+class LoggedInTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The performance middleware logs every request
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+
+    def login(self):
+        client = Client()
+        session = client.session
+        session.update({'user_id': self.user.id, 'username': self.user.username, 'is_authenticated': True})
+        session.save()
+        return client
+
+
+class PrerequisiteTests(LoggedInTestCase):
+    def test_step_completed_in_another_session_unblocks_issue_list(self):
+        ContactDetails.objects.create(user=self.user, primary_contact='landlord', landlord_email='landlord@example.com')
+        client = self.login()
+        url = reverse('report_issue:issue_list')
+        self.assertRedirects(client.get(url, secure=True), reverse('report_issue:dashboard'), fetch_redirect_response=False)
+
+        # Completed on another device: this session must not keep its earlier answer
+        ComplianceAssessment.objects.create(user=self.user)
+        self.assertEqual(client.get(url, secure=True).status_code, 200)
+        self.assertIs(client.session['compliance_completed'], True)
+
+
+def image_upload(color='red', pillow_format='JPEG', exif=None):
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, pillow_format, exif=exif.tobytes() if exif else b'')
+    ext = pillow_format.lower().replace('jpeg', 'jpg')
+    return SimpleUploadedFile(f'photo.{ext}', buffer.getvalue(), content_type=f'image/{pillow_format.lower()}')
+
+
+def camera_exif():
+    """An upright-on-its-side phone photo's EXIF, with where it was taken"""
+    exif = Image.Exif()
+    exif[ExifTags.Base.Orientation] = 6
+    exif[ExifTags.Base.Make] = 'Phone'
+    exif.get_ifd(ExifTags.IFD.GPSInfo)[ExifTags.GPS.GPSLatitude] = (53.0, 28.0, 0.0)
+    return exif
+
+
+class PhotoBlobTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        user = User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+        self.issue = PropertyIssue.objects.create(user=user, title='Damp', description='Damp wall', location='Bedroom')
+
+    def photo(self, color='red'):
+        return IssuePhoto.objects.create(issue=self.issue, image=image_upload(color))
+
+    def ref_count(self, photo):
+        return PhotoBlob.objects.get(pk=photo.blob_id).ref_count
+
+    def collect(self):
+        call_command('gc_photo_blobs', '--min-age', '0', stdout=StringIO())
+
+    def test_photos_with_the_same_content_share_a_counted_blob(self):
+        first, second = self.photo(), self.photo()
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(self.ref_count(first), 2)
+        first.delete()
+        self.assertEqual(self.ref_count(second), 1)
+
+    def test_uploading_the_same_content_again_keeps_the_count(self):
+        photo = self.photo()
+        photo.image = image_upload()
+        photo.save()
+        self.assertEqual(self.ref_count(photo), 1)
+
+        photo.image = image_upload('blue')
+        previous_blob_id = photo.blob_id
+        photo.save()
+        self.assertEqual(PhotoBlob.objects.get(pk=previous_blob_id).ref_count, 0)
+        self.assertEqual(self.ref_count(photo), 1)
+
+    def test_count_never_goes_below_zero(self):
+        photo = self.photo()
+        PhotoBlob.objects.filter(pk=photo.blob_id).update(ref_count=0)
+        photo.delete()
+        self.assertEqual(PhotoBlob.objects.get(pk=photo.blob_id).ref_count, 0)
+
+    def test_unreferenced_blob_picked_up_by_an_upload_survives_collection(self):
+        photo = self.photo()
+        blob_id = photo.blob_id
+        photo.delete()
+        PhotoBlob.objects.filter(pk=blob_id).update(created_at=timezone.now() - timedelta(days=1))
+
+        # What an upload of the same image does before its photo is saved
+        blob, created = PhotoBlob.store(image_upload())
+        self.assertEqual((blob.pk, created, blob.ref_count), (blob_id, False, 1))
+        self.collect()
+        self.assertTrue(PhotoBlob.objects.filter(pk=blob_id).exists())
+
+    def test_unreferenced_blob_is_collected(self):
+        photo = self.photo()
+        photo.delete()
+        PhotoBlob.objects.filter(pk=photo.blob_id).update(created_at=timezone.now() - timedelta(days=1))
+        self.collect()
+        self.assertFalse(PhotoBlob.objects.filter(pk=photo.blob_id).exists())
+        # Uploading it again stores it afresh
+        self.assertEqual(self.ref_count(self.photo()), 1)
+
+    def stored_exif(self, photo):
+        blob = PhotoBlob.objects.get(pk=photo.blob_id)
+        with blob.image.open('rb') as file:
+            return Image.open(BytesIO(file.read())).getexif()
+
+    def test_jpeg_is_stored_without_metadata_but_with_its_orientation(self):
+        photo = IssuePhoto.objects.create(issue=self.issue, image=image_upload(exif=camera_exif()))
+        exif = self.stored_exif(photo)
+        self.assertEqual(dict(exif), {ExifTags.Base.Orientation: 6})
+        self.assertFalse(exif.get_ifd(ExifTags.IFD.GPSInfo))
+
+    def test_other_formats_are_stripped_by_the_background_job(self):
+        photo = IssuePhoto.objects.create(issue=self.issue, image=image_upload(pillow_format='PNG', exif=camera_exif()))
+        self.assertTrue(self.stored_exif(photo))
+
+        process_blob(photo.blob_id)
+        self.assertFalse(self.stored_exif(photo))
+        self.assertEqual(PhotoBlob.objects.get(pk=photo.blob_id).processing_status, PhotoBlob.READY)
+
+
+class FailingConnection:
+    """An email backend connection whose sends raise the given errors in turn"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.sent = 0
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        self.sent += 1
+        error = self.errors.pop(0) if self.errors else None
+        if error:
+            raise error
+        return len(messages)
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_DELAY=60)
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Failed deliveries are logged
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+        super().tearDownClass()
+
+    def setUp(self):
+        user = User.objects.create(username='tenant', email='tenant@example.com', name='Tenant')
+        self.issue = PropertyIssue.objects.create(user=user, title='Damp', description='Damp wall', location='Bedroom')
+
+    def queued(self, count=1):
+        emails = []
+        for i in range(count):
+            email = IssueEmail.objects.create(
+                issue=self.issue, email_type='initial', to_email=f'landlord{i}@example.com',
+                subject='Damp', body='Please fix the damp',
+            )
+            queue_email(email)
+            emails.append(email)
+        return emails
+
+    def test_delivery_submits_the_draft_issue(self):
+        email, = self.queued()
+        run = send_queued_emails()
+        self.assertEqual((run.sent, len(mail.outbox)), (1, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.delivery_status, email.attempts, email.claim_token), (IssueEmail.SENT, 1, ''))
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.status, 'submitted')
+        self.assertIsNotNone(self.issue.submitted_at)
+
+    def test_only_the_current_claim_records_the_outcome(self):
+        self.queued()
+        first, = claim_batch(10)
+        # The first sender stalled past the claim timeout; another reclaims the email
+        IssueEmail.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+        second, = claim_batch(10)
+        self.assertNotEqual(first.claim_token, second.claim_token)
+
+        # The stalled sender finishing doesn't touch the row the new claim owns
+        record_success(first, OutboxRun())
+        email = IssueEmail.objects.get()
+        self.assertEqual((email.delivery_status, email.claim_token), (IssueEmail.SENDING, second.claim_token))
+        self.assertEqual(claim_batch(10), [])
+
+    def test_refused_email_is_retried_with_backoff_then_given_up(self):
+        email, = self.queued()
+        refused = smtplib.SMTPRecipientsRefused({email.to_email: (550, b'No such user')})
+        with mock.patch('report_issue.outbox.get_connection', return_value=FailingConnection(refused, refused, refused)):
+            run = send_queued_emails()
+            email.refresh_from_db()
+            self.assertEqual((run.retrying, email.delivery_status, email.attempts), (1, IssueEmail.QUEUED, 1))
+            self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=55))
+
+            # The second retry waits twice as long
+            IssueEmail.objects.update(next_attempt_at=timezone.now())
+            send_queued_emails()
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, 2)
+            self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=115))
+
+            IssueEmail.objects.update(next_attempt_at=timezone.now())
+            run = send_queued_emails()
+        email.refresh_from_db()
+        self.assertEqual((run.failed, email.delivery_status, email.attempts), (1, IssueEmail.FAILED, 3))
+        self.issue.refresh_from_db()
+        self.assertEqual(self.issue.status, 'draft')
+
+    def test_lost_connection_stops_the_batch(self):
+        self.queued(3)
+        connection = FailingConnection(smtplib.SMTPServerDisconnected('Connection unexpectedly closed'))
+        with mock.patch('report_issue.outbox.get_connection', return_value=connection) as get_connection:
+            run = send_queued_emails()
+        self.assertEqual((get_connection.call_count, connection.sent), (1, 1))
+        self.assertEqual(run.retrying, 3)
+        # Only the email being sent counts an attempt; all wait for the next run
+        self.assertEqual(sorted(IssueEmail.objects.values_list('attempts', flat=True)), [0, 0, 1])
+        self.assertFalse(IssueEmail.objects.exclude(delivery_status=IssueEmail.QUEUED).exists())
+        self.assertFalse(IssueEmail.objects.filter(next_attempt_at__lte=timezone.now()).exists())
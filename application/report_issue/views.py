@@ -1,67 +1,80 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib import messages
 from django.http import JsonResponse
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
-from django.conf import settings
 from django.db.models import Q, Count
+from django.forms.models import model_to_dict
 import json
 from datetime import datetime, timedelta
 
-from application.models import User
+from application.decorators import require_authentication
+from application.queries import subquery_count
 from .models import (
-    PropertyIssue, IssueCategory, IssuePhoto, IssueEmail, 
-    IssueUpdate, IssueTemplate, EmailTemplate
+    PropertyIssue, IssuePhoto, IssueEmail, 
+    IssueUpdate, ContactDetails, ComplianceAssessment
 )
 from .forms import PropertyIssueForm, IssuePhotoForm, IssueEmailForm, ContactDetailsForm
+from .compliance import COMPLIANCE_CHECKLIST, record_assessment
+from .outbox import queue_email
+from . import reference
 
 
-def require_authentication(view_func):
-    """Decorator to require authentication for issue tracking views"""
-    def wrapper(request, *args, **kwargs):
-        if not request.session.get('is_authenticated'):
-            return redirect('login')
-        return view_func(request, *args, **kwargs)
-    return wrapper
+def prerequisite_status(request):
+    """
+    Whether the user has confirmed contact details and completed a compliance
+    assessment, as (contact_details_completed, compliance_completed).
+
+    A step once completed stays completed, so only True is remembered in the
+    session; a step not yet done is looked up again on every call, as it may
+    have been completed in another session. The views that complete them set
+    the flags directly.
+    """
+    user = request.app_user
+    checks = {
+        'contact_details_completed': ContactDetails.objects.filter(user=user),
+        'compliance_completed': ComplianceAssessment.objects.filter(user=user),
+    }
+    for flag, completed in checks.items():
+        if not request.session.get(flag) and completed.exists():
+            request.session[flag] = True
+    return tuple(bool(request.session.get(flag)) for flag in checks)
 
 
 @require_authentication
 def issue_dashboard(request):
     """Main dashboard showing all user issues"""
-    user = User.objects.get(id=request.session.get('user_id'))
+    user = request.app_user
     user_issues = PropertyIssue.objects.filter(user=user)
     
     # Check prerequisite completion status
-    contact_details_completed = request.session.get('contact_details') is not None
-    compliance_completed = request.session.get('compliance_results') is not None
+    contact_details_completed, compliance_completed = prerequisite_status(request)
     prerequisites_completed = contact_details_completed and compliance_completed
     
-    # Statistics
-    stats = {
-        'total': user_issues.count(),
-        'open': user_issues.exclude(status__in=['resolved', 'closed']).count(),
-        'urgent': user_issues.filter(is_urgent=True).exclude(status__in=['resolved', 'closed']).count(),
-        'overdue': sum(1 for issue in user_issues if issue.is_overdue()),
-    }
+    # Statistics, in one aggregate query; overdue mirrors PropertyIssue.is_overdue()
+    still_open = ~Q(status__in=['resolved', 'closed'])
+    stats = user_issues.aggregate(
+        total=Count('pk'),
+        open=Count('pk', filter=still_open),
+        urgent=Count('pk', filter=still_open & Q(is_urgent=True)),
+        overdue=Count('pk', filter=still_open & Q(deadline__lt=timezone.now().date())),
+    )
     
     # Recent issues
     recent_issues = user_issues[:5]
     
     # Issues needing attention
     needs_attention = user_issues.filter(
-        Q(status='submitted') & 
-        Q(submitted_at__lt=timezone.now() - timedelta(days=7))
-    ) | user_issues.filter(
-        Q(is_urgent=True) & 
-        ~Q(status__in=['resolved', 'closed'])
+        Q(status='submitted', submitted_at__lt=timezone.now() - timedelta(days=7))
+        | (still_open & Q(is_urgent=True))
     )
     
     context = {
         'stats': stats,
         'recent_issues': recent_issues,
         'needs_attention': needs_attention[:3],
-        'categories': IssueCategory.objects.all(),
+        'categories': reference.categories(),
         'contact_details_completed': contact_details_completed,
         'compliance_completed': compliance_completed,
         'prerequisites_completed': prerequisites_completed,
@@ -74,15 +87,18 @@ def issue_dashboard(request):
 def issue_list(request):
     """List all user issues with filtering"""
     # Check prerequisites
-    contact_details_completed = request.session.get('contact_details') is not None
-    compliance_completed = request.session.get('compliance_results') is not None
+    contact_details_completed, compliance_completed = prerequisite_status(request)
     
     if not contact_details_completed or not compliance_completed:
         messages.error(request, 'Please complete contact details and landlord compliance checklist first.')
         return redirect('report_issue:dashboard')
     
-    user = User.objects.get(id=request.session.get('user_id'))
-    issues = PropertyIssue.objects.filter(user=user)
+    user = request.app_user
+    issues = PropertyIssue.objects.filter(user=user).select_related('category').annotate(
+        email_count=subquery_count(IssueEmail.objects.all(), 'issue'),
+        update_count=subquery_count(IssueUpdate.objects.all(), 'issue'),
+        photo_count=subquery_count(IssuePhoto.objects.all(), 'issue'),
+    )
     
     # Filtering
     status_filter = request.GET.get('status')
@@ -98,7 +114,7 @@ def issue_list(request):
     
     context = {
         'issues': issues,
-        'categories': IssueCategory.objects.all(),
+        'categories': reference.categories(),
         'status_choices': PropertyIssue.STATUS_CHOICES,
         'priority_choices': PropertyIssue.PRIORITY_CHOICES,
         'current_filters': {
@@ -115,8 +131,7 @@ def issue_list(request):
 def create_issue(request):
     """Create a new property issue"""
     # Check prerequisites
-    contact_details_completed = request.session.get('contact_details') is not None
-    compliance_completed = request.session.get('compliance_results') is not None
+    contact_details_completed, compliance_completed = prerequisite_status(request)
     
     if not contact_details_completed or not compliance_completed:
         messages.error(request, 'Please complete contact details and landlord compliance checklist first.')
@@ -126,7 +141,7 @@ def create_issue(request):
         form = PropertyIssueForm(request.POST)
         if form.is_valid():
             issue = form.save(commit=False)
-            user = User.objects.get(id=request.session.get('user_id'))
+            user = request.app_user
             issue.user = user
             
             # Auto-populate contact info if available
@@ -148,21 +163,19 @@ def create_issue(request):
         # Pre-populate from template if specified
         template_id = request.GET.get('template')
         if template_id:
-            try:
-                template = IssueTemplate.objects.get(id=template_id)
+            template = reference.issue_template(template_id)
+            if template:
                 form.fields['title'].initial = template.title_template
                 form.fields['description'].initial = template.description_template
                 form.fields['priority'].initial = template.suggested_priority
                 form.fields['category'].initial = template.category
                 form.fields['is_safety_issue'].initial = template.is_safety_issue
                 form.fields['affects_habitability'].initial = template.affects_habitability
-            except IssueTemplate.DoesNotExist:
-                pass
     
     context = {
         'form': form,
-        'templates': IssueTemplate.objects.all(),
-        'categories': IssueCategory.objects.all(),
+        'templates': reference.issue_templates(),
+        'categories': reference.categories(),
     }
     
     return render(request, 'report_issue/create_issue.html', context)
@@ -171,13 +184,13 @@ def create_issue(request):
 @require_authentication
 def issue_detail(request, pk):
     """View detailed information about a specific issue"""
-    user = User.objects.get(id=request.session.get('user_id'))
-    issue = get_object_or_404(PropertyIssue, pk=pk, user=user)
+    user = request.app_user
+    issue = get_object_or_404(PropertyIssue.objects.select_related('category'), pk=pk, user=user)
     
-    # Get related data
-    photos = issue.photos.all()
-    emails = issue.emails.all()
-    updates = issue.updates.all()
+    # Get related data; evaluated once here, so the template's counts reuse the rows
+    photos = list(issue.photos.select_related('blob'))
+    emails = list(issue.emails.select_related('sent_by'))
+    updates = list(issue.updates.select_related('created_by'))
     
     context = {
         'issue': issue,
@@ -193,7 +206,7 @@ def issue_detail(request, pk):
 @require_authentication
 def edit_issue(request, pk):
     """Edit an existing issue"""
-    user = User.objects.get(id=request.session.get('user_id'))
+    user = request.app_user
     issue = get_object_or_404(PropertyIssue, pk=pk, user=user)
     
     if request.method == 'POST':
@@ -221,17 +234,17 @@ def edit_issue(request, pk):
     context = {
         'form': form,
         'issue': issue,
-        'categories': IssueCategory.objects.all(),
+        'categories': reference.categories(),
     }
     
     return render(request, 'report_issue/edit_issue.html', context)
 
 
 @require_authentication
-def compose_email(request, pk):
+async def compose_email(request, pk):
     """Compose and send email about an issue"""
-    user = User.objects.get(id=request.session.get('user_id'))
-    issue = get_object_or_404(PropertyIssue, pk=pk, user=user)
+    user = await request.aapp_user()
+    issue = await aget_object_or_404(PropertyIssue.objects.select_related('user'), pk=pk, user=user)
     
     if request.method == 'POST':
         form = IssueEmailForm(request.POST)
@@ -246,29 +259,12 @@ def compose_email(request, pk):
             else:
                 email.to_email = issue.landlord_email
             
-            email.save()
+            await email.asave()
             
-            # Send the email if requested
+            # Queue the email if requested; report_issue.outbox delivers it
             if form.cleaned_data.get('send_now', False):
-                try:
-                    send_mail(
-                        subject=email.subject,
-                        message=email.body,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[email.to_email],
-                        fail_silently=False
-                    )
-                    email.is_sent = True
-                    email.save()
-                    
-                    # Update issue status if it's the first email
-                    if issue.status == 'draft':
-                        issue.status = 'submitted'
-                        issue.save()
-                    
-                    messages.success(request, 'Email sent successfully!')
-                except Exception as e:
-                    messages.error(request, f'Failed to send email: {str(e)}')
+                await sync_to_async(queue_email)(email)
+                messages.success(request, 'Email queued for sending!')
             else:
                 messages.success(request, 'Email draft saved!')
             
@@ -276,15 +272,7 @@ def compose_email(request, pk):
     else:
         # Pre-populate email based on type
         email_type = request.GET.get('type', 'initial')
-        template = None
-        
-        try:
-            template = EmailTemplate.objects.filter(
-                template_type=email_type, 
-                is_default=True
-            ).first()
-        except EmailTemplate.DoesNotExist:
-            pass
+        template = await sync_to_async(reference.default_email_template)(email_type)
         
         initial_data = {
             'email_type': email_type,
@@ -297,7 +285,7 @@ def compose_email(request, pk):
     context = {
         'form': form,
         'issue': issue,
-        'templates': EmailTemplate.objects.filter(template_type=request.GET.get('type', 'initial')),
+        'templates': await sync_to_async(reference.email_templates)(request.GET.get('type', 'initial')),
     }
     
     return render(request, 'report_issue/compose_email.html', context)
@@ -306,7 +294,7 @@ def compose_email(request, pk):
 @require_authentication
 def escalate_issue(request, pk):
     """Escalate an issue to next level"""
-    user = User.objects.get(id=request.session.get('user_id'))
+    user = request.app_user
     issue = get_object_or_404(PropertyIssue, pk=pk, user=user)
     
     if issue.status in ['resolved', 'closed']:
@@ -343,7 +331,7 @@ def escalate_issue(request, pk):
 @require_authentication
 def add_update(request, pk):
     """Add an update/note to an issue"""
-    user = User.objects.get(id=request.session.get('user_id'))
+    user = request.app_user
     issue = get_object_or_404(PropertyIssue, pk=pk, user=user)
     
     if request.method == 'POST':
@@ -427,28 +415,24 @@ def contact_details(request):
     if request.method == 'POST':
         form = ContactDetailsForm(request.POST)
         if form.is_valid():
-            try:
-                current_user = User.objects.get(id=request.session.get('user_id'))
-            except User.DoesNotExist:
-                return redirect('login')
+            current_user = request.app_user
             
-            # Process contact details - store in session for use in issue reporting
-            contact_data = form.cleaned_data
-            request.session['contact_details'] = contact_data
+            # Process contact details - keep them on the user for issue reporting
+            ContactDetails.objects.update_or_create(user=current_user, defaults=form.cleaned_data)
+            request.session['contact_details_completed'] = True
             
             messages.success(request, 'Contact details confirmed successfully!')
             return redirect('report_issue:issue_list')
     else:
-        try:
-            current_user = User.objects.get(id=request.session.get('user_id'))
-        except User.DoesNotExist:
-            return redirect('login')
+        current_user = request.app_user
         
-        # Pre-populate form with user's onboarding data
-        initial_data = {}
+        # Pre-populate form with previously confirmed details, falling back
+        # to the user's onboarding data
+        saved = ContactDetails.objects.filter(user=current_user).first()
+        initial_data = model_to_dict(saved, fields=ContactDetailsForm.base_fields) if saved else {}
         
         # Map onboarding landlord_contact to our form's primary_contact field
-        if current_user.landlord_contact:
+        if saved is None and current_user.landlord_contact:
             if current_user.landlord_contact.lower() == 'landlord':
                 initial_data['primary_contact'] = 'landlord'
             elif current_user.landlord_contact.lower() == 'property manager':
@@ -462,96 +446,21 @@ def contact_details(request):
 @require_authentication
 def landlord_compliance(request):
     """Landlord compliance checklist for tenants to verify legal obligations"""
-    # Define compliance checklist items with categories
-    compliance_items = {
-        'Property Condition': [
-            {'id': 'habitability', 'text': 'Property is maintained in habitable condition', 'description': 'Landlord ensures property meets basic health and safety standards'},
-            {'id': 'repairs', 'text': 'Repairs are completed in reasonable timeframe', 'description': 'Essential repairs addressed within 24-48 hours, non-essential within 30 days'},
-            {'id': 'heating', 'text': 'Adequate heating provided', 'description': 'Heating system maintains at least 68°F during heating season'},
-            {'id': 'water_plumbing', 'text': 'Running water and working plumbing', 'description': 'Hot and cold water available, toilets and drains function properly'},
-            {'id': 'electrical', 'text': 'Safe electrical systems', 'description': 'Electrical systems are up to code and safely maintained'},
-        ],
-        'Safety & Security': [
-            {'id': 'smoke_detectors', 'text': 'Working smoke detectors installed', 'description': 'Smoke detectors in required locations and batteries maintained'},
-            {'id': 'carbon_monoxide', 'text': 'Carbon monoxide detectors (where required)', 'description': 'CO detectors installed near fuel-burning appliances and bedrooms'},
-            {'id': 'locks', 'text': 'Proper locks on doors and windows', 'description': 'Secure locks provided for entry doors and accessible windows'},
-            {'id': 'emergency_exits', 'text': 'Clear emergency exits', 'description': 'Fire exits are clearly marked and unobstructed'},
-        ],
-        'Legal Documentation': [
-            {'id': 'lease_agreement', 'text': 'Written lease agreement provided', 'description': 'Clear written lease with terms, conditions, and both parties\' obligations'},
-            {'id': 'deposit_receipt', 'text': 'Security deposit receipt given', 'description': 'Written receipt for security deposit with terms for return'},
-            {'id': 'move_in_inspection', 'text': 'Move-in inspection completed', 'description': 'Property condition documented before tenancy begins'},
-            {'id': 'landlord_info', 'text': 'Landlord contact information provided', 'description': 'Name, address, and contact details of landlord or property manager'},
-        ],
-        'Privacy & Access': [
-            {'id': 'notice_entry', 'text': 'Proper notice given for entry', 'description': 'Landlord provides required notice (usually 24-48 hours) before entering'},
-            {'id': 'quiet_enjoyment', 'text': 'Right to quiet enjoyment respected', 'description': 'Tenant can use property without unreasonable interference'},
-            {'id': 'emergency_contact', 'text': 'Emergency contact information available', 'description': 'Contact available for emergency repairs and urgent situations'},
-        ],
-        'Financial Obligations': [
-            {'id': 'rent_receipts', 'text': 'Rent receipts provided when requested', 'description': 'Written receipts for rent payments when requested by tenant'},
-            {'id': 'deposit_interest', 'text': 'Security deposit interest (where required)', 'description': 'Interest paid on security deposits as required by local law'},
-            {'id': 'fee_disclosure', 'text': 'All fees and charges disclosed', 'description': 'Transparent disclosure of all fees, charges, and payment terms'},
-        ]
-    }
-    
     # Handle form submission
     if request.method == 'POST':
-        try:
-            current_user = User.objects.get(id=request.session.get('user_id'))
-        except User.DoesNotExist:
-            return redirect('login')
-        
-        # Process checklist responses and create issues for non-compliance
-        compliance_results = {}
-        total_items = 0
-        compliant_items = 0
-        issues_created = []
+        current_user = request.app_user
         
-        for category, items in compliance_items.items():
-            compliance_results[category] = []
-            for item in items:
-                total_items += 1
-                is_compliant = request.POST.get(item['id']) == 'yes'
-                if is_compliant:
-                    compliant_items += 1
-                else:
-                    # Create issue for non-compliant item
-                    issue = PropertyIssue.objects.create(
-                        user=current_user,
-                        title=f"Non-compliance: {item['text']}",
-                        description=f"Compliance Issue - {category}\n\n{item['description']}\n\nThis issue was automatically created from your landlord compliance assessment. Please review and add any additional details or photos as needed.",
-                        location="General Property",
-                        priority="medium",
-                        status="draft",
-                        is_safety_issue=category == "Safety & Security",
-                        affects_habitability=category in ["Property Condition", "Safety & Security"],
-                        created_from_compliance=True
-                    )
-                    issues_created.append({
-                        'title': item['text'],
-                        'category': category,
-                        'issue_id': issue.id
-                    })
-                
-                compliance_results[category].append({
-                    **item,
-                    'compliant': is_compliant
-                })
-        
-        # Calculate compliance percentage
-        compliance_percentage = (compliant_items / total_items * 100) if total_items > 0 else 0
-        
-        # Store results in session
-        request.session['compliance_results'] = {
-            'results': compliance_results,
-            'total_items': total_items,
-            'compliant_items': compliant_items,
-            'compliance_percentage': round(compliance_percentage, 1),
-            'completed_date': timezone.now().isoformat(),
-            'issues_created': issues_created
+        answers = {
+            item['id']: request.POST.get(item['id']) == 'yes'
+            for items in COMPLIANCE_CHECKLIST.values()
+            for item in items
         }
         
+        # Store results against the user, with a draft issue for each non-compliant item
+        assessment = record_assessment(current_user, answers)
+        issues_created = assessment.created_issue_ids
+        request.session['compliance_completed'] = True
+        
         if issues_created:
             messages.success(request, f'Compliance assessment completed. {len(issues_created)} issues were automatically created for non-compliant items.')
         else:
@@ -560,7 +469,7 @@ def landlord_compliance(request):
         return redirect('report_issue:compliance_results')
     
     context = {
-        'compliance_items': compliance_items,
+        'compliance_items': COMPLIANCE_CHECKLIST,
     }
     
     return render(request, 'report_issue/landlord_compliance.html', context)
@@ -569,7 +478,7 @@ def landlord_compliance(request):
 @require_authentication
 def compliance_results(request):
     """Display compliance checklist results"""
-    compliance_data = request.session.get('compliance_results')
+    compliance_data = ComplianceAssessment.objects.filter(user=request.app_user).first()
     
     if not compliance_data:
         messages.error(request, 'No compliance data found. Please complete the checklist first.')
@@ -579,7 +488,7 @@ def compliance_results(request):
     recommendations = []
     non_compliant_items = []
     
-    for category, items in compliance_data['results'].items():
+    for category, items in compliance_data.results.items():
         for item in items:
             if not item['compliant']:
                 non_compliant_items.append({
@@ -1,16 +1,15 @@
 import scrapy
 import re
-import os
-import django
 from urllib.parse import urljoin, urlparse
 from decimal import Decimal
 from datetime import datetime
 
-# Setup Django environment
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
-django.setup()
+from application.bootstrap import setup_django
+
+setup_django()
 
 from market_analysis.models import PropertyListing
+from market_analysis.gating import admit_listing
 
 
 class RightmoveSpider(scrapy.Spider):
@@ -214,7 +213,7 @@ class RightmoveSpider(scrapy.Spider):
                     setattr(existing, key, value)
                 existing.save()
                 self.logger.info(f"Updated property: {property_data['title']}")
-            else:
+            elif admit_listing(property_data):
                 # Create new property
                 PropertyListing.objects.create(
                     **property_data,
@@ -290,10 +289,6 @@ class BestAgentSpider(scrapy.Spider):
         self.bedrooms = bedrooms
         self.location = location
         self.scraped_count = 0
-        
-        # Setup Django
-        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
-        django.setup()
     
     def start_requests(self):
         """Generate initial requests for BestAgent property search"""
@@ -437,7 +432,7 @@ class BestAgentSpider(scrapy.Spider):
                 source_id=property_data['source_id']
             ).first()
             
-            if not existing:
+            if not existing and admit_listing(property_data):
                 PropertyListing.objects.create(
                     title=property_data['title'],
                     address=property_data['address'],
@@ -1,14 +1,12 @@
-import os
-import django
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from twisted.internet import reactor
 from threading import Thread
 import logging
 
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
-django.setup()
+from application.bootstrap import setup_django
+
+setup_django()
 
 from .property_spiders import RightmoveSpider, ZooplaSpider, BestAgentSpider
 
@@ -12,14 +12,13 @@ from decimal import Decimal
 from datetime import datetime
 import logging
 from urllib.parse import urljoin, quote
-import os
-import django
 
-# Setup Django
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'application.settings')
-django.setup()
+from application.bootstrap import setup_django
+
+setup_django()
 
 from market_analysis.models import PropertyListing
+from market_analysis.gating import admit_listing
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
@@ -52,7 +51,21 @@ class RespectfulPropertyScraper:
         """
         
         logger.info(f"Starting property scraping: {bedrooms}-bed {property_type} in {location}")
+        all_properties = self.collect_properties(property_type, bedrooms, location, max_results)
+        
+        # Save to database
+        saved_count = 0
+        for prop_data in all_properties:
+            saved_count += self._save_property(prop_data)
         
+        logger.info(f"Scraping completed: {saved_count} properties saved")
+        return saved_count
+    
+    def collect_properties(self, property_type='house', bedrooms=4, location='london', max_results=20):
+        """
+        Property dicts from every method below, without saving them; the
+        "simulated" listing source (market_analysis/sources.py) uses this
+        """
         all_properties = []
         
         # Method 1: Create realistic sample data based on UK property market research
@@ -83,13 +96,7 @@ class RespectfulPropertyScraper:
         # scraped_properties = self._scrape_basic_listings(property_type, bedrooms, location)
         # all_properties.extend(scraped_properties)
         
-        # Save to database
-        saved_count = 0
-        for prop_data in all_properties:
-            saved_count += self._save_property(prop_data)
-        
-        logger.info(f"Scraping completed: {saved_count} properties saved")
-        return saved_count
+        return all_properties
     
     def _create_realistic_sample_data(self, property_type, bedrooms, location, count=20):
         """
@@ -217,11 +224,13 @@ class RespectfulPropertyScraper:
                 existing.save()
                 logger.debug(f"Updated property: {prop_data['title']}")
                 return 0  # Didn't create new
-            else:
+            elif admit_listing(prop_data):
                 # Create new property
                 PropertyListing.objects.create(**prop_data)
                 logger.info(f"Created property: {prop_data['title']} - £{prop_data['weekly_rent']}/week in {prop_data['address']}")
                 return 1  # Created new
+            else:
+                return 0  # Quarantined
                 
         except Exception as e:
             logger.error(f"Error saving property {prop_data.get('title', 'Unknown')}: {e}")
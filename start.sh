@@ -2,4 +2,4 @@
 # start.sh
 
 cd application
-gunicorn application.wsgi:application --bind 0.0.0.0:$PORT
\ No newline at end of file
+gunicorn --bind 0.0.0.0:$PORT
\ No newline at end of file